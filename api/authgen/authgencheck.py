@@ -10,16 +10,18 @@ import aioredis
 
 from api.profile import TikTokProfileResponse
 from models.response import AsyncResponse
+from utilities.scrape_pool import ScrapePool
 
 
 class CheckAuthGenToken(AsyncResponse):
 
-    def __init__(self, client_id: str, username: str, redis: aioredis.Redis):
+    def __init__(self, client_id: str, username: str, redis: aioredis.Redis, scrape_pool: ScrapePool):
         super().__init__()
 
         self.username: str = username
         self.client_id: str = client_id
         self.redis: aioredis = redis
+        self.scrape_pool: ScrapePool = scrape_pool
 
     async def complete(self) -> CheckAuthGenToken:
         auth: Optional[bytes] = await self.redis.get(f"genauth:{self.client_id}")
@@ -30,7 +32,7 @@ class CheckAuthGenToken(AsyncResponse):
             return self
 
         # Scrape User Data TODO REMEMBER TO STOP USING CACHE LOL
-        user_data: TikTokProfileResponse = await TikTokProfileResponse(username=self.username, redis=self.redis, use_cache=True).complete()
+        user_data: TikTokProfileResponse = await TikTokProfileResponse(username=self.username, redis=self.redis, scrape_pool=self.scrape_pool, use_cache=True).complete()
         if user_data.status != 200:
             self._status, self._payload = user_data.status, None
             return self
@@ -2,14 +2,15 @@ from __future__ import annotations
 
 import math
 import random
-from typing import List
+from typing import List, Optional
 
 import aiomysql
 import aioredis
 
 import config
 from models.response import AsyncResponse
-from utilities.statistics_sql import StatisticSQL
+from utilities.avatar_store import AvatarStore
+from utilities.leaderboard_index import LeaderboardIndex
 
 
 class TikTokCreatorResponse(AsyncResponse):
@@ -32,21 +33,21 @@ class TikTokCreatorResponse(AsyncResponse):
             10 * (math.floor(level) ** 2)
         )
 
-    async def complete(self) -> TikTokCreatorResponse:
-        sql: StatisticSQL = StatisticSQL(self.sql_pool)
-        items: List[dict] = []
+    @classmethod
+    async def format_statistics(cls, redis: aioredis.Redis, statistics: List[tuple]) -> List[dict]:
+        """
+        Leaderboard items for (viewer_id, comments, experience, coins) rows
 
-        # (viewer_id, comments, experience, coins)
-        statistics = await sql.get_statistics(self.username)
+        """
 
-        for stat in statistics:
-            xp = stat[2]
-            level: int = self.calculate_level(stat[2])
-            current_xp: int = xp - self.calculate_xp(level)
-            needed_xp: int = self.calculate_xp(level + 1) - self.calculate_xp(level)
+        items: List[dict] = []
+        avatar_urls: List[Optional[str]] = await AvatarStore(redis).get_many([stat[0] for stat in statistics])
 
-            avatar_url = await self.redis.get(f"avatar:{stat[0]}")
-            avatar_url = avatar_url.decode("utf-8") if avatar_url is not None else None
+        for stat, avatar_url in zip(statistics, avatar_urls):
+            xp = stat[2]
+            level: int = cls.calculate_level(stat[2])
+            current_xp: int = xp - cls.calculate_xp(level)
+            needed_xp: int = cls.calculate_xp(level + 1) - cls.calculate_xp(level)
 
             items.append({
                 "avatar_url": avatar_url,
@@ -59,5 +60,13 @@ class TikTokCreatorResponse(AsyncResponse):
                 "level": level
             })
 
-        self._status, self._payload = 200, items
+        return items
+
+    async def complete(self) -> TikTokCreatorResponse:
+        index: LeaderboardIndex = LeaderboardIndex(self.redis, self.sql_pool)
+
+        # (viewer_id, comments, experience, coins)
+        statistics = await index.get_statistics(self.username)
+
+        self._status, self._payload = 200, await self.format_statistics(self.redis, statistics)
         return self
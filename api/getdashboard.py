@@ -12,26 +12,25 @@ from models.response import AsyncResponse
 
 class GetDashboardData(AsyncResponse):
 
-    def __init__(self, authorization: str, redis: aioredis.Redis, live: LiveConnectionPool):
+    def __init__(self, username: Optional[str], redis: aioredis.Redis, live: LiveConnectionPool):
         super().__init__()
-        self.authorization: str = authorization
+        self.username: Optional[str] = username
         self.redis: aioredis = redis
         self.live: LiveConnectionPool = live
 
     async def complete(self) -> GetDashboardData:
-        username: Optional[bytes] = await self.redis.get(f"auth:{self.authorization}")
+        username: Optional[str] = self.username
 
-        # Get from Redis
+        # Authorization did not resolve
         if username is None:
             self._status, self._payload = 404, None
             return self
 
-        username: str = username.decode("utf-8")
         giveaway: RetrieveGiveawayResponse = await RetrieveGiveawayResponse(username=username, live=self.live, redis=self.redis).complete()
 
         data = {
             "unique_id": username,
-            "tracking": bool(self.live.clients.get(username)),
+            "tracking": await self.live.is_tracking(username),
             "giveaway": giveaway.payload
         }
 
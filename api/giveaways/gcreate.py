@@ -14,26 +14,25 @@ from models.response import AsyncResponse
 
 class CreateGiveawayResponse(AsyncResponse):
 
-    def __init__(self, authorization: str, data: GiveawayConfig, live: LiveConnectionPool, redis: aioredis.Redis):
+    def __init__(self, username: Optional[str], data: GiveawayConfig, live: LiveConnectionPool, redis: aioredis.Redis):
         super().__init__()
         self.data: GiveawayConfig = data
         self.redis: aioredis.Redis = redis
-        self.authorization: str = authorization
+        self.username: Optional[str] = username
         self.live: LiveConnectionPool = live
 
     async def complete(self) -> CreateGiveawayResponse:
-        username: Optional[bytes] = await self.redis.get(f"auth:{self.authorization}")
+        username: Optional[str] = self.username
 
-        # Get from Redis
+        # Authorization did not resolve
         if username is None:
             self._status, self._payload, self._message = 400, None, "Auth failed"
             return self
 
-        username: str = username.decode("utf-8")
-        giveaway: Optional[dict] = self.live.giveaways.get_giveaway(username)
+        giveaway: Optional[dict] = await self.live.giveaways.get_giveaway(username)
 
         # Check if tracking rn
-        tracking = bool(self.live.clients.get(username))
+        tracking = await self.live.is_tracking(username)
         if not tracking:
             self._status, self._payload, self._message = 404, None, "Not currently tracking that user"
             return self
@@ -58,7 +57,7 @@ class CreateGiveawayResponse(AsyncResponse):
             "end_time": end_time
         }
 
-        self.live.giveaways.set_giveaway(username, giveaway_config)
+        await self.live.giveaways.set_giveaway(username, giveaway_config)
         self._status, self._payload, self._message = 200, giveaway_config, "Started giveaway"
         return self
 
@@ -18,7 +18,7 @@ class RetrieveGiveawayResponse(AsyncResponse):
         self.live: LiveConnectionPool = live
 
     async def complete(self) -> RetrieveGiveawayResponse:
-        giveaway: Optional[dict] = self.live.giveaways.get_giveaway(self.username)
+        giveaway: Optional[dict] = await self.live.giveaways.get_giveaway(self.username)
 
         # Check if already running
         if giveaway is None:
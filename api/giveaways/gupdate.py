@@ -13,23 +13,22 @@ from models.response import AsyncResponse
 
 class UpdateGiveawayResponse(AsyncResponse):
 
-    def __init__(self, authorization: str, data: GiveawayConfig, live: LiveConnectionPool, redis: aioredis.Redis):
+    def __init__(self, username: Optional[str], data: GiveawayConfig, live: LiveConnectionPool, redis: aioredis.Redis):
         super().__init__()
         self.data: GiveawayConfig = data
-        self.authorization: str = authorization
+        self.username: Optional[str] = username
         self.redis: aioredis = redis
         self.live: LiveConnectionPool = live
 
     async def complete(self) -> UpdateGiveawayResponse:
-        username: Optional[bytes] = await self.redis.get(f"auth:{self.authorization}")
+        username: Optional[str] = self.username
 
-        # Get from Redis
+        # Authorization did not resolve
         if username is None:
             self._status, self._payload, self._message = 400, None, "Authentcation Failed"
             return self
 
-        username: str = username.decode("utf-8")
-        giveaway: Optional[dict] = self.live.giveaways.get_giveaway(username)
+        giveaway: Optional[dict] = await self.live.giveaways.get_giveaway(username)
 
         # Check if running
         if giveaway is None:
@@ -49,7 +48,7 @@ class UpdateGiveawayResponse(AsyncResponse):
             "end_time": giveaway["end_time"]
         }
 
-        self.live.giveaways.set_giveaway(username, giveaway_config)
+        await self.live.giveaways.update_giveaway(username, giveaway_config)
         self._status, self._payload = 200, giveaway_config
         return self
 
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import base64
+import binascii
+from typing import List, Optional, Tuple
+
+import aiomysql
+import aioredis
+
+from api.creator import TikTokCreatorResponse
+from models.response import AsyncResponse
+from utilities.leaderboard_index import LeaderboardIndex
+
+
+def encode_cursor(experience: int, viewer_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{experience}:{viewer_id}".encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[int, str]]:
+    """
+    :return: (experience, viewer_id) of the row the cursor points after, or None if it is malformed
+
+    """
+
+    try:
+        experience, viewer_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8").split(":", 1)
+        return int(experience), viewer_id
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+
+
+class LeaderboardPageResponse(AsyncResponse):
+    """
+    One page of a streamer's leaderboard. Pages are keyset-paginated, so a page costs the same however deep it is;
+    ``next_cursor`` is None on the last page. Pages and ranks both read the leaderboard index, so they agree.
+
+    """
+
+    DEFAULT_LIMIT: int = 25
+    MAX_LIMIT: int = 100
+
+    def __init__(self, username: str, cursor: Optional[str], limit: Optional[int], sql_pool: aiomysql.Pool, redis: aioredis.Redis):
+        super().__init__()
+        self.username: str = username
+        self.cursor: Optional[str] = cursor
+        self.limit: int = max(1, min(limit or self.DEFAULT_LIMIT, self.MAX_LIMIT))
+        self.sql_pool: aiomysql.Pool = sql_pool
+        self.redis: aioredis.Redis = redis
+
+    async def complete(self) -> LeaderboardPageResponse:
+        after: Optional[Tuple[int, str]] = None
+
+        if self.cursor:
+            after = decode_cursor(self.cursor)
+
+            if after is None:
+                self._status, self._payload, self._message = 400, None, "Invalid cursor"
+                return self
+
+        # One extra row tells us whether there is a next page
+        statistics: List[tuple] = await LeaderboardIndex(self.redis, self.sql_pool).get_page(self.username, after, self.limit + 1)
+        page: List[tuple] = statistics[:self.limit]
+        last: Optional[tuple] = page[-1] if len(statistics) > self.limit else None
+
+        self._status, self._payload = 200, {
+            "items": await TikTokCreatorResponse.format_statistics(self.redis, page),
+            "next_cursor": encode_cursor(last[2], last[0]) if last is not None else None
+        }
+
+        return self
+
+
+class ViewerRankResponse(AsyncResponse):
+
+    def __init__(self, username: str, viewer: str, sql_pool: aiomysql.Pool, redis: aioredis.Redis):
+        super().__init__()
+        self.username: str = username
+        self.viewer: str = viewer
+        self.sql_pool: aiomysql.Pool = sql_pool
+        self.redis: aioredis.Redis = redis
+
+    async def complete(self) -> ViewerRankResponse:
+        ranked: Optional[Tuple[int, int]] = await LeaderboardIndex(self.redis, self.sql_pool).get_rank(self.username, self.viewer)
+
+        # Never commented or gifted in this stream
+        if ranked is None:
+            self._status, self._payload = 404, None
+            return self
+
+        rank, experience = ranked
+        level: int = TikTokCreatorResponse.calculate_level(experience)
+
+        self._status, self._payload = 200, {
+            "unique_id": self.viewer,
+            "rank": rank,
+            "experience": experience,
+            "level": level
+        }
+
+        return self
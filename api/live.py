@@ -3,20 +3,25 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import time
 import traceback
 from concurrent.futures import ProcessPoolExecutor
 from json import JSONDecodeError
 
 import aiohttp
 import aioredis
-from TikTokApi import TikTokApi
 
 from typing import Tuple, Optional, Dict, Union
+
+import config
+import utilities.config_defaults  # Fills in settings missing from config.py
 from models.response import AsyncResponse
+from utilities.metrics import LIVE_CHECKS
+from utilities.room_id import RoomIdScanner
+from utilities.singleflight import SingleFlight
 
 
 class TikTokProfileLiveResponse(AsyncResponse):
-    TIKTOK_API = TikTokApi()
     DEFAULT_CLIENT_PARAMS: Dict[str, Union[int, bool, str]] = {
         "aid": 1988, "app_language": 'en-US', "app_name": 'tiktok_web', "browser_language": 'en', "browser_name": 'Mozilla',
         "browser_online": True, "browser_platform": 'Win32', "version_code": 180800,
@@ -31,61 +36,113 @@ class TikTokProfileLiveResponse(AsyncResponse):
         "Referer": 'https://www.tiktok.com/', "Origin": 'https://www.tiktok.com', "Accept-Language": 'en-US,en;q=0.9', "Accept-Encoding": 'gzip, deflate',
     }
 
-    def __init__(self, username: str):
+    # Cached live states
+    LIVE: str = "live"
+    NOT_LIVE: str = "offline"
+    FAILED: str = "failed"
+
+    SINGLE_FLIGHT: SingleFlight = SingleFlight()
+
+    def __init__(self, username: str, http: aiohttp.ClientSession, redis: aioredis.Redis):
         super().__init__()
         self.unique_id: str = username
+        self.http: aiohttp.ClientSession = http
+        self.redis: aioredis.Redis = redis
+        self.cached: bool = False
 
     TIKTOK_URL_WEB: str = 'https://www.tiktok.com/'
     TIKTOK_LIVE_URL: str = f"https://m.tiktok.com/node/share/live"
+    CHUNK_SIZE: int = 16384
+
+    async def get_livestream_room_id(self, unique_id: str) -> Optional[str]:
+        """
+        Stream the live page and stop reading as soon as the room id shows up
+
+        """
 
-    async def get_livestream_page_html(self, unique_id: str) -> str:
         request_url: str = f"{self.TIKTOK_URL_WEB}@{unique_id}/live"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(request_url, headers=self.DEFAULT_REQUEST_HEADERS, timeout=10000) as request:
-                return (await request.read()).decode(encoding="utf-8")
+        scanner: RoomIdScanner = RoomIdScanner()
+
+        async with self.http.get(request_url, headers=self.DEFAULT_REQUEST_HEADERS) as request:
+            async for chunk in request.content.iter_chunked(self.CHUNK_SIZE):
+                if scanner.feed(chunk):
+                    # Drop the rest of the page rather than draining it
+                    request.close()
+                    break
+
+        return scanner.room_id
 
     async def get_node_data(self, room_id: str) -> dict:
         request_url: str = self.TIKTOK_LIVE_URL + f"?id={room_id}"
-        async with aiohttp.ClientSession() as session:
-            async with session.get(request_url, headers=self.DEFAULT_REQUEST_HEADERS, timeout=10000) as request:
-                return await request.json()
+        async with self.http.get(request_url, headers=self.DEFAULT_REQUEST_HEADERS) as request:
+            return await request.json()
 
     @staticmethod
     def get_room_id(html: str) -> Optional[str]:
-        try:
-            return html.split("__room_id=")[1].split("\"/>")[0]
-        except:
-            pass
+        return RoomIdScanner.scan(html.encode("utf-8"))
 
-        try:
-            return html.split('"roomId":"')[1].split('"}')[0]
-        except:
-            pass
+    async def __lookup(self) -> Tuple[str, Optional[str]]:
+        """
+        Check the livestream upstream
 
-        return None
+        :return: (state, room_id) where state is one of LIVE, NOT_LIVE, FAILED
+
+        """
 
-    async def __fetch_room_id(self) -> Optional[str]:
         try:
-            html: str = await self.get_livestream_page_html(self.unique_id)
-            self.__room_id = self.get_room_id(html)
-            return self.__room_id
+            room_id: Optional[str] = await self.get_livestream_room_id(self.unique_id)
         except:
-            return None
+            return self.FAILED, None
+
+        if not room_id:
+            return self.NOT_LIVE, None
 
-    async def __fetch_room_data(self, room_id: str) -> Optional[dict]:
         try:
-            return await self.get_node_data(room_id)
+            room_data: dict = await self.get_node_data(room_id)
         except:
-            return None
+            return self.FAILED, None
+
+        if room_data and room_data.get("body", dict()).get("status") == '2':
+            return self.LIVE, room_id
+
+        return self.NOT_LIVE, None
+
+    async def __fetch(self) -> Tuple[str, Optional[str]]:
+        started: float = time.perf_counter()
+        state, room_id = await self.__lookup()
+        LIVE_CHECKS.observe(time.perf_counter() - started, state)
+
+        expire: int = {
+            self.LIVE: config.TikTokScraping.EXPIRE_LIVE,
+            self.NOT_LIVE: config.TikTokScraping.EXPIRE_NOT_LIVE,
+            self.FAILED: config.TikTokScraping.EXPIRE_LIVE_FAILED
+        }[state]
+
+        await self.redis.set(self.cache_key, f"{state}:{room_id or ''}", ex=expire)
+        return state, room_id
+
+    @property
+    def cache_key(self) -> str:
+        return f"live:{self.unique_id.strip().lstrip('@').lower()}"
 
     async def complete(self) -> TikTokProfileLiveResponse:
-        room_id: Optional[str] = await self.__fetch_room_id()
+        cached: Optional[bytes] = await self.redis.get(self.cache_key)
+
+        # Get from Redis
+        if cached is not None:
+            state, room_id = cached.decode("utf-8").split(":", 1)
+            self.cached = True
+
+        # Concurrent lookups for one user share a single fetch
+        else:
+            state, room_id = await self.SINGLE_FLIGHT.do(self.cache_key, self.__fetch)
+            self.cached = False
+
+        self._message = "Cache hit" if self.cached else "Cache miss"
 
-        if room_id:
-            room_data: dict = await self.__fetch_room_data(room_id)
-            if room_data and room_data.get("body", dict()).get("status") == '2':
-                self._status, self._payload = 200, room_id
-                return self
+        if state == self.LIVE:
+            self._status, self._payload = 200, room_id
+            return self
 
         self._status, self._payload = 404, None
         return self
@@ -11,33 +11,33 @@ from models.response import AsyncResponse
 
 class ManageTrackingResponse(AsyncResponse):
 
-    def __init__(self, authorization: str, redis: aioredis.Redis, live: LiveConnectionPool, start_or_stop: bool):
+    def __init__(self, username: Optional[str], redis: aioredis.Redis, live: LiveConnectionPool, start_or_stop: bool):
         super().__init__()
-        self.authorization: str = authorization
+        self.username: Optional[str] = username
         self.redis: aioredis = redis
         self.live: LiveConnectionPool = live
         self.start_or_stop: bool = start_or_stop
 
     async def complete(self) -> ManageTrackingResponse:
-        username: Optional[bytes] = await self.redis.get(f"auth:{self.authorization}")
+        username: Optional[str] = self.username
 
-        # Get from Redis
+        # Authorization did not resolve
         if username is None:
             self._status, self._payload = 404, None
             return self
 
-        username: str = username.decode("utf-8")
-        c = self.live.clients.get(username)
 
         # Stop Stream
         if not self.start_or_stop:
-            await self.live.remove_client(username)
+            await self.live.untrack(username)
+            self._status, self._payload = 200, True
+            return self
 
         # Already Connected
-        if c:
+        if await self.live.is_tracking(username):
             self._status, self._payload = 400, False
             return self
 
-        success: bool = await self.live.add_client(username)
+        success: bool = await self.live.track(username)
         self._status, self._payload = 200 if success else 500, success
         return self
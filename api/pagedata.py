@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import traceback
+from typing import Any, Awaitable, Dict, Optional
+
+import aiohttp
+import aioredis
+
+from api.giveaways.gretrieve import RetrieveGiveawayResponse
+from api.live import TikTokProfileLiveResponse
+from api.profile import TikTokProfileResponse
+from livestuff.live import LiveConnectionPool
+from models.response import AsyncResponse
+from utilities.leaderboard_snapshot import LeaderboardSnapshot, LeaderboardSnapshots
+from utilities.scrape_pool import ScrapePool
+
+
+class TikTokPageDataResponse(AsyncResponse):
+    """
+    Everything the live page needs in one call. Once the stream is known to be live, the profile, leaderboard
+    and giveaway sections run concurrently, each under its own deadline. A section that misses its deadline
+    is served stale (where an older copy exists) or left missing rather than holding up the page, and so is
+    a profile the scraper could not fetch right now.
+
+    """
+
+    # Seconds per section
+    SECTION_TIMEOUTS: Dict[str, float] = {
+        "profile": 4.0,
+        "leaderboards": 1.5,
+        "giveaway": 1.0,
+    }
+
+    # Section states
+    OK: str = "ok"
+    STALE: str = "stale"
+    MISSING: str = "missing"
+    ERROR: str = "error"
+
+    def __init__(
+            self,
+            username: str,
+            redis: aioredis.Redis,
+            http: aiohttp.ClientSession,
+            live: LiveConnectionPool,
+            scrape_pool: ScrapePool,
+            snapshots: LeaderboardSnapshots
+    ):
+        super().__init__()
+        self.username: str = username
+        self.redis: aioredis.Redis = redis
+        self.http: aiohttp.ClientSession = http
+        self.live: LiveConnectionPool = live
+        self.scrape_pool: ScrapePool = scrape_pool
+        self.snapshots: LeaderboardSnapshots = snapshots
+        self.sections: Dict[str, dict] = dict()
+
+    async def __section(self, name: str, response: Awaitable[Any]) -> Any:
+        started: float = time.perf_counter()
+
+        try:
+            result: Any = await asyncio.wait_for(response, self.SECTION_TIMEOUTS[name])
+            state: str = self.OK
+        except asyncio.TimeoutError:
+            result, state = None, self.MISSING
+        except:
+            logging.error(traceback.format_exc())
+            result, state = None, self.ERROR
+
+        self.sections[name] = {"state": state, "ms": round((time.perf_counter() - started) * 1000, 2)}
+        return result
+
+    def __stale_leaderboards(self) -> Any:
+        snapshot: Optional[LeaderboardSnapshot] = self.snapshots.peek(self.username)
+
+        if snapshot is None:
+            return None
+
+        self.sections["leaderboards"]["state"] = self.STALE
+        return json.loads(snapshot.body)["payload"]
+
+    async def complete(self) -> TikTokPageDataResponse:
+        started: float = time.perf_counter()
+        live_data: TikTokProfileLiveResponse = await TikTokProfileLiveResponse(username=self.username, http=self.http, redis=self.redis).complete()
+        self.sections["live"] = {"state": self.OK, "ms": round((time.perf_counter() - started) * 1000, 2)}
+
+        # Live doesn't exist
+        if live_data.status == 404:
+            self._status, self._payload = 404, None
+            return self
+
+        # Live does exist, get the rest concurrently
+        user_data, leaderboard_data, giveaway_data = await asyncio.gather(
+            self.__section("profile", TikTokProfileResponse(username=self.username, redis=self.redis, scrape_pool=self.scrape_pool, use_cache=True).complete()),
+            self.__section("leaderboards", self.snapshots.get(self.username)),
+            self.__section("giveaway", RetrieveGiveawayResponse(username=self.username, live=self.live, redis=self.redis).complete())
+        )
+
+        # Scraper saturated or failing; the rest of the page still works without the profile
+        if user_data is not None and user_data.status in (500, 503):
+            self.sections["profile"]["state"] = self.MISSING
+            user_data = None
+
+        # User doesn't exist
+        if user_data is not None and user_data.status != 200:
+            self._status, self._payload = user_data.status, None
+            return self
+
+        payload: dict = dict(user_data.payload) if user_data is not None else dict()
+        payload["roomId"] = live_data.payload
+        payload["leaderboards"] = json.loads(leaderboard_data.body)["payload"] if leaderboard_data is not None else self.__stale_leaderboards()
+        payload["giveaway"] = giveaway_data.payload if giveaway_data is not None else None
+        payload["sections"] = self.sections
+
+        self._status, self._payload = 200, payload
+        return self
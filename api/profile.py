@@ -2,100 +2,127 @@ from __future__ import annotations
 
 import asyncio
 import json
-import logging
-import traceback
-from concurrent.futures import ProcessPoolExecutor
+import time
+import uuid
 from json import JSONDecodeError
 
 import aioredis
-from TikTokApi import TikTokApi
 
-import functools
 from typing import Tuple, Optional
 
-from TikTokApi.api.user import User
-
 import config
 from models.response import AsyncResponse
+from utilities.scrape_pool import ScrapePool, ScrapePoolSaturated
+from utilities.singleflight import SingleFlight
 
 
 class TikTokProfileResponse(AsyncResponse):
-    TIKTOK_API = TikTokApi()
+    SINGLE_FLIGHT: SingleFlight = SingleFlight()
+    SCRAPE_LOCK_EXPIRE: int = 30
+    SCRAPE_LOCK_POLL: float = 0.25
+
+    # sec_uids are case-sensitive; usernames are not
+    SEC_UID_PREFIX: str = "MS4wLjABAAAA"
+    RELEASE_LOCK_SCRIPT: str = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
 
-    def __init__(self, username: str, redis: aioredis.Redis, use_cache: bool = True):
+    def __init__(self, username: str, redis: aioredis.Redis, scrape_pool: ScrapePool, use_cache: bool = True):
         super().__init__()
 
-        self.unique_id: str = username
+        # One spelling for the cache, the scrape lock, the single flight and the scrape
+        self.unique_id: str = self.normalize(username)
         self.redis: aioredis = redis
+        self.scrape_pool: ScrapePool = scrape_pool
         self.use_cache: bool = use_cache
 
     @staticmethod
-    def _request(username: str) -> Tuple[int, Optional[TikTokApi.user]]:
-        """
-        Make a request to the TikTok API
+    def normalize(username: str) -> str:
+        username = username.strip().lstrip("@")
+        return username if username.startswith(TikTokProfileResponse.SEC_UID_PREFIX) else username.lower()
+
+    async def __read_cache(self, user: bytes) -> Tuple[int, Optional[dict]]:
+        user: str = user.decode("utf-8")
 
-        """
         try:
-            return 200, TikTokProfileResponse.TIKTOK_API.user(username)
-        except:
-            logging.error(traceback.format_exc())
-            return 500, None
+            return 200, json.loads(user)
 
-    async def complete(self) -> TikTokProfileResponse:
+        except JSONDecodeError:
 
-        user: Optional[bytes] = await self.redis.get(f"user:{self.unique_id}")
+            # Reference (DNE or Different Key)
+            if 'ref' == user[:3]:
+                reference: str = user.split(":")[2]
 
-        # Get from Redis
-        if user is not None and self.use_cache:
-            user: str = user.decode("utf-8")
+                # User DNE
+                if reference == "-1":
+                    return 404, None
 
-            try:
-                code, payload = 200, json.loads(user)
+                # Get Reference
+                user: str = (await self.redis.get(f"user:{reference}")).decode("utf-8")
+                return 200, json.loads(user)
 
-            except JSONDecodeError:
+            # Broken Redis String
+            return 500, None
 
-                # Reference (DNE or Different Key)
-                if 'ref' == user[:3]:
-                    reference: str = user.split(":")[2]
+    async def __scrape(self) -> Tuple[int, Optional[dict]]:
+        """
+        Scrape the user, at most once at a time across all workers. A worker that loses the lock
+        waits for the winner's result to land in the cache instead of scraping too.
 
-                    # User DNE
-                    if reference == "-1":
-                        code, payload = 404, None
+        """
 
-                    # Get Reference
-                    else:
-                        user: str = (await self.redis.get(f"user:{reference}")).decode("utf-8")
-                        code, payload = 200, json.loads(user)
+        lock: str = f"lock:user:{self.unique_id}"
+        token: str = str(uuid.uuid4())
+        deadline: float = time.monotonic() + self.SCRAPE_LOCK_EXPIRE
 
-                else:
+        while not await self.redis.set(lock, token, ex=self.SCRAPE_LOCK_EXPIRE, nx=True):
+            await asyncio.sleep(self.SCRAPE_LOCK_POLL)
 
-                    # Broken Redis String
-                    code, payload = 500, None
+            # The holder finished, use its result
+            if not await self.redis.exists(lock):
+                user: Optional[bytes] = await self.redis.get(f"user:{self.unique_id}")
 
-        else:
+                if user is not None:
+                    return await self.__read_cache(user)
+
+            # The holder is stuck; scrape ourselves
+            elif time.monotonic() > deadline:
+                break
+
+        try:
+            return await self.__request()
+        finally:
+            await self.redis.eval(self.RELEASE_LOCK_SCRIPT, 1, lock, token)
+
+    async def __request(self) -> Tuple[int, Optional[dict]]:
+        try:
+            code, user = await self.scrape_pool.scrape(self.unique_id)
+        except ScrapePoolSaturated:
+            return 503, None
 
-            code, user = await asyncio.get_running_loop().run_in_executor(
-                ProcessPoolExecutor(),
-                functools.partial(self._request, username=self.unique_id)
-            )
+        if code == 404:
+            await self.redis.set(f"user:{self.unique_id}", "ref:user:-1", ex=config.TikTokScraping.EXPIRE_SCRAPED_USERS)
+            return code, None
 
-            # noinspection PyTypeChecker
-            user: User = user
+        if code == 200:
+            payload: dict = user["payload"]
 
-            if code == 404:
-                payload = None
-                await self.redis.set(f"user:{self.unique_id}", "ref:user:-1", ex=config.TikTokScraping.EXPIRE_SCRAPED_USERS)
+            # Cache data and also references for the alternative ID types
+            await self.redis.set(f"user:{user['user_id']}", json.dumps(payload), ex=config.TikTokScraping.EXPIRE_SCRAPED_USERS)
+            await self.redis.set(f"user:{user['sec_uid']}", f"ref:user:{user['user_id']}", ex=config.TikTokScraping.EXPIRE_SCRAPED_USERS)
+            await self.redis.set(f"user:{self.normalize(user['username'])}", f"ref:user:{user['user_id']}", ex=config.TikTokScraping.EXPIRE_SCRAPED_USERS)
+            return code, payload
 
-            elif code == 200:
-                payload = user.as_dict
+        return code, None
 
-                # Cache data and also references for the alternative ID types
-                await self.redis.set(f"user:{user.user_id}", json.dumps(payload), ex=config.TikTokScraping.EXPIRE_SCRAPED_USERS)
-                await self.redis.set(f"user:{user.sec_uid}", f"ref:user:{user.user_id}", ex=config.TikTokScraping.EXPIRE_SCRAPED_USERS)
-                await self.redis.set(f"user:{user.username}", f"ref:user:{user.user_id}", ex=config.TikTokScraping.EXPIRE_SCRAPED_USERS)
+    async def complete(self) -> TikTokProfileResponse:
+        user: Optional[bytes] = await self.redis.get(f"user:{self.unique_id}")
+
+        # Get from Redis
+        if user is not None and self.use_cache:
+            code, payload = await self.__read_cache(user)
 
-            else:
-                payload = None
+        # Concurrent misses for one user share a single scrape
+        else:
+            code, payload = await self.SINGLE_FLIGHT.do(self.unique_id, self.__scrape)
 
         self._status, self._payload = code, payload
         return self
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+from livestuff.live import LiveConnectionPool
+from models.response import AsyncResponse
+
+
+class RestoreProgressResponse(AsyncResponse):
+
+    def __init__(self, live: LiveConnectionPool):
+        super().__init__()
+        self.live: LiveConnectionPool = live
+
+    async def complete(self) -> RestoreProgressResponse:
+        self._status, self._payload = 200, self.live.registry.progress
+        return self
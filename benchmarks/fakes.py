@@ -0,0 +1,802 @@
+"""
+In-memory stand-ins for Redis and MariaDB used by the benchmarks. They implement the subset of the aioredis / aiomysql
+APIs this service calls and count every network round trip, optionally sleeping ``latency`` seconds per trip to
+approximate a real link.
+
+:class:`CountingRedis` and :class:`CountingPool` wrap real clients with the same counting, for runs against a local
+Redis and MariaDB.
+
+"""
+
+import asyncio
+import fnmatch
+import inspect
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from fastapi_limiter import FastAPILimiter
+
+from livestuff.giveaway_redis import RedisLiveGiveaways
+from utilities.leaderboard_index import LeaderboardIndex
+
+
+class RoundTrips:
+    """
+    Round trip tally per backend (``redis`` / ``sql``) and per command
+
+    """
+
+    def __init__(self):
+        self.commands: Counter = Counter()
+
+    def add(self, backend: str, command: str) -> None:
+        self.commands[(backend, command)] += 1
+
+    def total(self, backend: Optional[str] = None) -> int:
+        return sum(count for (name, _), count in self.commands.items() if backend is None or name == backend)
+
+    def reset(self) -> None:
+        self.commands.clear()
+
+
+def _bytes(value: Any) -> bytes:
+    if isinstance(value, bytes):
+        return value
+
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+
+    return str(value).encode("utf-8")
+
+
+def _score(value: Union[str, bytes, float]) -> Tuple[float, bool]:
+    """
+    Parse a ZRANGEBYSCORE bound to (score, exclusive)
+
+    """
+
+    value = value.decode("utf-8") if isinstance(value, bytes) else str(value)
+    exclusive: bool = value.startswith("(")
+    value = value.lstrip("(")
+    return float(value.replace("+inf", "inf")), exclusive
+
+
+class FakeRedis:
+    """
+    Single-process Redis: strings, hashes, sets and sorted sets with expiry, pipelines and pub/sub publishing
+
+    """
+
+    def __init__(self, trips: Optional[RoundTrips] = None, latency: float = 0.0):
+        self.trips: RoundTrips = trips or RoundTrips()
+        self.latency: float = latency
+        self.data: Dict[str, Any] = dict()
+        self.expires: Dict[str, float] = dict()
+        self.scripts: Dict[str, str] = dict()
+        self.subscribers: List[FakePubSub] = []
+
+    async def _trip(self, command: str) -> None:
+        self.trips.add("redis", command)
+        await asyncio.sleep(self.latency)
+
+    def __getattr__(self, name: str):
+        # Every command is one round trip; ``_<command>`` holds its logic
+        if name.startswith("_") or not hasattr(type(self), f"_{name}"):
+            raise AttributeError(name)
+
+        async def command(*args, **kwargs):
+            await self._trip(name)
+            return self._run(name, *args, **kwargs)
+
+        return command
+
+    def _run(self, name: str, *args, **kwargs) -> Any:
+        return getattr(self, f"_{name}")(*args, **kwargs)
+
+    def _alive(self, key: Union[str, bytes]) -> Optional[str]:
+        key = key.decode("utf-8") if isinstance(key, bytes) else str(key)
+        expires: Optional[float] = self.expires.get(key)
+
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+
+        return key
+
+    def _get_typed(self, key: Union[str, bytes], factory: type) -> Any:
+        key = self._alive(key)
+
+        if key not in self.data:
+            self.data[key] = factory()
+
+        return self.data[key]
+
+    def pipeline(self, transaction: bool = True) -> "FakePipeline":
+        return FakePipeline(self)
+
+    async def execute_pipeline(self, calls: List[Tuple[str, tuple, dict]]) -> List[Any]:
+        await self._trip("pipeline")
+        return [self._run(name, *args, **kwargs) for name, args, kwargs in calls]
+
+    async def close(self) -> None:
+        pass
+
+    # Keys
+    def _delete(self, *keys) -> int:
+        removed: int = 0
+
+        for key in keys:
+            key = self._alive(key)
+            removed += self.data.pop(key, None) is not None
+            self.expires.pop(key, None)
+
+        return removed
+
+    def _exists(self, *keys) -> int:
+        return sum(self._alive(key) in self.data for key in keys)
+
+    def _expire(self, key, seconds) -> bool:
+        key = self._alive(key)
+
+        if key not in self.data:
+            return False
+
+        self.expires[key] = time.monotonic() + seconds
+        return True
+
+    def _expireat(self, key, timestamp) -> bool:
+        return self._expire(key, float(timestamp) - time.time())
+
+    def _pexpire(self, key, milliseconds) -> bool:
+        return self._expire(key, milliseconds / 1000)
+
+    def _persist(self, key) -> bool:
+        return self.expires.pop(self._alive(key), None) is not None
+
+    def _ttl(self, key) -> int:
+        key = self._alive(key)
+
+        if key not in self.data:
+            return -2
+
+        return int(self.expires[key] - time.monotonic()) if key in self.expires else -1
+
+    def _pttl(self, key) -> int:
+        key = self._alive(key)
+
+        if key not in self.data:
+            return -2
+
+        return int((self.expires[key] - time.monotonic()) * 1000) if key in self.expires else -1
+
+    def _rename(self, source, destination) -> bool:
+        source, destination = self._alive(source), self._alive(destination)
+        self.data[destination] = self.data.pop(source)
+        self.expires.pop(destination, None)
+
+        if source in self.expires:
+            self.expires[destination] = self.expires.pop(source)
+
+        return True
+
+    def _keys(self, pattern="*") -> List[bytes]:
+        return [_bytes(key) for key in list(self.data) if self._alive(key) in self.data and fnmatch.fnmatchcase(key, pattern)]
+
+    # Strings
+    def _get(self, key) -> Optional[bytes]:
+        return self.data.get(self._alive(key))
+
+    def _set(self, key, value, ex=None, px=None, nx=False, xx=False) -> Optional[bool]:
+        key = self._alive(key)
+
+        if (nx and key in self.data) or (xx and key not in self.data):
+            return None
+
+        self.data[key] = _bytes(value)
+        self.expires.pop(key, None)
+
+        if ex is not None:
+            self.expires[key] = time.monotonic() + ex
+        elif px is not None:
+            self.expires[key] = time.monotonic() + px / 1000
+
+        return True
+
+    def _setex(self, key, seconds, value) -> bool:
+        return self._set(key, value, ex=seconds)
+
+    def _mget(self, keys, *args) -> List[Optional[bytes]]:
+        keys = [keys, *args] if isinstance(keys, (str, bytes)) else list(keys) + list(args)
+        return [self._get(key) for key in keys]
+
+    def _incr(self, key, amount=1) -> int:
+        return self._incrby(key, amount)
+
+    def _incrby(self, key, amount=1) -> int:
+        key = self._alive(key)
+        value: int = int(self.data.get(key, b"0")) + amount
+        self.data[key] = _bytes(value)
+        return value
+
+    # Hashes
+    def _hset(self, key, field=None, value=None, mapping=None) -> int:
+        hash_: Dict[bytes, bytes] = self._get_typed(key, dict)
+        items: Dict[Any, Any] = dict(mapping or {})
+
+        if field is not None:
+            items[field] = value
+
+        added: int = 0
+
+        for name, item in items.items():
+            added += _bytes(name) not in hash_
+            hash_[_bytes(name)] = _bytes(item)
+
+        return added
+
+    def _hget(self, key, field) -> Optional[bytes]:
+        return self.data.get(self._alive(key), {}).get(_bytes(field))
+
+    def _hgetall(self, key) -> Dict[bytes, bytes]:
+        return dict(self.data.get(self._alive(key), {}))
+
+    def _hmget(self, key, keys, *args) -> List[Optional[bytes]]:
+        fields = [keys, *args] if isinstance(keys, (str, bytes)) else list(keys) + list(args)
+        hash_: Dict[bytes, bytes] = self.data.get(self._alive(key), {})
+        return [hash_.get(_bytes(field)) for field in fields]
+
+    def _hincrby(self, key, field, amount=1) -> int:
+        hash_: Dict[bytes, bytes] = self._get_typed(key, dict)
+        value: int = int(hash_.get(_bytes(field), b"0")) + amount
+        hash_[_bytes(field)] = _bytes(value)
+        return value
+
+    def _hdel(self, key, *fields) -> int:
+        hash_: Dict[bytes, bytes] = self.data.get(self._alive(key), {})
+        return sum(hash_.pop(_bytes(field), None) is not None for field in fields)
+
+    # Sets
+    def _sadd(self, key, *members) -> int:
+        set_: Set[bytes] = self._get_typed(key, set)
+        before: int = len(set_)
+        set_.update(_bytes(member) for member in members)
+        return len(set_) - before
+
+    def _srem(self, key, *members) -> int:
+        set_: Set[bytes] = self.data.get(self._alive(key), set())
+        before: int = len(set_)
+        set_.difference_update(_bytes(member) for member in members)
+        return before - len(set_)
+
+    def _scard(self, key) -> int:
+        return len(self.data.get(self._alive(key), ()))
+
+    def _smembers(self, key) -> Set[bytes]:
+        return set(self.data.get(self._alive(key), ()))
+
+    def _sismember(self, key, member) -> bool:
+        return _bytes(member) in self.data.get(self._alive(key), ())
+
+    def _srandmember(self, key, number=None) -> Union[Optional[bytes], List[bytes]]:
+        members: List[bytes] = list(self.data.get(self._alive(key), ()))
+
+        if number is None:
+            return random.choice(members) if members else None
+
+        return random.sample(members, min(number, len(members)))
+
+    # Sorted sets
+    def _zadd(self, key, mapping, nx=False, xx=False, gt=False) -> int:
+        zset: Dict[bytes, float] = self._get_typed(key, dict)
+        added: int = 0
+
+        for member, score in mapping.items():
+            member = _bytes(member)
+
+            if (nx and member in zset) or (xx and member not in zset) or (gt and member in zset and zset[member] >= score):
+                continue
+
+            added += member not in zset
+            zset[member] = float(score)
+
+        return added
+
+    def _zincrby(self, key, amount, member) -> float:
+        zset: Dict[bytes, float] = self._get_typed(key, dict)
+        zset[_bytes(member)] = zset.get(_bytes(member), 0.0) + amount
+        return zset[_bytes(member)]
+
+    def _zrem(self, key, *members) -> int:
+        zset: Dict[bytes, float] = self.data.get(self._alive(key), {})
+        return sum(zset.pop(_bytes(member), None) is not None for member in members)
+
+    def _zcard(self, key) -> int:
+        return len(self.data.get(self._alive(key), ()))
+
+    def _zscore(self, key, member) -> Optional[float]:
+        return self.data.get(self._alive(key), {}).get(_bytes(member))
+
+    def _sorted(self, key, reverse: bool) -> List[Tuple[bytes, float]]:
+        return sorted(self.data.get(self._alive(key), {}).items(), key=lambda item: (item[1], item[0]), reverse=reverse)
+
+    def _zrevrank(self, key, member) -> Optional[int]:
+        for rank, (name, _) in enumerate(self._sorted(key, True)):
+            if name == _bytes(member):
+                return rank
+
+        return None
+
+    def _zrank(self, key, member) -> Optional[int]:
+        for rank, (name, _) in enumerate(self._sorted(key, False)):
+            if name == _bytes(member):
+                return rank
+
+        return None
+
+    @staticmethod
+    def _slice(items: List[Tuple[bytes, float]], start: int, end: int, withscores: bool) -> list:
+        end = len(items) if end == -1 else end + 1
+        items = items[start:end]
+        return items if withscores else [name for name, _ in items]
+
+    def _zrange(self, key, start, end, withscores=False) -> list:
+        return self._slice(self._sorted(key, False), start, end, withscores)
+
+    def _zrevrange(self, key, start, end, withscores=False) -> list:
+        return self._slice(self._sorted(key, True), start, end, withscores)
+
+    def _zremrangebyscore(self, key, min, max) -> int:
+        members: List[bytes] = self._zrangebyscore(key, min, max)
+        return self._zrem(key, *members) if members else 0
+
+    def _zrangebyscore(self, key, min, max, start=None, num=None, withscores=False) -> list:
+        (low, low_exclusive), (high, high_exclusive) = _score(min), _score(max)
+        items: List[Tuple[bytes, float]] = [
+            (name, score) for name, score in self._sorted(key, False)
+            if (score > low if low_exclusive else score >= low) and (score < high if high_exclusive else score <= high)
+        ]
+
+        if start is not None:
+            items = items[start:start + num]
+
+        return items if withscores else [name for name, _ in items]
+
+    def _zrevrangebyscore(self, key, max, min, start=None, num=None, withscores=False) -> list:
+        items: List[Tuple[bytes, float]] = self._zrangebyscore(key, min, max, withscores=True)[::-1]
+
+        if start is not None:
+            items = items[start:start + num]
+
+        return items if withscores else [name for name, _ in items]
+
+    # Pub/Sub and scripting
+    def _publish(self, channel, message) -> int:
+        receivers: int = 0
+
+        for pubsub in self.subscribers:
+            if _bytes(channel) in pubsub.channels:
+                pubsub.messages.put_nowait({"type": "message", "channel": _bytes(channel), "data": _bytes(message)})
+                receivers += 1
+
+        return receivers
+
+    def pubsub(self) -> "FakePubSub":
+        pubsub: FakePubSub = FakePubSub(self)
+        self.subscribers.append(pubsub)
+        return pubsub
+
+    def _config_get(self, pattern="*") -> dict:
+        return {"notify-keyspace-events": ""}
+
+    def _config_set(self, name, value) -> bool:
+        return True
+
+    def _script_load(self, script) -> str:
+        sha: str = format(abs(hash(script)), "x")
+        self.scripts[sha] = script
+        return sha
+
+    def _evalsha(self, sha, numkeys, *keys_and_args) -> Any:
+        return self._eval(self.scripts[sha], numkeys, *keys_and_args)
+
+    def _eval(self, script, numkeys, *keys_and_args) -> Any:
+        """
+        Scripts are not interpreted. The leaderboard index, giveaway entrant and rate limiter scripts are
+        re-implemented here, compare-and-act lease scripts (``get KEYS[1] == ARGV[1]`` then ``expire`` or ``del``)
+        are applied directly, and anything else reports 0.
+
+        """
+
+        keys, args = keys_and_args[:numkeys], keys_and_args[numkeys:]
+
+        if script == LeaderboardIndex.INCREMENT_SCRIPT:
+            return self.__index_increment(keys, args)
+
+        if script == LeaderboardIndex.BEGIN_REBUILD_SCRIPT:
+            if not self._set(keys[0], args[0], px=int(args[1]), nx=True):
+                return 0
+
+            self._delete(keys[1], keys[2])
+            return 1
+
+        if script == LeaderboardIndex.FINISH_REBUILD_SCRIPT:
+            return self.__index_finish(keys, args)
+
+        if script == RedisLiveGiveaways.ADD_ENTRANTS_SCRIPT:
+            end_time: Optional[bytes] = self._hget(keys[0], "end_time")
+
+            if end_time is None:
+                return 0
+
+            self._sadd(keys[1], *args[1:])
+            return int(self._expireat(keys[1], int(end_time) + int(args[0])))
+
+        if script == FastAPILimiter.lua_script:
+            current: int = int(self._get(keys[0]) or b"0")
+
+            # Limited: milliseconds until the window resets
+            if current > 0 and current + 1 > int(args[0]):
+                return self._pttl(keys[0])
+
+            if current > 0:
+                self._incr(keys[0])
+            else:
+                self._set(keys[0], 1, px=int(args[1]))
+
+            return 0
+
+        if "== ARGV[1]" not in script:
+            return 0
+
+        if self._get(keys[0]) != _bytes(args[0]):
+            return 0
+
+        if "'del'" in script:
+            return self._delete(keys[0])
+
+        return int(self._expire(keys[0], int(args[1])))
+
+    def __index_increment(self, keys: tuple, args: tuple) -> int:
+        xp, stats, version, seeded, rebuilding, journal, writers = keys
+
+        if args[0]:
+            self._zrem(writers, args[0])
+
+        rows: List[tuple] = [args[i:i + 4] for i in range(1, len(args), 4)]
+
+        if self._exists(rebuilding):
+            self._sadd(journal, *(viewer_id for viewer_id, _, _, _ in rows))
+            return 2
+
+        if not self._exists(seeded):
+            return 0
+
+        for viewer_id, comments, experience, coins in rows:
+            self._zincrby(xp, float(experience), viewer_id)
+
+            if int(comments):
+                self._hincrby(stats, f"{viewer_id}:comments", int(comments))
+
+            if int(coins):
+                self._hincrby(stats, f"{viewer_id}:coins", int(coins))
+
+        self._incr(version)
+        return 1
+
+    def __index_finish(self, keys: tuple, args: tuple) -> int:
+        rebuilding, journal, writers, xp_tmp, stats_tmp, xp, stats, seeded, version = keys
+
+        if self._get(rebuilding) != _bytes(args[0]):
+            return -1
+
+        self._zremrangebyscore(writers, "-inf", args[1])
+
+        if self._scard(journal) or self._zcard(writers):
+            return 0
+
+        self._delete(xp, stats)
+
+        for source, destination in ((xp_tmp, xp), (stats_tmp, stats)):
+            if self._exists(source):
+                self._rename(source, destination)
+                self._persist(destination)
+
+        self._set(seeded, 1)
+        self._incr(version)
+        self._delete(rebuilding)
+        return 1
+
+
+class FakePipeline:
+    """
+    Buffers commands and runs them against the :class:`FakeRedis` in one round trip
+
+    """
+
+    def __init__(self, redis: FakeRedis):
+        self.redis: FakeRedis = redis
+        self.calls: List[Tuple[str, tuple, dict]] = []
+
+    def __getattr__(self, name: str):
+        def buffer(*args, **kwargs) -> FakePipeline:
+            self.calls.append((name, args, kwargs))
+            return self
+
+        return buffer
+
+    async def execute(self) -> List[Any]:
+        calls, self.calls = self.calls, []
+        return await self.redis.execute_pipeline(calls)
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.calls = []
+
+
+class FakePubSub:
+    """
+    Channel subscriptions (no keyspace notifications; pattern subscriptions never receive anything)
+
+    """
+
+    def __init__(self, redis: FakeRedis):
+        self.redis: FakeRedis = redis
+        self.channels: Set[bytes] = set()
+        self.messages: asyncio.Queue = asyncio.Queue()
+
+    async def subscribe(self, *channels) -> None:
+        self.channels.update(_bytes(channel) for channel in channels)
+
+    async def psubscribe(self, *patterns) -> None:
+        pass
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+    async def close(self) -> None:
+        self.redis.subscribers.remove(self)
+
+
+class FakeMariaDB:
+    """
+    The ``statistics`` table in a dict, behind the aiomysql pool / connection / cursor API. Statements are matched
+    on their text, so only the ones :mod:`utilities.statistics_sql` issues are understood.
+
+    """
+
+    def __init__(self, trips: Optional[RoundTrips] = None, latency: float = 0.0):
+        self.trips: RoundTrips = trips or RoundTrips()
+        self.latency: float = latency
+
+        # (streamer_id, viewer_id) -> [comments, experience, coins]
+        self.statistics: Dict[Tuple[str, str], List[int]] = dict()
+
+    async def _trip(self, command: str) -> None:
+        self.trips.add("sql", command)
+        await asyncio.sleep(self.latency)
+
+    async def acquire(self) -> "FakeConnection":
+        return FakeConnection(self)
+
+    async def release(self, connection: "FakeConnection") -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+    async def wait_closed(self) -> None:
+        pass
+
+    def seed(self, rows: Iterable[Tuple[str, str, int, int, int]]) -> None:
+        for viewer_id, streamer_id, comments, experience, coins in rows:
+            self.upsert(viewer_id, streamer_id, comments, experience, coins)
+
+    def upsert(self, viewer_id: str, streamer_id: str, comments: int, experience: int, coins: int) -> None:
+        row: List[int] = self.statistics.setdefault((streamer_id, viewer_id), [0, 0, 0])
+        row[0] += int(comments)
+        row[1] += int(experience)
+        row[2] += int(coins)
+
+    def leaderboard(self, streamer_id: str) -> List[tuple]:
+        rows: List[tuple] = [
+            (viewer_id, comments, experience, coins)
+            for (streamer, viewer_id), (comments, experience, coins) in self.statistics.items()
+            if streamer == streamer_id
+        ]
+
+        # (experience DESC, viewer_id DESC), as the covering index reads
+        rows.sort(key=lambda row: (row[2], row[0]), reverse=True)
+        return rows
+
+    def query(self, statement: str, args: Optional[tuple] = None) -> List[tuple]:
+        statement = " ".join(statement.split())
+
+        if "SELECT DISTINCT streamer_id" in statement:
+            return [(streamer_id,) for streamer_id in sorted({streamer_id for streamer_id, _ in self.statistics})]
+
+        if "WHERE viewer_id = %s AND streamer_id = %s" in statement:
+            row: Optional[List[int]] = self.statistics.get((args[1], args[0]))
+            return [tuple(row)] if row is not None else []
+
+        if "viewer_id IN" in statement:
+            streamer_id, viewer_ids = args[0], set(args[1:])
+            return [row for row in self.leaderboard(streamer_id) if row[0] in viewer_ids]
+
+        if "SELECT COUNT(*)" in statement:
+            streamer_id, experience, _, viewer_id = args
+            return [(sum((row[2], row[0]) > (experience, viewer_id) for row in self.leaderboard(streamer_id)),)]
+
+        if "UNION ALL" in statement:
+            streamer_id, experience, viewer_id = args[:3]
+            return [row for row in self.leaderboard(streamer_id) if (row[2], row[0]) < (experience, viewer_id)][:args[-1]]
+
+        if "WHERE streamer_id = %s" in statement:
+            rows: List[tuple] = self.leaderboard(args[0])
+            return rows[:args[-1]] if "LIMIT %s" in statement else rows
+
+        return []
+
+
+class FakeConnection:
+
+    def __init__(self, database: FakeMariaDB):
+        self.database: FakeMariaDB = database
+
+    async def cursor(self) -> "FakeCursor":
+        return FakeCursor(self.database)
+
+    async def commit(self) -> None:
+        await self.database._trip("commit")
+
+    async def rollback(self) -> None:
+        await self.database._trip("rollback")
+
+
+class FakeCursor:
+
+    def __init__(self, database: FakeMariaDB):
+        self.database: FakeMariaDB = database
+        self.rows: List[tuple] = []
+
+    async def execute(self, statement: str, args: Optional[tuple] = None) -> int:
+        await self.database._trip("execute")
+
+        if statement.lstrip().upper().startswith("INSERT"):
+            self.database.upsert(*args)
+            self.rows = []
+            return 1
+
+        self.rows = self.database.query(statement, args)
+        return len(self.rows)
+
+    async def executemany(self, statement: str, args: Iterable[tuple]) -> int:
+        # One multi-row statement, as aiomysql rewrites it
+        await self.database._trip("executemany")
+        args = list(args)
+
+        for row in args:
+            self.database.upsert(*row)
+
+        return len(args)
+
+    async def fetchone(self) -> Optional[tuple]:
+        return self.rows.pop(0) if self.rows else None
+
+    async def fetchmany(self, size: int = 1) -> List[tuple]:
+        rows, self.rows = self.rows[:size], self.rows[size:]
+        return rows
+
+    async def fetchall(self) -> List[tuple]:
+        rows, self.rows = self.rows, []
+        return rows
+
+    async def close(self) -> None:
+        pass
+
+
+class CountingRedis:
+    """
+    Counts round trips made through a real aioredis client
+
+    """
+
+    def __init__(self, redis: Any, trips: RoundTrips):
+        self.redis: Any = redis
+        self.trips: RoundTrips = trips
+
+    def pipeline(self, *args, **kwargs) -> "CountingPipeline":
+        return CountingPipeline(self.redis.pipeline(*args, **kwargs), self.trips)
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.redis, name)
+
+        if not callable(attribute):
+            return attribute
+
+        # aioredis commands are plain methods returning an awaitable, so check what the call returns
+        def command(*args, **kwargs):
+            result: Any = attribute(*args, **kwargs)
+
+            if inspect.isawaitable(result):
+                self.trips.add("redis", name)
+
+            return result
+
+        return command
+
+
+class CountingPipeline:
+
+    def __init__(self, pipeline: Any, trips: RoundTrips):
+        self.pipeline: Any = pipeline
+        self.trips: RoundTrips = trips
+
+    def __getattr__(self, name: str):
+        return getattr(self.pipeline, name)
+
+    async def execute(self, *args, **kwargs) -> List[Any]:
+        self.trips.add("redis", "pipeline")
+        return await self.pipeline.execute(*args, **kwargs)
+
+
+class CountingPool:
+    """
+    Counts statements and commits made through a real aiomysql pool
+
+    """
+
+    def __init__(self, pool: Any, trips: RoundTrips):
+        self.pool: Any = pool
+        self.trips: RoundTrips = trips
+        self.__connections: Dict[int, Any] = dict()
+
+    async def acquire(self) -> "CountingConnection":
+        connection: Any = await self.pool.acquire()
+        return CountingConnection(connection, self.trips)
+
+    async def release(self, connection: "CountingConnection") -> None:
+        await self.pool.release(connection.connection)
+
+    def __getattr__(self, name: str):
+        return getattr(self.pool, name)
+
+
+class CountingConnection:
+
+    def __init__(self, connection: Any, trips: RoundTrips):
+        self.connection: Any = connection
+        self.trips: RoundTrips = trips
+
+    async def cursor(self) -> "CountingCursor":
+        return CountingCursor(await self.connection.cursor(), self.trips)
+
+    async def commit(self) -> None:
+        self.trips.add("sql", "commit")
+        await self.connection.commit()
+
+    async def rollback(self) -> None:
+        self.trips.add("sql", "rollback")
+        await self.connection.rollback()
+
+
+class CountingCursor:
+
+    def __init__(self, cursor: Any, trips: RoundTrips):
+        self.cursor: Any = cursor
+        self.trips: RoundTrips = trips
+
+    async def execute(self, *args, **kwargs) -> int:
+        self.trips.add("sql", "execute")
+        return await self.cursor.execute(*args, **kwargs)
+
+    async def executemany(self, *args, **kwargs) -> int:
+        self.trips.add("sql", "executemany")
+        return await self.cursor.executemany(*args, **kwargs)
+
+    def __getattr__(self, name: str):
+        return getattr(self.cursor, name)
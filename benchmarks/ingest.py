@@ -0,0 +1,209 @@
+"""
+Ingestion benchmark: replays synthetic comment and gift streams through LiveConnectionPool's handlers
+(the same ``_on_comment`` / ``_on_gift`` entry points TikTokLive and the runner workers call).
+
+    python -m benchmarks.ingest [--streamers 50] [--viewers 2000] [--events 200000] [--gift-ratio 0.1]
+                                [--streak-length 5] [--giveaways 10] [--keyword-ratio 0.05] [--rate 0]
+                                [--backend memory|local] [--latency-ms 0.2] [--giveaway-backend memory|redis]
+
+``--backend memory`` (default) uses the in-process fakes in benchmarks/fakes.py. ``--backend local`` uses the
+Redis and MariaDB from config (with benchmark-only streamer names), so the numbers include real network and storage.
+
+Reports sustained events/s (enqueue through flush), handler latency percentiles, and Redis/SQL round trips per event.
+
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import string
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import List, Tuple
+
+import config
+import utilities.config_defaults  # Fills in settings missing from config.py
+from benchmarks.fakes import CountingPool, CountingRedis, FakeMariaDB, FakeRedis, RoundTrips
+
+STREAMER_PREFIX: str = "bench_streamer_"
+KEYWORD: str = "join"
+
+
+def random_id(length: int = 12) -> str:
+    return "".join(random.choices(string.ascii_lowercase + string.digits + "._", k=length))
+
+
+def user(unique_id: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        uniqueId=unique_id,
+        profilePicture=SimpleNamespace(avatar_url=f"https://p16-sign-va.tiktokcdn.com/tos-maliva-avt-0068/{unique_id}~c5_100x100.jpeg")
+    )
+
+
+def comment_event(unique_id: str, text: str) -> SimpleNamespace:
+    return SimpleNamespace(user=user(unique_id), comment=text)
+
+
+def gift_event(unique_id: str, gift_type: int, repeat_count: int, repeat_end: int, diamonds: int) -> SimpleNamespace:
+    return SimpleNamespace(user=user(unique_id), gift=SimpleNamespace(
+        gift_type=gift_type, repeat_count=repeat_count, repeat_end=repeat_end,
+        extended_gift=SimpleNamespace(diamond_count=diamonds)
+    ))
+
+
+def generate(args: argparse.Namespace) -> List[Tuple[str, str, SimpleNamespace]]:
+    """
+    Build the event stream up front so generation cost stays out of the measurement
+
+    :return: [(kind, streamer_id, event)]
+
+    """
+
+    random.seed(args.seed)
+    viewers: List[List[str]] = [[random_id() for _ in range(args.viewers)] for _ in range(args.streamers)]
+    events: List[Tuple[str, str, SimpleNamespace]] = []
+
+    while len(events) < args.events:
+        index: int = random.randrange(args.streamers)
+        streamer_id: str = f"{STREAMER_PREFIX}{index}"
+        viewer: str = random.choice(viewers[index])
+
+        if random.random() >= args.gift_ratio:
+            text: str = random_id(random.randint(4, 40))
+
+            if index < args.giveaways and random.random() < args.keyword_ratio:
+                text = f"{text} {KEYWORD}"
+
+            events.append(("comment", streamer_id, comment_event(viewer, text)))
+            continue
+
+        diamonds: int = random.choice((1, 1, 1, 5, 10, 99))
+
+        # Streakable gifts arrive once per combo step; only the last one (repeat_end) carries coins
+        if random.random() < args.streak_ratio:
+            for step in range(1, args.streak_length + 1):
+                events.append(("gift", streamer_id, gift_event(viewer, 1, step, int(step == args.streak_length), diamonds)))
+        else:
+            events.append(("gift", streamer_id, gift_event(viewer, 2, 1, 1, diamonds * 10)))
+
+    return events[:args.events]
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered: List[float] = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+async def connect(args: argparse.Namespace, trips: RoundTrips):
+    latency: float = args.latency_ms / 1000
+
+    if args.backend == "memory":
+        return FakeMariaDB(trips, latency), FakeRedis(trips, latency), None
+
+    import aiomysql
+    import aioredis
+    from models.mysql import SESSION_INIT_COMMAND, create_template
+
+    redis = aioredis.Redis(host=config.Redis.HOST, port=config.Redis.PORT, password=config.Redis.PASSWORD)
+    pool = await aiomysql.create_pool(
+        host=config.MariaDB.HOST, port=config.MariaDB.PORT,
+        user=config.MariaDB.USERNAME, password=config.MariaDB.PASSWORD,
+        db=config.MariaDB.DATABASE, init_command=SESSION_INIT_COMMAND
+    )
+
+    await create_template(pool, file_path=config.MariaDB.SQL_TEMPLATE_PATH)
+    return CountingPool(pool, trips), CountingRedis(redis, trips), (pool, redis)
+
+
+async def run(args: argparse.Namespace) -> None:
+    # One node, in-process handlers: no runner workers or cluster leases in the measurement
+    config.Runners.WORKERS = 0
+    config.Cluster.ENABLED = False
+    config.GIVEAWAY_BACKEND = args.giveaway_backend
+
+    from livestuff.live import LiveConnectionPool
+
+    events: List[Tuple[str, str, SimpleNamespace]] = generate(args)
+    trips: RoundTrips = RoundTrips()
+    sql_pool, redis, real = await connect(args, trips)
+    live: LiveConnectionPool = LiveConnectionPool(sql_pool, redis)
+
+    now: int = round(datetime.now(timezone.utc).timestamp())
+
+    for index in range(args.giveaways):
+        await live.giveaways.set_giveaway(f"{STREAMER_PREFIX}{index}", {
+            "name": "Benchmark", "join_word": KEYWORD, "winner_count": 1, "start_time": now, "end_time": now + 3600
+        })
+
+    trips.reset()
+    latencies: List[float] = []
+    interval: float = 1 / args.rate if args.rate else 0.0
+    max_depth: int = 0
+    started: float = time.perf_counter()
+
+    for number, (kind, streamer_id, event) in enumerate(events, start=1):
+        handler = live._on_comment if kind == "comment" else live._on_gift
+        before: float = time.perf_counter()
+        handler(streamer_id, event)
+        latencies.append(time.perf_counter() - before)
+        max_depth = max(max_depth, live.ingest.depth)
+
+        # Hand the loop to the consumers between bursts, as a socket read would
+        if number % args.burst == 0:
+            if interval:
+                await asyncio.sleep(max(0.0, started + number * interval - time.perf_counter()))
+            else:
+                await asyncio.sleep(0)
+
+    enqueued: float = time.perf_counter() - started
+    processed, dropped, coalesced, end_depth = live.ingest.processed, live.ingest.dropped, live.ingest.coalesced, live.ingest.depth
+
+    # Drain the pipeline and flush statistics / entrants so every event has reached storage
+    for index in range(args.giveaways):
+        await live.giveaways.del_giveaway(f"{STREAMER_PREFIX}{index}")
+
+    await live.close()
+    elapsed: float = time.perf_counter() - started
+
+    if real is not None:
+        real[0].close()
+        await real[0].wait_closed()
+        await real[1].close()
+
+    count: int = len(events)
+    print(f"{count} events ({sum(kind == 'comment' for kind, _, _ in events)} comments), {args.streamers} streamers x {args.viewers} viewers, backend={args.backend}")
+    print(f"  sustained     {count / elapsed:>12,.0f} events/s  ({elapsed:.3f}s incl. drain and flush)")
+    print(f"  enqueue       {count / enqueued:>12,.0f} events/s  (max depth {max_depth}, {end_depth} at end of stream, {processed} processed in stream)")
+    print(f"  handler p50   {percentile(latencies, 0.50) * 1e6:>12.2f} us")
+    print(f"  handler p99   {percentile(latencies, 0.99) * 1e6:>12.2f} us")
+    print(f"  handler mean  {statistics.mean(latencies) * 1e6:>12.2f} us")
+    print(f"  overflow      dropped={dropped} coalesced={coalesced}")
+    print(f"  round trips   redis={trips.total('redis')} ({trips.total('redis') / count:.4f}/event)  sql={trips.total('sql')} ({trips.total('sql') / count:.4f}/event)")
+
+    for (backend, command), number in sorted(trips.commands.items(), key=lambda item: -item[1]):
+        print(f"    {backend:<6}{command:<16}{number:>10}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--streamers", type=int, default=50)
+    parser.add_argument("--viewers", type=int, default=2000, help="Distinct viewers per stream")
+    parser.add_argument("--events", type=int, default=200000)
+    parser.add_argument("--gift-ratio", type=float, default=0.1, help="Share of events that start a gift")
+    parser.add_argument("--streak-ratio", type=float, default=0.6, help="Share of gifts sent as streaks")
+    parser.add_argument("--streak-length", type=int, default=5, help="Combo steps per streak")
+    parser.add_argument("--giveaways", type=int, default=10, help="Streamers with a running giveaway")
+    parser.add_argument("--keyword-ratio", type=float, default=0.05, help="Share of comments containing the join word")
+    parser.add_argument("--rate", type=float, default=0, help="Target events/s (0: as fast as possible)")
+    parser.add_argument("--burst", type=int, default=100, help="Events handled between loop yields")
+    parser.add_argument("--backend", choices=("memory", "local"), default="memory")
+    parser.add_argument("--latency-ms", type=float, default=0.2, help="Simulated round trip time for the in-memory backend")
+    parser.add_argument("--giveaway-backend", choices=("memory", "redis"), default="memory")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""
+Offline load test for the API in main.py. The app runs under uvicorn in this process with:
+
+- a local aiohttp stub standing in for TikTok's live page and node share endpoint,
+- a stub scrape pool standing in for ``TikTokApi.user``,
+- the in-memory Redis and MariaDB from benchmarks/fakes.py, seeded with leaderboards, giveaways and dashboard tokens.
+
+Virtual clients replay a weighted mix of overlay polling (``/creator/statistics`` + ``/creator/giveaway``),
+dashboard polling (``/creator/dashboard``) and bursts of ``/tiktok/user/page-data``. Page-data requests go through
+the rate limiter, spread over ``--addresses`` viewer addresses.
+
+    python -m benchmarks.loadtest [--clients 50] [--duration 30] [--mix overlay=6,dashboard=2,pagedata=2]
+                                  [--save-baseline benchmarks/baseline.json] [--baseline benchmarks/baseline.json]
+
+Prints throughput and latency percentiles per route. ``--save-baseline`` stores them; ``--baseline`` compares a run
+against a stored one and exits non-zero when a route's p99 or throughput regresses past ``--tolerance``.
+
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import string
+import sys
+import time
+import zlib
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+import uvicorn
+from aiohttp import web
+
+import config
+import utilities.config_defaults  # Fills in settings missing from config.py
+from benchmarks.fakes import FakeMariaDB, FakeRedis, RoundTrips
+from utilities.leaderboard_index import LeaderboardIndex
+
+STREAMER_PREFIX: str = "bench_streamer_"
+USER_PREFIX: str = "bench_user_"
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered: List[float] = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def room_id(username: str) -> str:
+    return str(7000000000000000000 + zlib.crc32(username.encode("utf-8")))
+
+
+class StubUpstream:
+    """
+    TikTok's ``/@{user}/live`` page and ``/node/share/live`` endpoint. A fixed share of users is live.
+
+    """
+
+    def __init__(self, live_ratio: float, page_kb: int, delay: float):
+        self.live_ratio: float = live_ratio
+        self.delay: float = delay
+        self.filler: str = "".join(random.choices(string.ascii_letters + " <>/=\"", k=page_kb * 1024))
+        self.runner: Optional[web.AppRunner] = None
+        self.port: int = 0
+
+    def is_live(self, username: str) -> bool:
+        return zlib.crc32(username.encode("utf-8")) % 1000 < self.live_ratio * 1000
+
+    async def live_page(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.delay)
+        username: str = request.match_info["username"]
+        middle: int = len(self.filler) // 2
+        meta: str = f'<meta property="al:android:url" content="snssdk1233://live?__room_id={room_id(username)}"/>' if self.is_live(username) else ""
+        return web.Response(text=f"<html><head>{self.filler[:middle]}{meta}{self.filler[middle:]}</head></html>", content_type="text/html")
+
+    async def node_share(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.delay)
+        return web.json_response({"body": {"status": "2", "id": request.query.get("id")}})
+
+    async def start(self) -> str:
+        application: web.Application = web.Application()
+        application.router.add_get("/@{username}/live", self.live_page)
+        application.router.add_get("/node/share/live", self.node_share)
+
+        self.runner = web.AppRunner(application)
+        await self.runner.setup()
+        site: web.TCPSite = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+        return f"http://127.0.0.1:{self.port}"
+
+    async def close(self) -> None:
+        await self.runner.cleanup()
+
+
+class StubScrapePool:
+    """
+    Same interface as utilities.scrape_pool.ScrapePool; "scrapes" take ``delay`` seconds and return a fixed-shape profile
+
+    """
+
+    def __init__(self, delay: float, max_pending: int):
+        self.delay: float = delay
+        self.max_pending: int = max_pending
+        self.pending: int = 0
+        self.scrapes: int = 0
+        self.rejected: int = 0
+
+    @property
+    def depth(self) -> int:
+        return self.pending
+
+    async def start(self) -> None:
+        pass
+
+    def shutdown(self) -> None:
+        pass
+
+    async def scrape(self, username: str) -> Tuple[int, Optional[dict]]:
+        from utilities.scrape_pool import ScrapePoolSaturated
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ScrapePoolSaturated()
+
+        self.pending += 1
+
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.pending -= 1
+            self.scrapes += 1
+
+        user_id: str = str(zlib.crc32(username.encode("utf-8")))
+        return 200, {"user_id": user_id, "sec_uid": f"MS4wLjABAAAA{user_id}", "username": username, "payload": {
+            "id": user_id, "uniqueId": username, "nickname": username.title(), "secUid": f"MS4wLjABAAAA{user_id}",
+            "avatarLarger": f"https://p16-sign-va.tiktokcdn.com/tos-maliva-avt-0068/{user_id}~c5_1080x1080.jpeg",
+            "signature": "", "verified": False, "stats": {"followerCount": 1000, "followingCount": 10, "heartCount": 50000, "videoCount": 20}
+        }}
+
+
+class IdleClient:
+    """
+    A tracked stream that never produces events
+
+    """
+
+    async def stop(self) -> None:
+        pass
+
+
+def install(args: argparse.Namespace, upstream: str, trips: RoundTrips):
+    """
+    Point main.app at the stubs and fakes in place of its real startup
+
+    """
+
+    # One node, in-process handlers
+    config.Runners.WORKERS = 0
+    config.Cluster.ENABLED = False
+    config.GIVEAWAY_BACKEND = "memory"
+
+    import main
+    from api.live import TikTokProfileLiveResponse
+    from fastapi_limiter import FastAPILimiter
+    from livestuff.live import LiveConnectionPool
+    from utilities.auth_cache import AuthResolver
+    from utilities.http import create_session
+    from utilities.leaderboard_snapshot import LeaderboardSnapshots
+
+    TikTokProfileLiveResponse.TIKTOK_URL_WEB = f"{upstream}/"
+    TikTokProfileLiveResponse.TIKTOK_LIVE_URL = f"{upstream}/node/share/live"
+
+    app = main.app
+    latency: float = args.latency_ms / 1000
+
+    async def startup():
+        app.scrape_pool = StubScrapePool(args.scrape_ms / 1000, config.TikTokScraping.MAX_PENDING)
+        app.http = create_session()
+        app.sql_pool = FakeMariaDB(trips, latency)
+        app.redis = FakeRedis(trips, latency)
+        app.live = LiveConnectionPool(app.sql_pool, app.redis)
+        app.auth = AuthResolver(app.redis, asyncio.get_running_loop())
+        app.snapshots = LeaderboardSnapshots(app.sql_pool, app.redis, max_age=config.Leaderboard.SNAPSHOT_MAX_AGE)
+        await FastAPILimiter.init(app.redis)
+        await seed(args, app)
+
+    app.router.on_startup = [startup]
+    return app
+
+
+async def seed(args: argparse.Namespace, app) -> None:
+    random.seed(args.seed)
+    now: int = int(time.time())
+
+    for index in range(args.streamers):
+        streamer: str = f"{STREAMER_PREFIX}{index}"
+        viewers: List[str] = [f"viewer_{index}_{viewer}" for viewer in range(args.viewers)]
+
+        app.sql_pool.seed((viewer, streamer, random.randint(0, 500), random.randint(0, 200000), random.randint(0, 5000)) for viewer in viewers)
+        await app.live.avatars.set_many({viewer: f"https://p16-sign-va.tiktokcdn.com/{viewer}~c5_100x100.jpeg" for viewer in viewers})
+        await app.redis.set(f"auth:bench-token-{index}", streamer, ex=3600)
+        app.live.clients[streamer] = IdleClient()
+
+        if index % 2 == 0:
+            await app.live.giveaways.set_giveaway(streamer, {
+                "name": "Benchmark", "join_word": "join", "winner_count": 1, "start_time": now, "end_time": now + 3600
+            })
+
+    # Measure the steady state, not the first reads falling back to MariaDB while the index seeds
+    await LeaderboardIndex(app.redis, app.sql_pool).rebuild()
+    app.redis.trips.reset()
+
+
+class LoadClient:
+
+    def __init__(self, args: argparse.Namespace, base: str, session: aiohttp.ClientSession):
+        self.args: argparse.Namespace = args
+        self.base: str = base
+        self.session: aiohttp.ClientSession = session
+
+        # route -> [latency], route -> Counter(status)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    async def get(self, route: str, headers: Optional[Dict[str, str]] = None, **params) -> None:
+        started: float = time.perf_counter()
+
+        try:
+            async with self.session.get(self.base + route, params=params, headers=headers) as response:
+                await response.read()
+                status: str = str(response.status)
+        except Exception as ex:
+            status: str = type(ex).__name__
+
+        self.latencies[route].append(time.perf_counter() - started)
+        self.statuses[route][status] += 1
+
+    async def overlay(self) -> None:
+        streamer: str = f"{STREAMER_PREFIX}{random.randrange(self.args.streamers)}"
+        await self.get("/creator/statistics", username=streamer)
+        await self.get("/creator/giveaway", username=streamer)
+
+    async def dashboard(self) -> None:
+        await self.get("/creator/dashboard", authorization=f"bench-token-{random.randrange(self.args.streamers)}")
+
+    async def pagedata(self) -> None:
+        users: List[str] = [
+            f"{STREAMER_PREFIX}{random.randrange(self.args.streamers)}" if random.random() < 0.5 else f"{USER_PREFIX}{random.randrange(self.args.users)}"
+            for _ in range(self.args.burst)
+        ]
+
+        # Page views come from many viewers, each with its own rate limit
+        await asyncio.gather(*(
+            self.get("/tiktok/user/page-data", headers={"X-Forwarded-For": f"10.0.{address // 256}.{address % 256}"}, username=user)
+            for user, address in zip(users, random.choices(range(self.args.addresses), k=len(users)))
+        ))
+
+    async def run(self, mix: Dict[str, float], until: float) -> None:
+        scenarios: List[str] = list(mix)
+        weights: List[float] = [mix[scenario] for scenario in scenarios]
+
+        while time.perf_counter() < until:
+            await getattr(self, random.choices(scenarios, weights)[0])()
+            await asyncio.sleep(self.args.think_ms / 1000)
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {name: float(weight) for name, weight in (part.split("=") for part in value.split(","))}
+
+    for name in mix:
+        if name not in ("overlay", "dashboard", "pagedata"):
+            raise argparse.ArgumentTypeError(f"Unknown scenario '{name}'")
+
+    return mix
+
+
+def summarize(clients: List[LoadClient], elapsed: float) -> Dict[str, dict]:
+    routes: Dict[str, dict] = dict()
+
+    for route in sorted({route for client in clients for route in client.latencies}):
+        samples: List[float] = [sample for client in clients for sample in client.latencies[route]]
+        statuses: Counter = sum((client.statuses[route] for client in clients), Counter())
+
+        routes[route] = {
+            "requests": len(samples),
+            "rps": len(samples) / elapsed,
+            "p50": percentile(samples, 0.50) * 1000,
+            "p90": percentile(samples, 0.90) * 1000,
+            "p99": percentile(samples, 0.99) * 1000,
+            "max": max(samples) * 1000,
+            "statuses": dict(statuses)
+        }
+
+    return routes
+
+
+def report(routes: Dict[str, dict], baseline: Optional[dict], tolerance: float) -> bool:
+    """
+    Print the per-route table, with deltas against the baseline when given
+
+    :return: Whether any route regressed past the tolerance
+
+    """
+
+    regressed: bool = False
+    print(f"{'route':<26}{'requests':>10}{'req/s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}  statuses")
+
+    for route, stats in routes.items():
+        print(
+            f"{route:<26}{stats['requests']:>10}{stats['rps']:>10.1f}{stats['p50']:>10.2f}{stats['p90']:>10.2f}"
+            f"{stats['p99']:>10.2f}{stats['max']:>10.2f}  {stats['statuses']}"
+        )
+
+        before: Optional[dict] = (baseline or {}).get("routes", {}).get(route)
+
+        if before is None:
+            continue
+
+        p99: float = stats["p99"] / before["p99"] - 1 if before["p99"] else 0.0
+        rps: float = stats["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+        worse: bool = p99 > tolerance or rps < -tolerance
+        regressed = regressed or worse
+        print(f"{'  vs baseline':<26}{'':>10}{rps:>+10.1%}{'':>10}{'':>10}{p99:>+10.1%}{'':>10}  {'REGRESSED' if worse else 'ok'}")
+
+    return regressed
+
+
+async def run(args: argparse.Namespace) -> bool:
+    stub: StubUpstream = StubUpstream(args.live_ratio, args.page_kb, args.upstream_ms / 1000)
+    upstream: str = await stub.start()
+    trips: RoundTrips = RoundTrips()
+    app = install(args, upstream, trips)
+
+    server: uvicorn.Server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=args.port, log_level="warning"))
+    serving: asyncio.Task = asyncio.create_task(server.serve())
+
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    base: str = f"http://127.0.0.1:{args.port}"
+    connector: aiohttp.TCPConnector = aiohttp.TCPConnector(limit=args.clients * max(args.burst, 1))
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        clients: List[LoadClient] = [LoadClient(args, base, session) for _ in range(args.clients)]
+        started: float = time.perf_counter()
+        await asyncio.gather(*(client.run(args.mix, started + args.duration) for client in clients))
+        elapsed: float = time.perf_counter() - started
+
+    server.should_exit = True
+    await serving
+    await stub.close()
+
+    routes: Dict[str, dict] = summarize(clients, elapsed)
+    total: int = sum(stats["requests"] for stats in routes.values())
+    print(f"{args.clients} clients for {elapsed:.1f}s, mix={args.mix}: {total} requests ({total / elapsed:.1f}/s)")
+    print(f"round trips: redis={trips.total('redis')} sql={trips.total('sql')}\n")
+
+    baseline: Optional[dict] = None
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    regressed: bool = report(routes, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file:
+            json.dump({"args": {key: value for key, value in vars(args).items() if key not in ("baseline", "save_baseline")}, "routes": routes}, file, indent=2)
+
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=50, help="Concurrent virtual clients")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("overlay=6,dashboard=2,pagedata=2"))
+    parser.add_argument("--burst", type=int, default=10, help="Concurrent page-data requests per burst")
+    parser.add_argument("--think-ms", type=float, default=50, help="Pause between a client's scenarios")
+    parser.add_argument("--streamers", type=int, default=20)
+    parser.add_argument("--viewers", type=int, default=500, help="Leaderboard rows per streamer")
+    parser.add_argument("--users", type=int, default=1000, help="Non-streamer usernames looked up by page-data")
+    parser.add_argument("--addresses", type=int, default=10000, help="Viewer addresses page-data requests are rate limited by")
+    parser.add_argument("--live-ratio", type=float, default=0.7)
+    parser.add_argument("--page-kb", type=int, default=250, help="Size of the stub live page")
+    parser.add_argument("--upstream-ms", type=float, default=80, help="Stub TikTok response delay")
+    parser.add_argument("--scrape-ms", type=float, default=400, help="Stub profile scrape duration")
+    parser.add_argument("--latency-ms", type=float, default=0.2, help="Simulated Redis/MariaDB round trip time")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", help="Write this run's results as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed p99/throughput regression vs. the baseline")
+    parser.add_argument("--seed", type=int, default=0)
+
+    if asyncio.run(run(parser.parse_args())):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Room id extraction benchmark: full download + split (the old path) vs. the streaming RoomIdScanner.
+
+    python -m benchmarks.room_id [--fixtures "benchmarks/fixtures/*.html"] [--chunk-size 16384]
+
+Saved live pages can be dropped into benchmarks/fixtures/ (``curl https://www.tiktok.com/@user/live``);
+without any, synthetic pages with the markers at different depths are used.
+
+"""
+
+import argparse
+import glob
+import os
+import random
+import string
+import time
+from typing import Callable, List, Optional, Tuple
+
+from utilities.room_id import RoomIdScanner
+
+
+def split_room_id(html: str) -> Optional[str]:
+    """
+    The original extraction, for comparison
+
+    """
+
+    try:
+        return html.split("__room_id=")[1].split("\"/>")[0]
+    except:
+        pass
+
+    try:
+        return html.split('"roomId":"')[1].split('"}')[0]
+    except:
+        pass
+
+    return None
+
+
+def synthetic_page(size: int, position: float, marker: str) -> Tuple[str, bytes]:
+    filler: str = "".join(random.choices(string.ascii_letters + " <>/=\"", k=size))
+    room_id: str = str(random.randint(10 ** 18, 10 ** 19))
+    at: int = int(size * position)
+
+    if marker == "meta":
+        tag: str = f'<meta property="al:android:url" content="snssdk1233://live?__room_id={room_id}"/>'
+    else:
+        tag: str = f'<script>{{"LiveRoom":{{"roomId":"{room_id}"}}</script>'
+
+    return f"page-{size // 1024}k-{marker}-{int(position * 100)}%", (filler[:at] + tag + filler[at:]).encode("utf-8")
+
+
+def load_pages(pattern: str) -> List[Tuple[str, bytes]]:
+    pages: List[Tuple[str, bytes]] = [(os.path.basename(path), open(path, "rb").read()) for path in sorted(glob.glob(pattern))]
+
+    if pages:
+        return pages
+
+    random.seed(0)
+    return [
+        synthetic_page(size, position, marker)
+        for size in (200 * 1024, 600 * 1024)
+        for position in (0.05, 0.5, 0.95)
+        for marker in ("meta", "json")
+    ]
+
+
+def full_read(page: bytes, chunk_size: int) -> Tuple[Optional[str], int]:
+    body: bytearray = bytearray()
+
+    for i in range(0, len(page), chunk_size):
+        body += page[i:i + chunk_size]
+
+    return split_room_id(bytes(body).decode("utf-8")), len(body)
+
+
+def streamed(page: bytes, chunk_size: int) -> Tuple[Optional[str], int]:
+    scanner: RoomIdScanner = RoomIdScanner()
+
+    for i in range(0, len(page), chunk_size):
+        if scanner.feed(page[i:i + chunk_size]):
+            break
+
+    return scanner.room_id, scanner.bytes_scanned
+
+
+def measure(function: Callable, page: bytes, chunk_size: int, repeat: int) -> Tuple[Optional[str], int, float]:
+    started: float = time.perf_counter()
+
+    for _ in range(repeat):
+        room_id, read = function(page, chunk_size)
+
+    return room_id, read, (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", default=os.path.join(os.path.dirname(__file__), "fixtures", "*.html"))
+    parser.add_argument("--chunk-size", type=int, default=16384)
+    parser.add_argument("--repeat", type=int, default=50)
+    arguments = parser.parse_args()
+
+    print(f"{'page':<28}{'size':>10}{'split read':>12}{'split ms':>10}{'scan read':>12}{'scan ms':>10}  match")
+
+    for name, page in load_pages(arguments.fixtures):
+        old_id, old_read, old_time = measure(full_read, page, arguments.chunk_size, arguments.repeat)
+        new_id, new_read, new_time = measure(streamed, page, arguments.chunk_size, arguments.repeat)
+
+        print(
+            f"{name[:27]:<28}{len(page):>10}{old_read:>12}{old_time * 1000:>10.3f}"
+            f"{new_read:>12}{new_time * 1000:>10.3f}  {old_id == new_id}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Response encoding benchmark: FastAPI's default path (jsonable_encoder + json.dumps) vs. models.response.dumps.
+
+    python -m benchmarks.serialization [--repeat 2000]
+
+"""
+
+import argparse
+import json
+import random
+import string
+import time
+from typing import Any, Callable, Dict, List
+
+from models.response import FilledResponse, dumps, orjson
+
+try:
+    from fastapi.encoders import jsonable_encoder
+except ImportError:
+    jsonable_encoder = None
+
+
+def random_id(length: int = 12) -> str:
+    return "".join(random.choices(string.ascii_lowercase + string.digits + "._", k=length))
+
+
+def leaderboard_payload(rows: int = 100) -> dict:
+    items: List[dict] = []
+
+    for _ in range(rows):
+        experience: int = random.randint(0, 500000)
+        items.append({
+            "avatar_url": f"https://p16-sign-va.tiktokcdn.com/tos-maliva-avt-0068/{random_id(32)}~c5_100x100.jpeg?x-expires=1650000000&x-signature={random_id(28)}",
+            "unique_id": random_id(),
+            "messages": random.randint(0, 5000),
+            "coins": random.randint(0, 100000),
+            "experience": experience,
+            "current_xp": random.randint(0, 1000),
+            "required_xp": random.randint(10, 2000),
+            "level": random.randint(0, 200)
+        })
+
+    return FilledResponse(status=200, payload=items).serialize()
+
+
+def profile_payload() -> dict:
+    user_id: str = str(random.randint(10 ** 18, 10 ** 19))
+    return FilledResponse(status=200, payload={
+        "user": {
+            "id": user_id, "shortId": "", "uniqueId": random_id(), "nickname": "Streamer ✨ Ünïcødé",
+            "avatarLarger": f"https://p16-sign-va.tiktokcdn.com/{random_id(40)}~c5_1080x1080.jpeg",
+            "avatarMedium": f"https://p16-sign-va.tiktokcdn.com/{random_id(40)}~c5_720x720.jpeg",
+            "avatarThumb": f"https://p16-sign-va.tiktokcdn.com/{random_id(40)}~c5_100x100.jpeg",
+            "signature": "Live every night 🎮\n" + " ".join(random_id(8) for _ in range(12)),
+            "createTime": 1580000000, "verified": False, "secUid": "MS4wLjABAAAA" + random_id(52),
+            "ftc": False, "relation": 0, "openFavorite": False, "commentSetting": 0, "duetSetting": 0,
+            "stitchSetting": 0, "privateAccount": False, "secret": False, "isADVirtual": False,
+            "roomId": str(random.randint(10 ** 18, 10 ** 19)), "uniqueIdModifyTime": 0, "ttSeller": False,
+            "bioLink": {"link": "https://example.com/" + random_id(), "risk": 0},
+            "extraInfo": {"statusCode": 0}, "followingVisibility": 1
+        },
+        "stats": {
+            "followerCount": random.randint(0, 10 ** 7), "followingCount": random.randint(0, 5000),
+            "heart": random.randint(0, 10 ** 9), "heartCount": random.randint(0, 10 ** 9),
+            "videoCount": random.randint(0, 3000), "diggCount": random.randint(0, 10 ** 5)
+        },
+        "itemList": [{"id": random_id(19), "desc": " ".join(random_id(6) for _ in range(10)), "createTime": 1650000000 + i} for i in range(30)]
+    }).serialize()
+
+
+def fastapi_default(content: Any) -> bytes:
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def stdlib_only(content: Any) -> bytes:
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def measure(function: Callable[[Any], bytes], content: Any, repeat: int) -> float:
+    started: float = time.perf_counter()
+
+    for _ in range(repeat):
+        function(content)
+
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    arguments = parser.parse_args()
+
+    random.seed(0)
+    payloads: Dict[str, dict] = {"leaderboard (100 rows)": leaderboard_payload(), "profile": profile_payload()}
+    baseline: Callable[[Any], bytes] = fastapi_default if jsonable_encoder is not None else stdlib_only
+    baseline_name: str = "jsonable_encoder+json" if jsonable_encoder is not None else "json (no fastapi)"
+
+    print(f"encoder: {'orjson ' + orjson.__version__ if orjson is not None else 'stdlib fallback'}")
+    print(f"{'payload':<24}{'bytes':>8}{baseline_name:>24}{'dumps':>12}{'speedup':>10}  identical")
+
+    for name, content in payloads.items():
+        old_time: float = measure(baseline, content, arguments.repeat)
+        new_time: float = measure(dumps, content, arguments.repeat)
+        identical: bool = baseline(content) == dumps(content)
+
+        print(f"{name:<24}{len(dumps(content)):>8}{old_time * 1e6:>21.1f}µs{new_time * 1e6:>10.1f}µs{old_time / new_time:>9.1f}x  {identical}")
+
+
+if __name__ == "__main__":
+    main()
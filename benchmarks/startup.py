@@ -0,0 +1,89 @@
+"""
+Cold-start benchmark: import time and resident memory of the service's entry modules, each measured in a fresh
+interpreter, plus the cost of the first TikTokApi use and of spawning the scrape workers.
+
+    python -m benchmarks.startup [--modules main api.live utilities.scrape_pool] [--repeat 5] [--first-use] [--workers 2]
+
+Peak RSS is read from getrusage, so it includes the interpreter itself; the ``python`` row is the baseline.
+
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+# Runs in the child; prints {"seconds": ..., "rss_mb": ...}
+PROBE: str = """
+import json, resource, sys, time
+started = time.perf_counter()
+{body}
+seconds = time.perf_counter() - started
+print(json.dumps({{"seconds": seconds, "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}}))
+"""
+
+IMPORT: str = "import importlib; importlib.import_module({module!r})"
+
+FIRST_USE: str = """
+from utilities.providers import TIKTOK_API
+TIKTOK_API.get()
+"""
+
+SPAWN: str = """
+import asyncio
+from utilities.scrape_pool import ScrapePool
+pool = ScrapePool(workers={workers}, max_pending=1)
+asyncio.run(pool.start())
+pool.shutdown()
+"""
+
+
+def probe(body: str, repeat: int) -> Dict[str, float]:
+    samples: List[dict] = []
+
+    for _ in range(repeat):
+        output: str = subprocess.run(
+            [sys.executable, "-c", PROBE.format(body=body)], capture_output=True, text=True, check=True
+        ).stdout
+
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    return {
+        "seconds": statistics.median(sample["seconds"] for sample in samples),
+        "rss_mb": statistics.median(sample["rss_mb"] for sample in samples)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=["utilities.scrape_pool", "api.live", "api.profile", "livestuff.live", "main"])
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per measurement (median is reported)")
+    parser.add_argument("--first-use", action="store_true", help="Also measure building the TikTokApi instance")
+    parser.add_argument("--workers", type=int, default=0, help="Also measure spawning a scrape pool of this size")
+    args = parser.parse_args()
+
+    rows: Dict[str, str] = {"python": "pass"}
+    rows.update({f"import {module}": IMPORT.format(module=module) for module in args.modules})
+
+    if args.first_use:
+        rows["TikTokApi first use"] = FIRST_USE
+
+    if args.workers:
+        rows[f"spawn {args.workers} scrape workers"] = SPAWN.format(workers=args.workers)
+
+    print(f"{'':<36}{'seconds':>10}{'peak rss MB':>14}")
+
+    for name, body in rows.items():
+        try:
+            result: Dict[str, float] = probe(body, args.repeat)
+        except subprocess.CalledProcessError as ex:
+            print(f"{name:<36}  failed: {ex.stderr.strip().splitlines()[-1] if ex.stderr else ex}")
+            continue
+
+        print(f"{name:<36}{result['seconds']:>10.3f}{result['rss_mb']:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import asyncio
+import bisect
+import hashlib
+import logging
+import os
+import socket
+import time
+import traceback
+from asyncio import AbstractEventLoop, Task
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple
+
+import aioredis
+
+if TYPE_CHECKING:
+    from livestuff.live import LiveConnectionPool
+
+
+class HashRing:
+    """
+    Consistent hash ring with virtual nodes; adding or removing a node only moves that node's share of keys
+
+    """
+
+    REPLICAS: int = 64
+
+    def __init__(self, nodes: Iterable[str], replicas: int = REPLICAS):
+        self.nodes: Set[str] = set(nodes)
+        self.__ring: List[Tuple[int, str]] = sorted(
+            (self.hash(f"{node}#{replica}"), node) for node in self.nodes for replica in range(replicas)
+        )
+        self.__hashes: List[int] = [point for point, _ in self.__ring]
+
+    @staticmethod
+    def hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self.__ring:
+            return None
+
+        index: int = bisect.bisect(self.__hashes, self.hash(key)) % len(self.__ring)
+        return self.__ring[index][1]
+
+
+class LiveCluster:
+    """
+    Spreads tracked streams over every node running the API. Streams are assigned by consistent hashing over
+    the live nodes, and a node only connects to a stream while it holds that stream's lease:
+
+        cluster:nodes            ZSET of node_id -> last heartbeat
+        cluster:streams          SET of usernames that should be tracked
+        lease:stream:{username}  node_id of the owner, expiring unless renewed
+
+    Heartbeats and leases are renewed on their own timer, so a slow rebalance never lets them lapse. When a node dies
+    its heartbeat and leases do lapse, the ring shrinks and the survivors pick its streams up. Streams that fail to
+    connect (usually offline) are retried with exponential backoff rather than every rebalance.
+
+    """
+
+    CLAIM_CONCURRENCY: int = 8
+    MAX_CLAIM_BACKOFF: float = 600
+
+    NODES_KEY: str = "cluster:nodes"
+    STREAMS_KEY: str = "cluster:streams"
+
+    # Compare-and-set on a lease we hold
+    RENEW_SCRIPT: str = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('expire', KEYS[1], ARGV[2]) else return 0 end"
+    RELEASE_SCRIPT: str = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+    def __init__(self, live: LiveConnectionPool, redis: aioredis.Redis, loop: AbstractEventLoop, node_id: Optional[str], lease_ttl: int, interval: float):
+        self.live: LiveConnectionPool = live
+        self.redis: aioredis.Redis = redis
+        self.loop: AbstractEventLoop = loop
+        self.node_id: str = node_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_ttl: int = lease_ttl
+        self.interval: float = interval
+        self.ring: HashRing = HashRing([self.node_id])
+
+        # username -> (retry at, failures)
+        self.__backoff: Dict[str, Tuple[float, int]] = dict()
+        self.__claiming: Set[str] = set()
+        self.__tasks: List[Task] = [self.loop.create_task(self.rebalance_loop()), self.loop.create_task(self.renew_loop())]
+
+    @staticmethod
+    def lease_key(username: str) -> str:
+        return f"lease:stream:{username}"
+
+    async def rebalance_loop(self):
+        while True:
+            try:
+                await self.rebalance()
+            except asyncio.CancelledError:
+                raise
+            except:
+                logging.error(traceback.format_exc())
+
+            await asyncio.sleep(self.interval)
+
+    async def renew_loop(self):
+        while True:
+            try:
+                await self.heartbeat()
+                await self.renew()
+            except asyncio.CancelledError:
+                raise
+            except:
+                logging.error(traceback.format_exc())
+
+            await asyncio.sleep(self.lease_ttl / 3)
+
+    async def heartbeat(self) -> HashRing:
+        now: float = time.time()
+
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.zadd(self.NODES_KEY, {self.node_id: now})
+        pipeline.zremrangebyscore(self.NODES_KEY, "-inf", now - self.lease_ttl)
+        pipeline.zrange(self.NODES_KEY, 0, -1)
+        _, _, nodes = await pipeline.execute()
+
+        self.ring = HashRing(node.decode("utf-8") for node in nodes)
+        return self.ring
+
+    async def renew(self):
+        """
+        Extend every lease we hold, including those of streams still connecting. A lease that lapsed is taken back
+        unless another node holds it by now, in which case that node runs the stream and we disconnect it.
+
+        """
+
+        held: List[str] = list(set(self.live.clients.keys()) | self.__claiming)
+
+        if not held:
+            return
+
+        pipeline = self.redis.pipeline(transaction=False)
+
+        for username in held:
+            pipeline.eval(self.RENEW_SCRIPT, 1, self.lease_key(username), self.node_id, self.lease_ttl)
+
+        lapsed: List[str] = [username for username, renewed in zip(held, await pipeline.execute()) if not renewed]
+
+        if not lapsed:
+            return
+
+        pipeline = self.redis.pipeline(transaction=False)
+
+        for username in lapsed:
+            pipeline.set(self.lease_key(username), self.node_id, ex=self.lease_ttl, nx=True)
+
+        for username, acquired in zip(lapsed, await pipeline.execute()):
+            if not acquired and username in self.live.clients:
+                await self.live.disconnect(username)
+
+    async def rebalance(self):
+        """
+        Hand off streams that now hash elsewhere, and claim unowned streams that hash here
+
+        """
+
+        ring: HashRing = await self.heartbeat()
+        streams: Set[str] = {stream.decode("utf-8") for stream in await self.redis.smembers(self.STREAMS_KEY)}
+        running: List[str] = list(self.live.clients.keys())
+
+        for username in running:
+            if username not in streams or ring.owner(username) != self.node_id:
+                await self.__release(username)
+
+        # Streams we should run, a few connecting at a time, skipping those backing off
+        now: float = time.monotonic()
+        self.__backoff = {username: backoff for username, backoff in self.__backoff.items() if username in streams}
+        claims: List[str] = [
+            username for username in streams
+            if username not in self.live.clients and ring.owner(username) == self.node_id
+            and self.__backoff.get(username, (0.0, 0))[0] <= now
+        ]
+
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(self.CLAIM_CONCURRENCY)
+
+        async def claim(username: str) -> None:
+            async with semaphore:
+                await self.__claim(username)
+
+        await asyncio.gather(*(claim(username) for username in claims))
+
+    async def __claim(self, username: str) -> bool:
+        if not await self.redis.set(self.lease_key(username), self.node_id, ex=self.lease_ttl, nx=True):
+            return False
+
+        # Connecting can take a while; keep the lease renewed meanwhile
+        self.__claiming.add(username)
+
+        try:
+            connected: bool = await self.live.add_client(username)
+        finally:
+            self.__claiming.discard(username)
+
+        if connected:
+            self.__backoff.pop(username, None)
+            return True
+
+        await self.redis.eval(self.RELEASE_SCRIPT, 1, self.lease_key(username), self.node_id)
+
+        failures: int = self.__backoff.get(username, (0.0, 0))[1] + 1
+        self.__backoff[username] = (time.monotonic() + min(self.MAX_CLAIM_BACKOFF, self.interval * 2 ** failures), failures)
+        return False
+
+    async def __release(self, username: str):
+        await self.live.disconnect(username)
+        await self.redis.eval(self.RELEASE_SCRIPT, 1, self.lease_key(username), self.node_id)
+
+    async def track(self, username: str) -> bool:
+        """
+        Add a stream to the cluster. It is connected here if this node owns it, otherwise by its owner on the next rebalance.
+
+        """
+
+        await self.redis.sadd(self.STREAMS_KEY, username)
+
+        if self.ring.owner(username) != self.node_id or await self.owner_of(username) is not None:
+            return True
+
+        # Ours and unowned; connect now and report failures like a single node would
+        if await self.__claim(username):
+            return True
+
+        await self.redis.srem(self.STREAMS_KEY, username)
+        return False
+
+    async def untrack(self, username: str):
+        await self.redis.srem(self.STREAMS_KEY, username)
+
+        if username in self.live.clients:
+            await self.__release(username)
+
+    async def owner_of(self, username: str) -> Optional[str]:
+        owner: Optional[bytes] = await self.redis.get(self.lease_key(username))
+        return owner.decode("utf-8") if owner is not None else None
+
+    async def is_tracking(self, username: str) -> bool:
+        return username in self.live.clients or bool(await self.redis.exists(self.lease_key(username)))
+
+    async def close(self):
+        for task in self.__tasks:
+            task.cancel()
+
+        for username in list(self.live.clients.keys()):
+            await self.__release(username)
+
+        await self.redis.zrem(self.NODES_KEY, self.node_id)
@@ -0,0 +1,45 @@
+import random
+import sys
+from typing import List, Set
+
+
+class EntrantRegistry:
+    """
+    Entrants of one giveaway. Ids are deduplicated in O(1), interned, and kept in an append-only list,
+    so the count is free and a draw of k winners touches k indices without copying the entrants.
+
+    """
+
+    __slots__ = ("__seen", "__ids")
+
+    def __init__(self):
+        self.__seen: Set[str] = set()
+        self.__ids: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.__ids)
+
+    def __contains__(self, unique_id: str) -> bool:
+        return unique_id in self.__seen
+
+    def add(self, unique_id: str) -> bool:
+        """
+        :return: Whether this is a new entrant
+
+        """
+
+        if unique_id in self.__seen:
+            return False
+
+        unique_id = sys.intern(unique_id)
+        self.__seen.add(unique_id)
+        self.__ids.append(unique_id)
+        return True
+
+    def draw(self, winners: int) -> List[str]:
+        """
+        Pick distinct winners uniformly at random
+
+        """
+
+        return [self.__ids[index] for index in random.sample(range(len(self.__ids)), min(len(self.__ids), winners))]
@@ -1,14 +1,12 @@
-import asyncio
 import json
-import random
-from asyncio import AbstractEventLoop
+from asyncio import AbstractEventLoop, TimerHandle
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Set
+from typing import Dict, List, Optional
 
 import aioredis
-from TikTokLive.types.events import CommentEvent
 
 import config
+from livestuff.entrants import EntrantRegistry
 
 
 class LiveGiveaways:
@@ -16,32 +14,60 @@ class LiveGiveaways:
     def __init__(self, loop: AbstractEventLoop, redis: aioredis.Redis):
         self.redis: aioredis.Redis = redis
         self.__giveaways: Dict[str, dict] = dict()
-        self.__entrants: Dict[str, Set[str]] = dict()
+        self.__entrants: Dict[str, EntrantRegistry] = dict()
+        self.__timers: Dict[str, TimerHandle] = dict()
         self.loop: AbstractEventLoop = loop
-        self.loop.create_task(self.check_loop())
 
-    async def check_loop(self):
+    @property
+    def active(self) -> int:
+        return len(self.__giveaways)
 
-        while True:
-            current_time: int = round(datetime.now(timezone.utc).timestamp())
+    def __schedule(self, username: str, end_time: int):
+        """
+        (Re)arm the giveaway's deadline. Nothing runs until it is due.
 
-            for username, giveaway in self.__giveaways.items():
-                self.loop.create_task(self._check_giveaway(username, giveaway, current_time))
+        """
 
-            await asyncio.sleep(2)
+        self.__cancel(username)
+        delay: float = max(0.0, end_time - datetime.now(timezone.utc).timestamp())
+        self.__timers[username] = self.loop.call_at(self.loop.time() + delay, self.__on_deadline, username)
 
-    async def _check_giveaway(self, username: str, giveaway: dict, current_time: int):
+    def __cancel(self, username: str):
+        timer: Optional[TimerHandle] = self.__timers.pop(username, None)
 
-        if current_time > giveaway["end_time"]:
-            giveaway["winners"] = self.pick_winners(username, giveaway["winner_count"])
-            await self.redis.set(f"gresults:{username}", json.dumps(giveaway), ex=config.GIVEAWAY_FINISH_EXPIREY)
-            self.del_giveaway(username)
+        if timer is not None:
+            timer.cancel()
 
-    def set_giveaway(self, username: str, data: dict):
+    def __on_deadline(self, username: str):
+        self.__timers.pop(username, None)
+        giveaway: Optional[dict] = self.__giveaways.get(username)
+
+        if giveaway is not None:
+            self.loop.create_task(self._finish_giveaway(username, dict(giveaway)))
+
+    async def _finish_giveaway(self, username: str, giveaway: dict):
+        giveaway["winners"] = await self.pick_winners(username, giveaway["winner_count"])
+        await self.redis.set(f"gresults:{username}", json.dumps(giveaway), ex=config.GIVEAWAY_FINISH_EXPIREY)
+        await self.del_giveaway(username)
+
+    async def set_giveaway(self, username: str, data: dict):
         self.__giveaways[username] = data
-        self.__entrants[username] = set()
+        self.__entrants[username] = EntrantRegistry()
+        self.__schedule(username, data["end_time"])
+
+    async def update_giveaway(self, username: str, data: dict):
+        """
+        Replace a running giveaway's config, keeping its entrants and rescheduling its end
+
+        """
+
+        self.__giveaways[username] = data
+        self.__entrants.setdefault(username, EntrantRegistry())
+        self.__schedule(username, data["end_time"])
+
+    async def del_giveaway(self, username: str):
+        self.__cancel(username)
 
-    def del_giveaway(self, username: str):
         try:
             del self.__giveaways[username]
         except:
@@ -52,15 +78,24 @@ class LiveGiveaways:
         except:
             pass
 
-    def get_giveaway(self, username: str):
-        return self.__giveaways.get(username)
+    async def get_giveaway(self, username: str) -> Optional[dict]:
+        giveaway: Optional[dict] = self.__giveaways.get(username)
+
+        if giveaway is None:
+            return None
+
+        return {**giveaway, "entrants": len(self.__entrants.get(username, ()))}
 
-    def handle_comment(self, event: CommentEvent, username: str):
+    async def handle_comment(self, username: str, unique_id: str, comment: str):
         giveaway: Optional[dict] = self.__giveaways.get(username)
 
-        if giveaway and giveaway.get("join_word") in event.comment:
-            self.__entrants[username].add(event.user.uniqueId)
+        if giveaway and giveaway.get("join_word") in comment:
+            self.__entrants[username].add(unique_id)
+
+    async def pick_winners(self, username: str, winners: int) -> List[str]:
+        entrants: Optional[EntrantRegistry] = self.__entrants.get(username)
+        return entrants.draw(winners) if entrants is not None else []
 
-    def pick_winners(self, username: str, winners: int) -> List[str]:
-        entrants = self.__entrants.get(username, [])
-        return random.sample(entrants, min(len(entrants), winners))
+    async def close(self):
+        for username in list(self.__timers.keys()):
+            self.__cancel(username)
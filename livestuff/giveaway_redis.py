@@ -0,0 +1,319 @@
+import asyncio
+import json
+import logging
+import time
+import traceback
+import uuid
+from asyncio import AbstractEventLoop, Task
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+
+import aioredis
+
+import config
+
+
+class RedisLiveGiveaways:
+    """
+    Giveaway state shared through Redis, so any worker or node can serve the giveaway endpoints:
+
+        giveaway:{username}                     HASH of the giveaway config
+        giveaway:{username}:entrants            SET of entrant unique ids, expiring a while after the giveaway ends
+        giveaways:schedule                      ZSET of username -> end_time, driving expiry on every node
+        lock:giveaway:{username}                Held by the one node finishing a giveaway
+        giveaway:{username}:flushed:{request}   Nodes that have written their buffered entrants for a draw
+
+    Entrants are buffered on the node that sees the comment, so a draw first asks every node (``giveaways:flush``)
+    to write its buffer and waits for them. Same interface as :class:`livestuff.giveaway.LiveGiveaways`.
+
+    """
+
+    SCHEDULE_KEY: str = "giveaways:schedule"
+    FLUSH_CHANNEL: str = "giveaways:flush"
+    INTEGER_FIELDS: Tuple[str, ...] = ("winner_count", "start_time", "end_time")
+
+    # Seconds
+    CONFIG_CACHE_TTL: float = 1.0
+    ENTRANT_FLUSH_INTERVAL: float = 0.25
+    SCHEDULE_POLL: float = 5.0
+    FINISH_LOCK_EXPIRE: int = 30
+    ENTRANTS_GRACE: int = 3600
+    FLUSH_TIMEOUT: float = 2.0
+    FLUSH_POLL: float = 0.05
+
+    # Entrants only join a giveaway that still exists. KEYS: giveaway, entrants; ARGV: grace, entrant ids
+    ADD_ENTRANTS_SCRIPT: str = """
+        local end_time = redis.call('hget', KEYS[1], 'end_time')
+        if not end_time then return 0 end
+        for i = 2, #ARGV, 1000 do redis.call('sadd', KEYS[2], unpack(ARGV, i, math.min(i + 999, #ARGV))) end
+        redis.call('expireat', KEYS[2], tonumber(end_time) + tonumber(ARGV[1]))
+        return 1
+    """
+
+    RELEASE_LOCK_SCRIPT: str = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+    def __init__(self, loop: AbstractEventLoop, redis: aioredis.Redis):
+        self.redis: aioredis.Redis = redis
+        self.loop: AbstractEventLoop = loop
+
+        # Comment path: join words cached briefly, entrants buffered and pipelined
+        self.__configs: Dict[str, Tuple[float, Optional[dict]]] = dict()
+        self.__pending: Dict[str, Set[str]] = dict()
+
+        self.__finishing: Set[str] = set()
+        self.active: int = 0
+        self.__wakeup: asyncio.Event = asyncio.Event()
+        self.__tasks: List[Task] = [
+            self.loop.create_task(self.schedule_loop()),
+            self.loop.create_task(self.entrant_loop()),
+            self.loop.create_task(self.flush_listener())
+        ]
+
+    @staticmethod
+    def key(username: str) -> str:
+        return f"giveaway:{username}"
+
+    @staticmethod
+    def entrants_key(username: str) -> str:
+        return f"giveaway:{username}:entrants"
+
+    @staticmethod
+    def flushed_key(username: str, request: str) -> str:
+        return f"giveaway:{username}:flushed:{request}"
+
+    @classmethod
+    def __decode(cls, data: Dict[bytes, bytes]) -> Optional[dict]:
+        if not data:
+            return None
+
+        giveaway: dict = {key.decode("utf-8"): value.decode("utf-8") for key, value in data.items()}
+
+        for field in cls.INTEGER_FIELDS:
+            giveaway[field] = int(giveaway[field])
+
+        return giveaway
+
+    async def schedule_loop(self):
+        """
+        Finish due giveaways. Sleeps until the earliest deadline, a local change, or the poll interval
+        (which picks up giveaways scheduled by other nodes).
+
+        """
+
+        while True:
+            try:
+                now: float = datetime.now(timezone.utc).timestamp()
+
+                for username in await self.redis.zrangebyscore(self.SCHEDULE_KEY, "-inf", now):
+                    username: str = username.decode("utf-8")
+
+                    if username not in self.__finishing:
+                        self.__finishing.add(username)
+                        self.loop.create_task(self._finish_giveaway(username))
+
+                upcoming: List[Tuple[bytes, float]] = await self.redis.zrangebyscore(self.SCHEDULE_KEY, f"({now}", "+inf", start=0, num=1, withscores=True)
+                delay: float = min(self.SCHEDULE_POLL, max(0.0, upcoming[0][1] - now)) if upcoming else self.SCHEDULE_POLL
+                self.active = await self.redis.zcard(self.SCHEDULE_KEY)
+            except asyncio.CancelledError:
+                raise
+            except:
+                logging.error(traceback.format_exc())
+                delay: float = self.SCHEDULE_POLL
+
+            try:
+                await asyncio.wait_for(self.__wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+            self.__wakeup.clear()
+
+    async def entrant_loop(self):
+        while True:
+            await asyncio.sleep(self.ENTRANT_FLUSH_INTERVAL)
+
+            try:
+                await self.flush_entrants()
+            except:
+                logging.error(traceback.format_exc())
+
+            # Configs are cached per streamer that comments, giveaway or not; keep only the ones still fresh,
+            # which also drops those of giveaways finished or deleted on other nodes
+            now: float = time.monotonic()
+            self.__configs = {username: cached for username, cached in self.__configs.items() if now - cached[0] < self.CONFIG_CACHE_TTL}
+
+    async def flush_entrants(self, username: Optional[str] = None):
+        """
+        Write buffered entrants in one pipeline (SADD dedupes)
+
+        """
+
+        if username is not None:
+            pending: Dict[str, Set[str]] = {username: self.__pending.pop(username)} if username in self.__pending else dict()
+        else:
+            pending, self.__pending = self.__pending, dict()
+
+        if not pending:
+            return
+
+        pipeline = self.redis.pipeline(transaction=False)
+
+        for streamer, entrants in pending.items():
+            pipeline.eval(self.ADD_ENTRANTS_SCRIPT, 2, self.key(streamer), self.entrants_key(streamer), self.ENTRANTS_GRACE, *entrants)
+
+        await pipeline.execute()
+
+    async def flush_listener(self):
+        """
+        Write this node's buffered entrants whenever a draw asks for them, then acknowledge
+
+        """
+
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.subscribe(self.FLUSH_CHANNEL)
+
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+
+                    username, request = message["data"].decode("utf-8").split(" ", 1)
+                    await self.flush_entrants(username)
+
+                    pipeline = self.redis.pipeline(transaction=False)
+                    pipeline.incr(self.flushed_key(username, request))
+                    pipeline.expire(self.flushed_key(username, request), self.FINISH_LOCK_EXPIRE)
+                    await pipeline.execute()
+
+            except asyncio.CancelledError:
+                raise
+            except:
+                logging.error(traceback.format_exc())
+                await asyncio.sleep(1)
+
+    async def __collect_entrants(self, username: str) -> None:
+        """
+        Have every node write its buffered entrants for a giveaway, waiting at most FLUSH_TIMEOUT for them
+
+        """
+
+        request: str = uuid.uuid4().hex
+        receivers: int = await self.redis.publish(self.FLUSH_CHANNEL, f"{username} {request}")
+        deadline: float = time.monotonic() + self.FLUSH_TIMEOUT
+
+        # No listener reached (e.g. ours is reconnecting); at least write what this node holds
+        if receivers == 0:
+            await self.flush_entrants(username)
+            return
+
+        while int(await self.redis.get(self.flushed_key(username, request)) or 0) < receivers:
+            if time.monotonic() > deadline:
+                logging.error(f"Drawing {username}'s giveaway without entrants from {receivers} unresponsive node(s)")
+                return
+
+            await asyncio.sleep(self.FLUSH_POLL)
+
+    async def _finish_giveaway(self, username: str):
+        lock: str = f"lock:giveaway:{username}"
+        token: str = str(uuid.uuid4())
+
+        # Another node is finishing it
+        if not await self.redis.set(lock, token, ex=self.FINISH_LOCK_EXPIRE, nx=True):
+            self.__finishing.discard(username)
+            return
+
+        try:
+            giveaway: Optional[dict] = self.__decode(await self.redis.hgetall(self.key(username)))
+
+            # Deleted, or rescheduled since we looked
+            if giveaway is None:
+                await self.redis.zrem(self.SCHEDULE_KEY, username)
+                return
+
+            if giveaway["end_time"] > datetime.now(timezone.utc).timestamp():
+                return
+
+            giveaway["winners"] = await self.pick_winners(username, giveaway["winner_count"])
+            await self.redis.set(f"gresults:{username}", json.dumps(giveaway), ex=config.GIVEAWAY_FINISH_EXPIREY)
+            await self.del_giveaway(username)
+
+        finally:
+            self.__finishing.discard(username)
+            self.__configs.pop(username, None)
+            await self.redis.eval(self.RELEASE_LOCK_SCRIPT, 1, lock, token)
+
+    async def set_giveaway(self, username: str, data: dict):
+        self.__pending.pop(username, None)
+        self.__configs.pop(username, None)
+
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.delete(self.key(username), self.entrants_key(username))
+        pipeline.hset(self.key(username), mapping=data)
+        pipeline.zadd(self.SCHEDULE_KEY, {username: data["end_time"]})
+        await pipeline.execute()
+        self.__wakeup.set()
+
+    async def update_giveaway(self, username: str, data: dict):
+        """
+        Replace a running giveaway's config, keeping its entrants and rescheduling its end
+
+        """
+
+        self.__configs.pop(username, None)
+
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.hset(self.key(username), mapping=data)
+        pipeline.zadd(self.SCHEDULE_KEY, {username: data["end_time"]})
+        pipeline.expireat(self.entrants_key(username), data["end_time"] + self.ENTRANTS_GRACE)
+        await pipeline.execute()
+        self.__wakeup.set()
+
+    async def del_giveaway(self, username: str):
+        self.__pending.pop(username, None)
+        self.__configs.pop(username, None)
+
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.delete(self.key(username), self.entrants_key(username))
+        pipeline.zrem(self.SCHEDULE_KEY, username)
+        await pipeline.execute()
+
+    async def get_giveaway(self, username: str) -> Optional[dict]:
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.hgetall(self.key(username))
+        pipeline.scard(self.entrants_key(username))
+        data, entrants = await pipeline.execute()
+
+        giveaway: Optional[dict] = self.__decode(data)
+
+        if giveaway is None:
+            return None
+
+        # Buffered entrants may already be in the set; they show up here within ENTRANT_FLUSH_INTERVAL
+        return {**giveaway, "entrants": entrants}
+
+    async def __get_config(self, username: str) -> Optional[dict]:
+        cached: Optional[Tuple[float, Optional[dict]]] = self.__configs.get(username)
+
+        if cached is not None and time.monotonic() - cached[0] < self.CONFIG_CACHE_TTL:
+            return cached[1]
+
+        giveaway: Optional[dict] = self.__decode(await self.redis.hgetall(self.key(username)))
+        self.__configs[username] = (time.monotonic(), giveaway)
+        return giveaway
+
+    async def handle_comment(self, username: str, unique_id: str, comment: str):
+        giveaway: Optional[dict] = await self.__get_config(username)
+
+        if giveaway and giveaway.get("join_word") in comment:
+            self.__pending.setdefault(username, set()).add(unique_id)
+
+    async def pick_winners(self, username: str, winners: int) -> List[str]:
+        await self.__collect_entrants(username)
+        picked: List[bytes] = await self.redis.srandmember(self.entrants_key(username), winners)
+        return [winner.decode("utf-8") for winner in picked]
+
+    async def close(self):
+        for task in self.__tasks:
+            task.cancel()
+
+        await self.flush_entrants()
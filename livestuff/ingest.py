@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+import traceback
+from asyncio import AbstractEventLoop, Task
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Tuple
+
+from TikTokLive.types.events import CommentEvent, GiftEvent
+
+import config
+from utilities.metrics import INGEST_COALESCED, INGEST_DROPPED, LIVE_EVENTS
+
+if TYPE_CHECKING:
+    from livestuff.live import LiveConnectionPool
+
+
+class LiveEvent:
+    """
+    Compact record of one comment or gift: everything storage needs, nothing the TikTokLive event drags along.
+    Records for the same (streamer, viewer) can be merged into one.
+
+    """
+
+    # Comment texts kept when records merge; only giveaway join words are looked for in them
+    MAX_TEXTS: int = 16
+
+    __slots__ = ("streamer_id", "viewer_id", "avatar_url", "comments", "experience", "coins", "texts", "gifts", "enqueued_at")
+
+    def __init__(self, streamer_id: str, viewer_id: str, avatar_url: Optional[str], comments: int, experience: int, coins: int, texts: Optional[List[str]] = None, gifts: int = 0):
+        self.streamer_id: str = streamer_id
+        self.viewer_id: str = viewer_id
+        self.avatar_url: Optional[str] = avatar_url
+        self.comments: int = comments
+        self.experience: int = experience
+        self.coins: int = coins
+        self.texts: Optional[List[str]] = texts
+        self.gifts: int = gifts
+        self.enqueued_at: float = time.monotonic()
+
+    @classmethod
+    def from_comment(cls, streamer_id: str, event: CommentEvent) -> LiveEvent:
+        add_xp: int = random.randint(config.Leaderboard.MAX_ADD_CHAT_XP, config.Leaderboard.MAX_ADD_CHAT_XP)
+        return cls(streamer_id, event.user.uniqueId, event.user.profilePicture.avatar_url, 1, add_xp, 0, [event.comment])
+
+    @classmethod
+    def from_gift(cls, streamer_id: str, event: GiftEvent) -> Optional[LiveEvent]:
+        coins = 0
+
+        # If it's type 1 and the streak is over
+        if event.gift.gift_type == 1 and event.gift.repeat_end == 1:
+            coins = event.gift.repeat_count * event.gift.extended_gift.diamond_count * 2
+
+        # It's not type 1, which means it can't have a streak & is automatically over
+        elif event.gift.gift_type != 1:
+            coins = event.gift.extended_gift.diamond_count * 2
+
+        # Number of sent coins
+        if coins < 1:
+            return None
+
+        # Add Statistics
+        xp_per_coin: int = random.randint(config.Leaderboard.MIN_ADD_PER_COIN_XP, config.Leaderboard.MAX_ADD_PER_COIN_XP)
+        add_xp: int = xp_per_coin * coins
+        return cls(streamer_id, event.user.uniqueId, event.user.profilePicture.avatar_url, 0, add_xp, coins, gifts=1)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.streamer_id, self.viewer_id
+
+    def merge(self, other: LiveEvent) -> None:
+        self.comments += other.comments
+        self.experience += other.experience
+        self.coins += other.coins
+        self.gifts += other.gifts
+        self.avatar_url = other.avatar_url or self.avatar_url
+
+        if other.texts:
+            self.texts = (self.texts or []) + other.texts
+
+            # Most recent ones win
+            if len(self.texts) > self.MAX_TEXTS:
+                del self.texts[:-self.MAX_TEXTS]
+
+
+class IngestPipeline:
+    """
+    Bounded hand-off between TikTokLive callbacks and storage. Handlers only enqueue a :class:`LiveEvent`;
+    one consumer per shard applies statistics, avatar and giveaway effects a batch at a time.
+
+    When a shard is full, the overflow policy either coalesces new events per (streamer, viewer) until the
+    consumer catches up, or drops the oldest queued event. Coalescing holds at most ``capacity`` pairs per shard;
+    past that, it drops the oldest queued event too.
+
+    """
+
+    COALESCE: str = "coalesce"
+    DROP_OLDEST: str = "drop-oldest"
+
+    def __init__(self, live: LiveConnectionPool, loop: AbstractEventLoop, shards: int, capacity: int, batch_size: int, policy: str = COALESCE):
+        if policy not in (self.COALESCE, self.DROP_OLDEST):
+            raise ValueError(f"Unknown overflow policy '{policy}'")
+
+        self.live: LiveConnectionPool = live
+        self.loop: AbstractEventLoop = loop
+        self.shards: int = shards
+        self.capacity: int = capacity
+        self.batch_size: int = batch_size
+        self.policy: str = policy
+
+        self.__queues: List[Deque[LiveEvent]] = [deque() for _ in range(shards)]
+        self.__overflow: List[Dict[Tuple[str, str], LiveEvent]] = [dict() for _ in range(shards)]
+        self.__wakeups: List[asyncio.Event] = [asyncio.Event() for _ in range(shards)]
+        self.__closing: bool = False
+        self.__consumers: List[Task] = [self.loop.create_task(self.consume(shard)) for shard in range(shards)]
+
+        # Reporting
+        self.processed: int = 0
+        self.dropped: int = 0
+        self.coalesced: int = 0
+        self.lag: float = 0.0
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.__queues) + sum(len(overflow) for overflow in self.__overflow)
+
+    def put(self, event: LiveEvent) -> None:
+        # Counted here so events merged in runner processes count once each
+        if event.comments:
+            LIVE_EVENTS.inc(event.streamer_id, "comment", amount=event.comments)
+
+        if event.gifts:
+            LIVE_EVENTS.inc(event.streamer_id, "gift", amount=event.gifts)
+
+        shard: int = hash(event.streamer_id) % self.shards
+        queue: Deque[LiveEvent] = self.__queues[shard]
+
+        if len(queue) >= self.capacity:
+            overflow: Dict[Tuple[str, str], LiveEvent] = self.__overflow[shard]
+            existing: Optional[LiveEvent] = overflow.get(event.key) if self.policy == self.COALESCE else None
+
+            if existing is not None:
+                existing.merge(event)
+                self.coalesced += 1
+                INGEST_COALESCED.inc()
+
+            elif self.policy == self.COALESCE and len(overflow) < self.capacity:
+                overflow[event.key] = event
+
+            else:
+                queue.popleft()
+                queue.append(event)
+                self.dropped += 1
+                INGEST_DROPPED.inc()
+
+            self.__wakeups[shard].set()
+            return
+
+        queue.append(event)
+        self.__wakeups[shard].set()
+
+    def __take(self, shard: int) -> List[LiveEvent]:
+        queue: Deque[LiveEvent] = self.__queues[shard]
+        batch: List[LiveEvent] = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+
+        if len(batch) < self.batch_size and self.__overflow[shard]:
+            batch.extend(self.__overflow[shard].values())
+            self.__overflow[shard] = dict()
+
+        return batch
+
+    async def consume(self, shard: int) -> None:
+        # Runs until close, then finishes whatever is queued
+        while not self.__closing:
+            await self.__wakeups[shard].wait()
+            self.__wakeups[shard].clear()
+            await self.drain(shard)
+
+    async def drain(self, shard: int) -> None:
+        while True:
+            batch: List[LiveEvent] = self.__take(shard)
+
+            if not batch:
+                return
+
+            self.lag = time.monotonic() - min(event.enqueued_at for event in batch)
+
+            try:
+                await self.apply(batch)
+            except asyncio.CancelledError:
+                raise
+            except:
+                logging.error(traceback.format_exc())
+
+            self.processed += len(batch)
+
+    async def apply(self, batch: List[LiveEvent]) -> None:
+        avatars: Dict[str, str] = dict()
+
+        for event in batch:
+            self.live.registry.touch(event.streamer_id)
+            self.live.statistics.add(event.viewer_id, event.streamer_id, event.comments, event.experience, event.coins)
+
+            if event.avatar_url:
+                avatars[event.viewer_id] = event.avatar_url
+
+            for text in event.texts or ():
+                await self.live.giveaways.handle_comment(event.streamer_id, event.viewer_id, text)
+
+        await self.live.avatars.set_many(avatars)
+
+    async def close(self) -> None:
+        """
+        Apply everything queued, including batches the consumers are applying right now, then stop them
+
+        """
+
+        self.__closing = True
+
+        for wakeup in self.__wakeups:
+            wakeup.set()
+
+        await asyncio.gather(*self.__consumers, return_exceptions=True)
@@ -1,8 +1,7 @@
 import asyncio
 import logging
-import random
 import traceback
-from typing import List, Dict
+from typing import List, Dict, Optional, Union
 
 import aiomysql
 import aioredis
@@ -11,19 +10,134 @@ from TikTokLive.types import FailedConnection
 from TikTokLive.types.events import CommentEvent, GiftEvent
 
 import config
+import utilities.config_defaults  # Fills in settings missing from config.py
+from livestuff.cluster import LiveCluster
 from livestuff.giveaway import LiveGiveaways
-from utilities.statistics_sql import StatisticSQL
+from livestuff.giveaway_redis import RedisLiveGiveaways
+from livestuff.ingest import IngestPipeline, LiveEvent
+from livestuff.registry import StreamRegistry
+from livestuff.runners import CLIENT_OPTIONS, LiveRunnerPool, RemoteClient
+from utilities.avatar_store import AvatarStore
+from utilities.leaderboard_index import LeaderboardIndex
+from utilities.statistics_buffer import StatisticBuffer
 
 
 class LiveConnectionPool:
 
     def __init__(self, sql_pool: aiomysql.Pool, redis: aioredis.Redis):
+        # Streams are spread over nodes, so each node's in-memory giveaways would only see part of the comments
+        if config.Cluster.ENABLED and config.GIVEAWAY_BACKEND != "redis":
+            raise ValueError("Cluster mode needs config.GIVEAWAY_BACKEND = \"redis\"")
+
         self.sql_pool: aiomysql.Pool = sql_pool
         self.redis: aioredis.Redis = redis
-        self.clients: Dict[str, TikTokLiveClient] = dict()
-        self.giveaways: LiveGiveaways = LiveGiveaways(asyncio.get_running_loop(), self.redis)
+        self.clients: Dict[str, Union[TikTokLiveClient, RemoteClient]] = dict()
+        self.giveaways: Union[LiveGiveaways, RedisLiveGiveaways] = (
+            RedisLiveGiveaways if config.GIVEAWAY_BACKEND == "redis" else LiveGiveaways
+        )(asyncio.get_running_loop(), self.redis)
+        self.avatars: AvatarStore = AvatarStore(self.redis)
+        self.statistics: StatisticBuffer = StatisticBuffer(
+            self.sql_pool, asyncio.get_running_loop(),
+            flush_interval=config.Leaderboard.FLUSH_INTERVAL, flush_size=config.Leaderboard.FLUSH_SIZE,
+            index=LeaderboardIndex(self.redis, self.sql_pool)
+        )
+
+        self.ingest: IngestPipeline = IngestPipeline(
+            self, asyncio.get_running_loop(), shards=config.Ingest.SHARDS, capacity=config.Ingest.CAPACITY,
+            batch_size=config.Ingest.BATCH_SIZE, policy=config.Ingest.OVERFLOW_POLICY
+        )
+
+        # Tracked streams outlive restarts; in cluster mode the cluster's stream set is the registry
+        self.registry: StreamRegistry = StreamRegistry(
+            self.redis, asyncio.get_running_loop(), flush_interval=config.Restore.ACTIVITY_FLUSH_INTERVAL,
+            key=LiveCluster.STREAMS_KEY if config.Cluster.ENABLED else StreamRegistry.TRACKED_KEY
+        )
+
+        self.runners: Optional[LiveRunnerPool] = None
+
+        if config.Runners.WORKERS > 0:
+            self.runners = LiveRunnerPool(self, asyncio.get_running_loop(), workers=config.Runners.WORKERS, flush_interval=config.Runners.FLUSH_INTERVAL)
+
+        self.cluster: Optional[LiveCluster] = None
+
+        if config.Cluster.ENABLED:
+            self.cluster = LiveCluster(
+                self, self.redis, asyncio.get_running_loop(), node_id=config.Cluster.NODE_ID,
+                lease_ttl=config.Cluster.LEASE_TTL, interval=config.Cluster.REBALANCE_INTERVAL
+            )
+
+    async def close(self) -> None:
+        # Hand streams back to the cluster; giveaways outlive this process
+        if self.cluster is not None:
+            await self.cluster.close()
+
+        for username in list(self.clients.keys()):
+            await self.disconnect(username)
+
+        if self.runners is not None:
+            await self.runners.close()
+
+        await self.ingest.close()
+        await self.registry.close()
+        await self.statistics.close()
+        await self.giveaways.close()
+
+    async def track(self, username: str) -> bool:
+        """
+        Start tracking a stream, on whichever node owns it in cluster mode
+
+        """
+
+        if self.cluster is not None:
+            tracked: bool = await self.cluster.track(username)
+        else:
+            tracked: bool = await self.add_client(username)
+
+        if tracked:
+            await self.registry.add(username)
+
+        return tracked
+
+    def restore(self) -> None:
+        """
+        Reconnect the streams tracked before the last restart, in the background. In cluster mode the rebalance
+        loop already claims them from the shared stream set.
+
+        """
+
+        if self.cluster is not None:
+            return
+
+        self.registry.start_restore(
+            self.__restore_client, self.disconnect, concurrency=config.Restore.CONCURRENCY, jitter=config.Restore.JITTER,
+            backoff=config.Restore.BACKOFF, max_backoff=config.Restore.MAX_BACKOFF, attempts=config.Restore.ATTEMPTS
+        )
+
+    async def __restore_client(self, username: str) -> bool:
+        # Re-tracked by its creator while waiting
+        if username in self.clients:
+            return True
+
+        return await self.add_client(username)
+
+    async def untrack(self, username: str) -> bool:
+        await self.registry.remove(username)
+
+        if self.cluster is not None:
+            await self.cluster.untrack(username)
+        else:
+            await self.disconnect(username)
+
+        await self.giveaways.del_giveaway(username)
+        return True
+
+    async def is_tracking(self, username: str) -> bool:
+        if self.cluster is not None:
+            return await self.cluster.is_tracking(username)
+
+        return bool(self.clients.get(username))
 
-    async def remove_client(self, username: str) -> bool:
+    async def disconnect(self, username: str) -> None:
         c = self.clients.get(username)
 
         try:
@@ -36,42 +150,37 @@ class LiveConnectionPool:
         except:
             pass
 
-        self.giveaways.del_giveaway(username)
-        return True
+    def _on_comment(self, streamer_id: str, event: CommentEvent) -> None:
+        self.ingest.put(LiveEvent.from_comment(streamer_id, event))
+
+    def _on_gift(self, streamer_id: str, event: GiftEvent) -> None:
+        live_event: Optional[LiveEvent] = LiveEvent.from_gift(streamer_id, event)
+
+        if live_event is not None:
+            self.ingest.put(live_event)
 
     async def add_client(self, username: str) -> bool:
-        client: TikTokLiveClient = TikTokLiveClient(unique_id=username, **{"process_initial_data": False, "enable_extended_gift_info": True})
 
+        # Connect in a runner process
+        if self.runners is not None:
+            remote: Optional[RemoteClient] = await self.runners.start(username)
+
+            if remote is None:
+                return False
+
+            self.clients[username] = remote
+            return True
+
+        client: TikTokLiveClient = TikTokLiveClient(unique_id=username, **CLIENT_OPTIONS)
+
+        # Handlers only enqueue; storage happens in the ingest pipeline
         @client.on("comment")
         async def _on_message(event: CommentEvent):
-            sql: StatisticSQL = StatisticSQL(self.sql_pool)
-            add_xp: int = random.randint(config.Leaderboard.MAX_ADD_CHAT_XP, config.Leaderboard.MAX_ADD_CHAT_XP)
-            await self.redis.set(f"avatar:{event.user.uniqueId}", event.user.profilePicture.avatar_url, ex=14400)
-            await sql.update_statistics(event.user.uniqueId, client.unique_id, 1, add_xp, 0)
-            self.giveaways.handle_comment(event, client.unique_id)
+            self._on_comment(client.unique_id, event)
 
         @client.on("gift")
         async def _on_gift(event: GiftEvent):
-            coins = 0
-
-            # If it's type 1 and the streak is over
-            if event.gift.gift_type == 1 and event.gift.repeat_end == 1:
-                coins = event.gift.repeat_count * event.gift.extended_gift.diamond_count * 2
-
-            # It's not type 1, which means it can't have a streak & is automatically over
-            elif event.gift.gift_type != 1:
-                coins = event.gift.extended_gift.diamond_count * 2
-
-            # Number of sent coins
-            if coins < 1:
-                return
-
-            # Add Statistics
-            xp_per_coin: int = random.randint(config.Leaderboard.MIN_ADD_PER_COIN_XP, config.Leaderboard.MAX_ADD_PER_COIN_XP)
-            add_xp: int = xp_per_coin * coins
-            sql: StatisticSQL = StatisticSQL(self.sql_pool)
-            await sql.update_statistics(event.user.uniqueId, client.unique_id, 0, add_xp, coins)
-            await self.redis.set(f"avatar:{event.user.uniqueId}", event.user.profilePicture.avatar_url, ex=14400)
+            self._on_gift(client.unique_id, event)
 
         # Add the client
         try:
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import random
+import time
+import traceback
+from asyncio import AbstractEventLoop, Task
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aioredis
+
+
+class StreamRegistry:
+    """
+    Tracked streams persisted in Redis so they survive a restart, ranked by recent activity:
+
+        live:tracked    SET of usernames being tracked (``cluster:streams`` in cluster mode, so both agree)
+        live:activity   ZSET of username -> last time a comment or gift was seen
+
+    :meth:`restore` reconnects them after a restart: most recently active first, at most ``concurrency`` at a time,
+    each start jittered, and streams that fail to connect (usually offline) retried with exponential backoff.
+
+    """
+
+    TRACKED_KEY: str = "live:tracked"
+    ACTIVITY_KEY: str = "live:activity"
+
+    # Restore states
+    PENDING: str = "pending"
+    CONNECTED: str = "connected"
+    RETRYING: str = "retrying"
+    FAILED: str = "failed"
+
+    def __init__(self, redis: aioredis.Redis, loop: AbstractEventLoop, key: str = TRACKED_KEY, flush_interval: float = 30):
+        self.redis: aioredis.Redis = redis
+        self.loop: AbstractEventLoop = loop
+        self.key: str = key
+        self.flush_interval: float = flush_interval
+
+        # Activity is batched into one ZADD per interval
+        self.__activity: Dict[str, float] = dict()
+        self.__restoring: Dict[str, str] = dict()
+        self.__started_at: Optional[float] = None
+        self.__finished_at: Optional[float] = None
+        self.__tasks: List[Task] = [self.loop.create_task(self.flush_loop())]
+
+    async def add(self, username: str) -> None:
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.sadd(self.key, username)
+        pipeline.zadd(self.ACTIVITY_KEY, {username: time.time()}, nx=True)
+        await pipeline.execute()
+
+    async def remove(self, username: str) -> None:
+        # Stops an in-progress restore of this stream too
+        self.__restoring.pop(username, None)
+        self.__activity.pop(username, None)
+
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.srem(self.key, username)
+        pipeline.zrem(self.ACTIVITY_KEY, username)
+        await pipeline.execute()
+
+    def touch(self, username: str) -> None:
+        self.__activity[username] = time.time()
+
+    async def flush(self) -> None:
+        if not self.__activity:
+            return
+
+        activity, self.__activity = self.__activity, dict()
+        await self.redis.zadd(self.ACTIVITY_KEY, activity)
+
+    async def flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except:
+                logging.error(traceback.format_exc())
+
+    async def tracked(self) -> List[str]:
+        """
+        Tracked usernames, most recently active first
+
+        """
+
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.smembers(self.key)
+        pipeline.zrange(self.ACTIVITY_KEY, 0, -1, withscores=True)
+        members, activity = await pipeline.execute()
+
+        scores: Dict[bytes, float] = dict(activity)
+        return [member.decode("utf-8") for member in sorted(members, key=lambda member: -scores.get(member, 0.0))]
+
+    async def restore(
+            self,
+            connect: Callable[[str], Awaitable[bool]],
+            disconnect: Callable[[str], Awaitable[None]],
+            concurrency: int,
+            jitter: float,
+            backoff: float,
+            max_backoff: float,
+            attempts: int
+    ) -> None:
+        """
+        Reconnect every tracked stream. Returns once each has connected or used up its attempts; streams that never
+        connect stay registered and are retried on the next start.
+
+        """
+
+        usernames: List[str] = await self.tracked()
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+
+        self.__restoring = {username: self.PENDING for username in usernames}
+        self.__started_at, self.__finished_at = time.monotonic(), None
+
+        async def reconnect(priority: int, username: str) -> None:
+            # Spread starts over the jitter window, keeping activity order between windows
+            await asyncio.sleep(random.uniform(0, jitter) + priority * jitter / max(concurrency, 1))
+
+            for attempt in range(attempts):
+                # Untracked while we were waiting
+                if username not in self.__restoring:
+                    return
+
+                async with semaphore:
+                    try:
+                        connected: bool = await connect(username)
+                    except asyncio.CancelledError:
+                        raise
+                    except:
+                        logging.error(traceback.format_exc())
+                        connected: bool = False
+
+                # Untracked while connecting; don't leave it running
+                if connected and username not in self.__restoring:
+                    await disconnect(username)
+                    return
+
+                if connected:
+                    self.__restoring[username] = self.CONNECTED
+                    return
+
+                if attempt + 1 < attempts and username in self.__restoring:
+                    self.__restoring[username] = self.RETRYING
+                    await asyncio.sleep(min(max_backoff, backoff * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+            if username in self.__restoring:
+                self.__restoring[username] = self.FAILED
+
+        try:
+            await asyncio.gather(*(reconnect(priority, username) for priority, username in enumerate(usernames)))
+        finally:
+            self.__finished_at = time.monotonic()
+
+    def start_restore(self, *args, **kwargs) -> Task:
+        task: Task = self.loop.create_task(self.restore(*args, **kwargs))
+        self.__tasks.append(task)
+        return task
+
+    def count(self, state: str) -> int:
+        return sum(current == state for current in self.__restoring.values())
+
+    @property
+    def progress(self) -> dict:
+        states: Tuple[str, ...] = (self.PENDING, self.RETRYING, self.CONNECTED, self.FAILED)
+        started, finished = self.__started_at, self.__finished_at
+
+        return {
+            "total": len(self.__restoring),
+            **{state: self.count(state) for state in states},
+            "running": started is not None and finished is None,
+            "seconds": round(((finished or time.monotonic()) - started), 2) if started is not None else 0.0
+        }
+
+    async def close(self) -> None:
+        for task in self.__tasks:
+            task.cancel()
+
+        await self.flush()
@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import threading
+import time
+import traceback
+from asyncio import AbstractEventLoop, Future, Task
+from typing import TYPE_CHECKING, Dict, List, Optional, Set, Tuple
+
+from TikTokLive import TikTokLiveClient
+from TikTokLive.types.events import CommentEvent, GiftEvent
+
+from livestuff.ingest import LiveEvent
+
+if TYPE_CHECKING:
+    from livestuff.live import LiveConnectionPool
+
+CLIENT_OPTIONS: dict = {"process_initial_data": False, "enable_extended_gift_info": True}
+
+
+class _LiveRunner:
+    """
+    Runs inside a worker process: owns a set of TikTokLiveClients on its own event loop and sends
+    per-(streamer, viewer) aggregated events back to the API process
+
+    """
+
+    def __init__(self, commands: multiprocessing.Queue, events: multiprocessing.Queue, flush_interval: float):
+        self.commands: multiprocessing.Queue = commands
+        self.events: multiprocessing.Queue = events
+        self.flush_interval: float = flush_interval
+        self.clients: Dict[str, TikTokLiveClient] = dict()
+        self.starting: Set[str] = set()
+        self.pending: Dict[Tuple[str, str], LiveEvent] = dict()
+
+    def record(self, event: Optional[LiveEvent]) -> None:
+        if event is None:
+            return
+
+        existing: Optional[LiveEvent] = self.pending.get(event.key)
+
+        if existing is None:
+            self.pending[event.key] = event
+        else:
+            existing.merge(event)
+
+    def flush(self) -> None:
+        if self.pending:
+            pending, self.pending = self.pending, dict()
+            self.events.put(("events", list(pending.values())))
+
+    async def flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    async def start(self, username: str) -> bool:
+        client: TikTokLiveClient = TikTokLiveClient(unique_id=username, **CLIENT_OPTIONS)
+
+        @client.on("comment")
+        async def _on_message(event: CommentEvent):
+            self.record(LiveEvent.from_comment(client.unique_id, event))
+
+        @client.on("gift")
+        async def _on_gift(event: GiftEvent):
+            self.record(LiveEvent.from_gift(client.unique_id, event))
+
+        self.starting.add(username)
+
+        try:
+            await client.start()
+        except:
+            return False
+        finally:
+            stopped: bool = username not in self.starting
+            self.starting.discard(username)
+
+        # Stopped while connecting (e.g. the API gave up waiting)
+        if stopped:
+            await self.stop_client(client)
+            return False
+
+        self.clients[username] = client
+        return True
+
+    async def stop(self, username: str) -> bool:
+        self.starting.discard(username)
+        await self.stop_client(self.clients.pop(username, None))
+        return True
+
+    @staticmethod
+    async def stop_client(client: Optional[TikTokLiveClient]) -> None:
+        if client is None:
+            return
+
+        try:
+            await client.stop()
+        except:
+            pass
+
+    async def handle(self, action: str, request_id: int, username: str) -> None:
+        try:
+            result: bool = await (self.start(username) if action == "start" else self.stop(username))
+        except:
+            logging.error(traceback.format_exc())
+            result: bool = False
+
+        self.events.put(("result", request_id, result))
+
+    async def run(self) -> None:
+        loop: AbstractEventLoop = asyncio.get_running_loop()
+        loop.create_task(self.flush_loop())
+
+        while True:
+            command: Optional[Tuple[str, int, str]] = await loop.run_in_executor(None, self.commands.get)
+
+            # Shutdown
+            if command is None:
+                break
+
+            loop.create_task(self.handle(*command))
+
+        for username in list(self.clients.keys()):
+            await self.stop(username)
+
+        self.flush()
+
+
+def _run_worker(commands: multiprocessing.Queue, events: multiprocessing.Queue, flush_interval: float) -> None:
+    asyncio.run(_LiveRunner(commands, events, flush_interval).run())
+
+
+class RemoteClient:
+    """
+    Stand-in for a TikTokLiveClient that lives in a runner process
+
+    """
+
+    def __init__(self, runners: LiveRunnerPool, worker: int, unique_id: str):
+        self.runners: LiveRunnerPool = runners
+        self.worker: int = worker
+        self.unique_id: str = unique_id
+
+    async def stop(self) -> None:
+        await self.runners.stop(self.unique_id)
+
+
+class LiveRunnerPool:
+    """
+    Spreads live connections over worker processes, each with its own event loop, so websocket and protobuf work
+    for big streams stays off the API loop. Workers report aggregated :class:`LiveEvent` batches over a queue,
+    which are fed into the API process's ingest pipeline. A worker that dies is respawned and its streams are
+    reconnected on the workers that are up.
+
+    """
+
+    REQUEST_TIMEOUT: float = 30
+    WATCH_INTERVAL: float = 1.0
+    RESTART_CONCURRENCY: int = 8
+
+    def __init__(self, live: LiveConnectionPool, loop: AbstractEventLoop, workers: int, flush_interval: float):
+        self.live: LiveConnectionPool = live
+        self.loop: AbstractEventLoop = loop
+        self.workers: int = workers
+
+        self.flush_interval: float = flush_interval
+
+        # Spawn, so workers never inherit the API's loop or sockets
+        self.__context = multiprocessing.get_context("spawn")
+        self.events: multiprocessing.Queue = self.__context.Queue()
+        self.commands: List[multiprocessing.Queue] = [self.__context.Queue() for _ in range(workers)]
+        self.processes: List[multiprocessing.Process] = [self.__spawn(i) for i in range(workers)]
+
+        self.assignments: Dict[str, int] = dict()
+        self.__requests: Dict[int, Tuple[int, Future]] = dict()
+        self.__request_ids: itertools.count = itertools.count()
+        self.__reader: threading.Thread = threading.Thread(target=self.__read, daemon=True)
+        self.__reader.start()
+        self.__watcher: Task = self.loop.create_task(self.watch())
+
+    def __spawn(self, worker: int) -> multiprocessing.Process:
+        process: multiprocessing.Process = self.__context.Process(
+            target=_run_worker, args=(self.commands[worker], self.events, self.flush_interval), daemon=True
+        )
+
+        process.start()
+        return process
+
+    def load(self) -> List[int]:
+        """
+        Number of streams assigned to each worker
+
+        """
+
+        load: List[int] = [0] * self.workers
+
+        for worker in self.assignments.values():
+            load[worker] += 1
+
+        return load
+
+    def __read(self) -> None:
+        while True:
+            message: Optional[tuple] = self.events.get()
+
+            if message is None:
+                return
+
+            self.loop.call_soon_threadsafe(self.__dispatch, message)
+
+    def __dispatch(self, message: tuple) -> None:
+        if message[0] == "result":
+            _, request_id, result = message
+            _, future = self.__requests.pop(request_id, (None, None))
+
+            if future is not None and not future.done():
+                future.set_result(result)
+
+        elif message[0] == "events":
+            received: float = time.monotonic()
+
+            for event in message[1]:
+                event.enqueued_at = received
+                self.live.ingest.put(event)
+
+    async def __request(self, worker: int, action: str, username: str) -> bool:
+        if not self.processes[worker].is_alive():
+            logging.error(f"Live runner {worker} is not running")
+            return False
+
+        request_id: int = next(self.__request_ids)
+        future: Future = self.loop.create_future()
+        self.__requests[request_id] = (worker, future)
+        self.commands[worker].put((action, request_id, username))
+
+        try:
+            return await asyncio.wait_for(future, timeout=self.REQUEST_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.__requests.pop(request_id, None)
+
+            # Reported as failed, so make sure the worker does not connect it anyway
+            if action == "start":
+                self.commands[worker].put(("stop", next(self.__request_ids), username))
+
+            return False
+
+    async def start(self, username: str) -> Optional[RemoteClient]:
+        load: List[int] = self.load()
+        worker: int = min(range(self.workers), key=lambda i: (not self.processes[i].is_alive(), load[i]))
+
+        if not await self.__request(worker, "start", username):
+            return None
+
+        self.assignments[username] = worker
+        return RemoteClient(self, worker, username)
+
+    async def stop(self, username: str) -> None:
+        worker: Optional[int] = self.assignments.pop(username, None)
+
+        if worker is not None:
+            await self.__request(worker, "stop", username)
+
+    async def watch(self) -> None:
+        while True:
+            await asyncio.sleep(self.WATCH_INTERVAL)
+
+            for worker, process in enumerate(self.processes):
+                if not process.is_alive():
+                    try:
+                        await self.__respawn(worker)
+                    except asyncio.CancelledError:
+                        raise
+                    except:
+                        logging.error(traceback.format_exc())
+
+    async def __respawn(self, worker: int) -> None:
+        logging.error(f"Live runner {worker} exited with code {self.processes[worker].exitcode}, respawning it")
+
+        # Nothing will answer the dead worker's requests
+        for request_id, (requested_by, future) in list(self.__requests.items()):
+            if requested_by == worker:
+                del self.__requests[request_id]
+
+                if not future.done():
+                    future.set_result(False)
+
+        # A worker that died mid-read can leave its queue locked, so the new one gets a fresh queue
+        self.commands[worker] = self.__context.Queue()
+        self.processes[worker] = self.__spawn(worker)
+
+        orphaned: List[str] = [username for username, assigned in self.assignments.items() if assigned == worker]
+
+        for username in orphaned:
+            del self.assignments[username]
+
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(self.RESTART_CONCURRENCY)
+
+        # The old clients stay in live.clients until replaced, so the streams still count as tracked meanwhile
+        async def restart(username: str, client: Optional[RemoteClient]) -> None:
+            async with semaphore:
+                if client is None or self.live.clients.get(username) is not client:
+                    return
+
+                remote: Optional[RemoteClient] = await self.start(username)
+
+                # Disconnected while reconnecting
+                if self.live.clients.get(username) is not client:
+                    if remote is not None:
+                        await self.stop(username)
+
+                    return
+
+                if remote is not None:
+                    self.live.clients[username] = remote
+                    return
+
+                # Left for the next restore or rebalance to pick up
+                del self.live.clients[username]
+                logging.warning(f"Could not reconnect {username} after live runner {worker} exited")
+
+        await asyncio.gather(*(restart(username, self.live.clients.get(username)) for username in orphaned))
+
+    async def close(self) -> None:
+        self.__watcher.cancel()
+
+        for commands in self.commands:
+            commands.put(None)
+
+        # Workers flush their last batch on the way out
+        for process in self.processes:
+            await self.loop.run_in_executor(None, process.join, self.REQUEST_TIMEOUT)
+
+        self.events.put(None)
+        await self.loop.run_in_executor(None, self.__reader.join)
+        await asyncio.sleep(0)
@@ -1,33 +1,47 @@
 import asyncio
 import os
+import time
 from asyncio import AbstractEventLoop
 from typing import Mapping, List, Optional
 
+import aiohttp
 import aiomysql as aiomysql
 import aioredis as aioredis
 import uvicorn
-from fastapi import Depends, FastAPI
+from fastapi import Depends, FastAPI, Request
 from fastapi_limiter import FastAPILimiter
 from fastapi_limiter.depends import RateLimiter
 from pydantic import BaseModel
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import PlainTextResponse
+from starlette.routing import Match
 
 import config
+import utilities.config_defaults  # Fills in settings missing from config.py
 from api.authgen.authgen import GenerateAuthToken
 from api.authgen.authgencheck import CheckAuthGenToken
-from api.creator import TikTokCreatorResponse
 from api.getdashboard import GetDashboardData
 from api.giveaways.gcreate import CreateGiveawayResponse
 from api.giveaways.gdelete import DeleteGiveawayResponse
 from api.giveaways.gretrieve import RetrieveGiveawayResponse
 from api.giveaways.gupdate import UpdateGiveawayResponse
+from api.leaderboard import LeaderboardPageResponse, ViewerRankResponse
 from api.live import TikTokProfileLiveResponse
 from api.mantrack import ManageTrackingResponse
+from api.pagedata import TikTokPageDataResponse
 from api.profile import TikTokProfileResponse
+from api.restore import RestoreProgressResponse
 from livestuff.live import LiveConnectionPool
-from models.mysql import create_template
+from livestuff.registry import StreamRegistry
+from models.mysql import SESSION_INIT_COMMAND, create_template
 from models.payload import GiveawayConfig
-from models.response import FilledResponse
+from models.response import SerializedResponse
+from utilities.leaderboard_snapshot import LeaderboardSnapshots
+from utilities.statistics_sql import StatisticSQL
+from utilities.auth_cache import AuthResolver
+from utilities import metrics
+from utilities.http import create_session
+from utilities.scrape_pool import ScrapePool
 
 os.environ["CUDA_VISIBLE_DEVICES"] = "-1"
 
@@ -43,6 +57,7 @@ class LiveTokAPI(FastAPI):
             "title": "LiveTok Backend",
             "version": "0.6.9",
             "openapi_url": "/api-docs",
+            "default_response_class": SerializedResponse,
         }
         extra.update(new)
         return extra
@@ -69,6 +84,10 @@ class LiveTokAPI(FastAPI):
 
         self.sql_pool: Optional[aiomysql.Pool] = None
         self.live: Optional[LiveConnectionPool] = None
+        self.snapshots: Optional[LeaderboardSnapshots] = None
+        self.http: Optional[aiohttp.ClientSession] = None
+        self.auth: Optional[AuthResolver] = None
+        self.scrape_pool: ScrapePool = ScrapePool(workers=config.TikTokScraping.WORKERS, max_pending=config.TikTokScraping.MAX_PENDING)
 
 
 app: LiveTokAPI = LiveTokAPI(
@@ -81,101 +100,178 @@ app: LiveTokAPI = LiveTokAPI(
 @app.on_event("startup")
 async def startup():
     print("Go for launch!")
+    await app.scrape_pool.start()
+    app.http = create_session()
 
     app.sql_pool = await aiomysql.create_pool(
         host=config.MariaDB.HOST, port=config.MariaDB.PORT,
         user=config.MariaDB.USERNAME, password=config.MariaDB.PASSWORD,
-        db=config.MariaDB.DATABASE, loop=app.loop
+        db=config.MariaDB.DATABASE, loop=app.loop, init_command=SESSION_INIT_COMMAND
     )
 
+    if await StatisticSQL(app.sql_pool).migrate_primary_key():
+        print("Added the statistics primary key; the old table is kept as statistics_unkeyed")
+
     await create_template(app.sql_pool, file_path=config.MariaDB.SQL_TEMPLATE_PATH)
     app.redis = aioredis.Redis(host=app.redis_host, port=app.redis_port, password=app.redis_password)
     app.live = LiveConnectionPool(app.sql_pool, app.redis)
+    app.auth = AuthResolver(app.redis, asyncio.get_running_loop())
+    app.snapshots = LeaderboardSnapshots(app.sql_pool, app.redis, max_age=config.Leaderboard.SNAPSHOT_MAX_AGE)
     await FastAPILimiter.init(app.redis)
 
+    # Reconnect previously tracked streams without holding up startup
+    app.live.restore()
+
+    # Sampled at scrape time
+    metrics.LIVE_CLIENTS.set_function(lambda: len(app.live.clients))
+    metrics.ACTIVE_GIVEAWAYS.set_function(lambda: app.live.giveaways.active)
+    metrics.INGEST_DEPTH.set_function(lambda: app.live.ingest.depth)
+    metrics.INGEST_LAG.set_function(lambda: app.live.ingest.lag)
+    metrics.STATISTICS_DEPTH.set_function(lambda: app.live.statistics.depth)
+    metrics.SCRAPE_DEPTH.set_function(lambda: app.scrape_pool.depth)
+    metrics.RESTORE.set_function(lambda: {
+        (state,): app.live.registry.count(state) for state in (StreamRegistry.PENDING, StreamRegistry.RETRYING, StreamRegistry.CONNECTED, StreamRegistry.FAILED)
+    })
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    # Flush buffered statistics before the pool goes away
+    if app.live is not None:
+        await app.live.close()
+
+    if app.auth is not None:
+        app.auth.close()
+
+    if app.sql_pool is not None:
+        app.sql_pool.close()
+        await app.sql_pool.wait_closed()
+
+    app.scrape_pool.shutdown()
+
+    if app.http is not None:
+        await app.http.close()
+
+
+def route_template(request: Request) -> str:
+    """
+    The matched route's path template, so /tiktok/user?username=... is one series rather than one per user
+
+    """
+
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+
+        if match == Match.FULL:
+            return route.path
+
+    return "unmatched"
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started: float = time.perf_counter()
+
+    try:
+        return await call_next(request)
+    finally:
+        metrics.ROUTE_LATENCY.observe(time.perf_counter() - started, route_template(request), request.method)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+async def authorized(authorization: str) -> Optional[str]:
+    """
+    Resolve the dashboard authorization token to its username (None if invalid)
+
+    """
+
+    return await app.auth.resolve(authorization)
+
 
 @app.put("/creator/dashboard/giveaway", tags=['Giveaway'])
-async def create_giveaway(authorization: str, giveaway_config: GiveawayConfig):
-    return (await CreateGiveawayResponse(authorization=authorization, data=giveaway_config, redis=app.redis, live=app.live).complete()).serialize()
+async def create_giveaway(giveaway_config: GiveawayConfig, username: Optional[str] = Depends(authorized)):
+    return (await CreateGiveawayResponse(username=username, data=giveaway_config, redis=app.redis, live=app.live).complete()).response()
 
 
 @app.patch("/creator/dashboard/giveaway", tags=['Giveaway'])
-async def update_giveaway(authorization: str, giveaway_config: GiveawayConfig):
-    return (await UpdateGiveawayResponse(authorization=authorization, data=giveaway_config, redis=app.redis, live=app.live).complete()).serialize()
+async def update_giveaway(giveaway_config: GiveawayConfig, username: Optional[str] = Depends(authorized)):
+    return (await UpdateGiveawayResponse(username=username, data=giveaway_config, redis=app.redis, live=app.live).complete()).response()
 
 
 @app.delete("/creator/dashboard/giveaway", tags=['Giveaway'])
-async def delete_giveaway(authorization: str, pick_winner: bool):
-    return (await DeleteGiveawayResponse(authorization=authorization, pick_winner=pick_winner, redis=app.redis, live=app.live).complete()).serialize()
+async def delete_giveaway(pick_winner: bool, username: Optional[str] = Depends(authorized)):
+    return (await DeleteGiveawayResponse(username=username, pick_winner=pick_winner, redis=app.redis, live=app.live).complete()).response()
 
 
 @app.get("/creator/giveaway", tags=['Giveaway'])
 async def get_giveaway(username: str):
-    return (await RetrieveGiveawayResponse(username=username, redis=app.redis, live=app.live).complete()).serialize()
+    return (await RetrieveGiveawayResponse(username=username, redis=app.redis, live=app.live).complete()).response()
 
 
 @app.get("/creator/auth/generate", tags=['Authentication'])
 async def gen_auth_code(client_id: str):
-    return (await GenerateAuthToken(client_id=client_id, redis=app.redis).complete()).serialize()
+    return (await GenerateAuthToken(client_id=client_id, redis=app.redis).complete()).response()
 
 
 @app.post("/creator/auth/check", tags=['Authentication'])
 async def check_auth_code(client_id: str, username: str):
-    return (await CheckAuthGenToken(username=username, client_id=client_id, redis=app.redis).complete()).serialize()
+    return (await CheckAuthGenToken(username=username, client_id=client_id, redis=app.redis, scrape_pool=app.scrape_pool).complete()).response()
 
 
 @app.get("/creator/dashboard", tags=['Dashboard'])
-async def get_dashboard_data(authorization: str):
-    return (await GetDashboardData(authorization=authorization, redis=app.redis, live=app.live).complete()).serialize()
+async def get_dashboard_data(username: Optional[str] = Depends(authorized)):
+    return (await GetDashboardData(username=username, redis=app.redis, live=app.live).complete()).response()
 
 
 @app.post("/creator/dashboard/start", tags=['Dashboard'])
-async def start_tracking_data(authorization: str):
-    return (await ManageTrackingResponse(authorization=authorization, redis=app.redis, live=app.live, start_or_stop=True).complete()).serialize()
+async def start_tracking_data(username: Optional[str] = Depends(authorized)):
+    return (await ManageTrackingResponse(username=username, redis=app.redis, live=app.live, start_or_stop=True).complete()).response()
 
 
 @app.post("/creator/dashboard/stop", tags=['Dashboard'])
-async def stop_tracking_data(authorization: str):
-    return (await ManageTrackingResponse(authorization=authorization, redis=app.redis, live=app.live, start_or_stop=False).complete()).serialize()
+async def stop_tracking_data(username: Optional[str] = Depends(authorized)):
+    return (await ManageTrackingResponse(username=username, redis=app.redis, live=app.live, start_or_stop=False).complete()).response()
+
+
+@app.get("/live/restore", tags=['Dashboard'])
+async def get_restore_progress():
+    return (await RestoreProgressResponse(live=app.live).complete()).response()
 
 
 @app.get("/tiktok/user", tags=['User'], dependencies=[Depends(RateLimiter(times=50, seconds=10))])
 async def get_tiktok_user(username: str, use_cache: bool = True):
-    return (await TikTokProfileResponse(username=username, redis=app.redis, use_cache=use_cache).complete()).serialize()
+    return (await TikTokProfileResponse(username=username, redis=app.redis, scrape_pool=app.scrape_pool, use_cache=use_cache).complete()).response()
 
 
 @app.get("/tiktok/user/live", tags=['User'], dependencies=[Depends(RateLimiter(times=50, seconds=10))])
 async def get_tiktok_user_live(username: str):
-    return (await TikTokProfileLiveResponse(username=username).complete()).serialize()
+    return (await TikTokProfileLiveResponse(username=username, http=app.http, redis=app.redis).complete()).response()
 
 
 @app.get("/creator/statistics", tags=['User'])
-async def get_creator_statistics(username: str):
-    return (await TikTokCreatorResponse(username=username, sql_pool=app.sql_pool, redis=app.redis).complete()).serialize()
-
-
-@app.get("/tiktok/user/page-data", tags=['User'], dependencies=[Depends(RateLimiter(times=50, seconds=10))])
-async def get_tiktok_user_page_data(username: str):
-    live_data: TikTokProfileLiveResponse = await TikTokProfileLiveResponse(username=username).complete()
+async def get_creator_statistics(username: str, request: Request, cursor: Optional[str] = None, limit: Optional[int] = None):
+    # Paginated on request; the plain top-100 leaderboard is served from its snapshot
+    if cursor is not None or limit is not None:
+        return (await LeaderboardPageResponse(username=username, cursor=cursor, limit=limit, sql_pool=app.sql_pool, redis=app.redis).complete()).response()
 
-    # Live doesn't exist
-    if live_data.status == 404:
-        return FilledResponse(status=404, payload=None).serialize()
+    return (await app.snapshots.get(username)).to_response(request.headers.get("accept-encoding", ""))
 
-    # Live does exist, get user data
-    user_data: TikTokProfileResponse = await TikTokProfileResponse(username=username, redis=app.redis, use_cache=True).complete()
-    payload: dict = user_data.payload
-    payload["roomId"] = live_data.payload
 
-    # Get Leaderboard Data
-    leaderboard_data = await TikTokCreatorResponse(username=username, sql_pool=app.sql_pool, redis=app.redis).complete()
-    payload["leaderboards"] = leaderboard_data.payload
+@app.get("/creator/statistics/rank", tags=['User'])
+async def get_viewer_rank(username: str, viewer: str):
+    return (await ViewerRankResponse(username=username, viewer=viewer, sql_pool=app.sql_pool, redis=app.redis).complete()).response()
 
-    # Get Giveaway Data
-    giveaway_data = (await RetrieveGiveawayResponse(username, app.live, app.redis).complete())
-    payload["giveaway"] = giveaway_data.payload
 
-    return FilledResponse(status=user_data.status, payload=payload).serialize()
+@app.get("/tiktok/user/page-data", tags=['User'], dependencies=[Depends(RateLimiter(times=50, seconds=10))])
+async def get_tiktok_user_page_data(username: str):
+    return (await TikTokPageDataResponse(
+        username=username, redis=app.redis, http=app.http,
+        live=app.live, scrape_pool=app.scrape_pool, snapshots=app.snapshots
+    ).complete()).response()
 
 
 if __name__ == "__main__":
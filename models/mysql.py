@@ -1,7 +1,12 @@
+from __future__ import annotations
+
 import enum
-from typing import Any
+from typing import Optional
+
+from aiomysql import Connection, Cursor, Pool
 
-from aiomysql import Pool
+# Applied to every pooled connection, so each statement sees committed data without a pre-commit
+SESSION_INIT_COMMAND: str = "SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED"
 
 
 class StatementEnum(enum.Enum):
@@ -30,20 +35,50 @@ class DefaultsEnum(StatementEnum):
         return 'null' if value is None else value
 
 
+class SQLSession:
+    """
+    Unit of work over a single pooled connection. Every statement run through the session
+    shares one acquire and one transaction, committed on exit or rolled back on error.
+
+    A session is not safe to use from concurrent tasks; share it sequentially across a request or batch.
+
+    """
+
+    def __init__(self, pool: Pool):
+        self.pool: Pool = pool
+        self.connection: Optional[Connection] = None
+        self.cursor: Optional[Cursor] = None
+
+    async def __aenter__(self) -> SQLSession:
+        self.connection = await self.pool.acquire()
+        self.cursor = await self.connection.cursor()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        try:
+            if exc_type is None:
+                await self.connection.commit()
+            else:
+                await self.connection.rollback()
+        finally:
+            await self.cursor.close()
+            await self.pool.release(self.connection)
+            self.connection, self.cursor = None, None
+
+
 def SQLEntryPoint(function):
+    """
+    Run a statement helper method with a session. Helpers bound to a session (``self.session``) join that
+    unit of work; otherwise the call gets its own session, committed when the method returns.
+
+    """
 
     async def wrapper(self, *args, **kwargs):
-        async with self.pool.acquire() as connection:
-            async with connection.cursor() as cursor:
-                # Pre-Commit to solve REPEATABLE READ
-                # https://stackoverflow.com/questions/9318347/why-are-some-mysql-connections-selecting-old-data-the-mysql-database-after-a-del
-                await connection.commit()
-                self.connection, self.cursor = connection, cursor
-                result: Any = await function(self, *args, **kwargs)
-                self.connection, self.cursor = None, None
-                await connection.commit()
-
-                return result
+        if self.session is not None:
+            return await function(self, self.session, *args, **kwargs)
+
+        async with SQLSession(self.pool) as session:
+            return await function(self, session, *args, **kwargs)
 
     return wrapper
 
@@ -60,5 +95,10 @@ async def create_template(pool: Pool, file_path: str) -> None:
     async with pool.acquire() as connection:
         async with connection.cursor() as cursor:
             await cursor.execute(open(file_path, encoding='utf-8').read())
+
+            # One result per statement in the file
+            while await cursor.nextset():
+                pass
+
             await connection.commit()
 
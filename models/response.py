@@ -1,7 +1,48 @@
 from __future__ import annotations
 
+import functools
+import json
+import time
 from abc import ABCMeta, abstractmethod, ABC
-from typing import Any
+from typing import Any, Callable
+
+from starlette.responses import Response
+
+from utilities.metrics import COMPLETE_LATENCY
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode a payload the way FastAPI's JSONResponse does (compact, UTF-8, no NaN), through orjson when it is installed.
+    Content orjson cannot encode (e.g. integers beyond 64 bits) falls back to the standard library.
+
+    """
+
+    if orjson is not None:
+        try:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        except (TypeError, orjson.JSONEncodeError):
+            pass
+
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class SerializedResponse(Response):
+    """
+    JSON response that skips jsonable_encoder; accepts pre-encoded bytes as-is
+
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return content if isinstance(content, bytes) else dumps(content)
+
 
 class APIResponse:
     __metaclass__ = ABCMeta
@@ -25,6 +66,12 @@ class APIResponse:
             "payload": self.payload
         }
 
+    def render(self) -> bytes:
+        return dumps(self.serialize())
+
+    def response(self) -> SerializedResponse:
+        return SerializedResponse(self.render())
+
 class FilledResponse(APIResponse, ABC):
 
     def __init__(self, status: int = None, message: str = None, payload: dict = None):
@@ -48,6 +95,29 @@ class FilledResponse(APIResponse, ABC):
 
 class AsyncResponse(FilledResponse, ABC):
 
+    def __init_subclass__(cls, **kwargs):
+        """
+        Time every concrete complete() per response class
+
+        """
+
+        super().__init_subclass__(**kwargs)
+        complete: Callable = cls.__dict__.get("complete")
+
+        if complete is None or getattr(complete, "__isabstractmethod__", False):
+            return
+
+        @functools.wraps(complete)
+        async def timed(self, *args, **kwargs):
+            started: float = time.perf_counter()
+
+            try:
+                return await complete(self, *args, **kwargs)
+            finally:
+                COMPLETE_LATENCY.observe(time.perf_counter() - started, cls.__name__)
+
+        cls.complete = timed
+
     @abstractmethod
     async def complete(self) -> AsyncResponse:
         raise NotImplementedError
@@ -3,11 +3,16 @@
 CREATE TABLE IF NOT EXISTS statistics
 (
 
-    streamer_id TEXT NOT NULL,
-    viewer_id   TEXT NOT NULL,
+    streamer_id VARCHAR(64) NOT NULL,
+    viewer_id   VARCHAR(64) NOT NULL,
     comments    INT  NOT NULL DEFAULT 0,
     experience  INT  NOT NULL DEFAULT 0,
-    coins       INT NULL DEFAULT 0
+    coins       INT NULL DEFAULT 0,
+
+    PRIMARY KEY (streamer_id, viewer_id)
 
 );
 
+-- Leaderboard pages and ranks in (experience DESC, viewer_id DESC) order, answered from the index alone
+CREATE INDEX IF NOT EXISTS statistics_leaderboard
+    ON statistics (streamer_id, experience, viewer_id, comments, coins);
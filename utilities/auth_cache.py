@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import time
+import traceback
+from asyncio import AbstractEventLoop, Task
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import aioredis
+
+
+class AuthResolver:
+    """
+    Resolves dashboard authorization tokens (``auth:{token}``) to usernames through a small in-process TTL/LRU cache.
+    Entries never outlive the Redis key, and are dropped early when the key is set, deleted or expires
+    (keyspace notifications).
+
+    """
+
+    KEYSPACE_PATTERN: str = "__keyspace@*__:auth:*"
+    KEYSPACE_EVENTS: str = "Kg$x"
+
+    TTL: float = 60
+    CAPACITY: int = 10000
+
+    def __init__(self, redis: aioredis.Redis, loop: AbstractEventLoop, ttl: float = TTL, capacity: int = CAPACITY):
+        self.redis: aioredis.Redis = redis
+        self.loop: AbstractEventLoop = loop
+        self.ttl: float = ttl
+        self.capacity: int = capacity
+        self.__cache: OrderedDict[str, Tuple[float, str]] = OrderedDict()
+        self.__task: Task = self.loop.create_task(self.listen())
+
+    @staticmethod
+    def key(token: str) -> str:
+        return f"auth:{token}"
+
+    async def resolve(self, token: str) -> Optional[str]:
+        """
+        Username for a token, or None if it is unknown or expired
+
+        """
+
+        now: float = time.monotonic()
+        cached: Optional[Tuple[float, str]] = self.__cache.get(token)
+
+        if cached is not None and cached[0] > now:
+            self.__cache.move_to_end(token)
+            return cached[1]
+
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.get(self.key(token))
+        pipeline.ttl(self.key(token))
+        username, expires_in = await pipeline.execute()
+
+        # Misses are not cached; a new token must work straight away
+        if username is None:
+            self.__cache.pop(token, None)
+            return None
+
+        username: str = username.decode("utf-8")
+        self.__cache[token] = (now + (min(self.ttl, expires_in) if expires_in > 0 else self.ttl), username)
+        self.__cache.move_to_end(token)
+
+        if len(self.__cache) > self.capacity:
+            self.__cache.popitem(last=False)
+
+        return username
+
+    def invalidate(self, token: str) -> None:
+        self.__cache.pop(token, None)
+
+    async def __enable_keyspace_events(self) -> None:
+        try:
+            current: str = (await self.redis.config_get("notify-keyspace-events")).get("notify-keyspace-events", "")
+            # "A" already covers the g, $ and x event classes, but never the K channel flag
+            flags: str = "K" if "A" in current else self.KEYSPACE_EVENTS
+            missing: str = "".join(flag for flag in flags if flag not in current)
+
+            if missing:
+                await self.redis.config_set("notify-keyspace-events", current + missing)
+        except:
+            # e.g. CONFIG is disabled on managed Redis; the TTL bound still applies
+            logging.warning("Could not enable Redis keyspace notifications for auth tokens")
+
+    async def listen(self) -> None:
+        await self.__enable_keyspace_events()
+
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                await pubsub.psubscribe(self.KEYSPACE_PATTERN)
+
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        # __keyspace@0__:auth:{token}
+                        self.invalidate(message["channel"].decode("utf-8").split(":", 2)[2])
+
+            except asyncio.CancelledError:
+                raise
+            except:
+                logging.error(traceback.format_exc())
+                self.__cache.clear()
+                await asyncio.sleep(1)
+
+    def close(self) -> None:
+        self.__task.cancel()
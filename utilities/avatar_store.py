@@ -0,0 +1,83 @@
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import aioredis
+
+
+class AvatarStore:
+    """
+    Viewer avatar URLs in Redis (``avatar:{unique_id}``). Writes go through an in-process LRU of what this
+    process last wrote, so a SET only happens when the URL changed or the key is close to expiring.
+
+    """
+
+    EXPIRE: int = 14400
+    REFRESH_MARGIN: int = 3600
+    CAPACITY: int = 50000
+
+    def __init__(self, redis: aioredis.Redis, capacity: int = CAPACITY):
+        self.redis: aioredis.Redis = redis
+        self.capacity: int = capacity
+        self.__written: OrderedDict[str, Tuple[str, float]] = OrderedDict()
+
+    @staticmethod
+    def key(unique_id: str) -> str:
+        return f"avatar:{unique_id}"
+
+    def __needs_write(self, unique_id: str, avatar_url: str, now: float) -> bool:
+        written: Optional[Tuple[str, float]] = self.__written.get(unique_id)
+
+        if written is None:
+            return True
+
+        url, written_at = written
+        return url != avatar_url or now - written_at > self.EXPIRE - self.REFRESH_MARGIN
+
+    def __remember(self, unique_id: str, avatar_url: str, now: float) -> None:
+        self.__written[unique_id] = (avatar_url, now)
+        self.__written.move_to_end(unique_id)
+
+        if len(self.__written) > self.capacity:
+            self.__written.popitem(last=False)
+
+    async def set_many(self, avatars: Dict[str, str]) -> int:
+        """
+        Store a batch of avatar URLs, writing only the stale ones in one pipeline
+
+        :return: Number of writes made
+
+        """
+
+        now: float = time.monotonic()
+        writes: Dict[str, str] = {
+            unique_id: avatar_url for unique_id, avatar_url in avatars.items()
+            if self.__needs_write(unique_id, avatar_url, now)
+        }
+
+        if not writes:
+            return 0
+
+        pipeline = self.redis.pipeline(transaction=False)
+
+        for unique_id, avatar_url in writes.items():
+            pipeline.set(self.key(unique_id), avatar_url, ex=self.EXPIRE)
+
+        await pipeline.execute()
+
+        for unique_id, avatar_url in writes.items():
+            self.__remember(unique_id, avatar_url, now)
+
+        return len(writes)
+
+    async def get_many(self, unique_ids: Sequence[str]) -> List[Optional[str]]:
+        """
+        Fetch the avatar URLs for a whole leaderboard in one MGET
+
+        """
+
+        if not unique_ids:
+            return []
+
+        values: List[Optional[bytes]] = await self.redis.mget([self.key(unique_id) for unique_id in unique_ids])
+        return [value.decode("utf-8") if value is not None else None for value in values]
@@ -0,0 +1,85 @@
+from types import ModuleType
+from typing import Any, Dict, Optional
+
+import config
+
+# Settings added after config.py was first laid out. Anything config.py sets wins;
+# None holds top-level settings, every other key is a config class.
+DEFAULTS: Dict[Optional[str], Dict[str, Any]] = {
+    None: {
+        # "memory" or "redis"; cluster mode needs "redis"
+        "GIVEAWAY_BACKEND": "memory"
+    },
+    "Leaderboard": {
+        # Statistics write-behind: seconds between upserts, or pending pairs that force one early
+        "FLUSH_INTERVAL": 1.0,
+        "FLUSH_SIZE": 5000,
+        # Seconds a leaderboard snapshot is served before its version is checked
+        "SNAPSHOT_MAX_AGE": 5
+    },
+    "TikTokScraping": {
+        # Scrape worker processes, and queued or running scrapes before new ones get a 503
+        "WORKERS": 2,
+        "MAX_PENDING": 64,
+        # Live status cache lifetimes, in seconds
+        "EXPIRE_LIVE": 60,
+        "EXPIRE_NOT_LIVE": 120,
+        "EXPIRE_LIVE_FAILED": 15
+    },
+    "Ingest": {
+        "SHARDS": 4,
+        "CAPACITY": 10000,
+        "BATCH_SIZE": 500,
+        # "coalesce" or "drop-oldest"
+        "OVERFLOW_POLICY": "coalesce"
+    },
+    "Runners": {
+        # 0 runs live clients in the API process
+        "WORKERS": 0,
+        "FLUSH_INTERVAL": 0.05
+    },
+    "Cluster": {
+        "ENABLED": False,
+        # None derives one from the hostname and pid
+        "NODE_ID": None,
+        "LEASE_TTL": 30,
+        "REBALANCE_INTERVAL": 10
+    },
+    "Restore": {
+        # Tracked streams reconnected at once on startup, with a random start delay of up to JITTER seconds
+        "CONCURRENCY": 8,
+        "JITTER": 2.0,
+        # Retry delays for streams that fail to connect, doubling from BACKOFF up to MAX_BACKOFF
+        "BACKOFF": 5.0,
+        "MAX_BACKOFF": 300.0,
+        "ATTEMPTS": 5,
+        "ACTIVITY_FLUSH_INTERVAL": 30
+    }
+}
+
+
+def apply(module: ModuleType = config) -> None:
+    """
+    Fill in every setting missing from the config module, creating missing config classes
+
+    :param module: The config module
+    :return: None
+
+    """
+
+    for section, defaults in DEFAULTS.items():
+        target: Any = module
+
+        if section is not None:
+            target = getattr(module, section, None)
+
+            if target is None:
+                target = type(section, (), {})
+                setattr(module, section, target)
+
+        for key, value in defaults.items():
+            if not hasattr(target, key):
+                setattr(target, key, value)
+
+
+apply()
@@ -0,0 +1,40 @@
+import aiohttp
+
+# Upstream (TikTok) connection tuning
+CONNECTION_LIMIT: int = 100
+CONNECTION_LIMIT_PER_HOST: int = 20
+DNS_CACHE_TTL: int = 300
+KEEPALIVE_TIMEOUT: float = 30
+
+# Seconds; the old per-call timeout=10000 meant almost three hours
+TOTAL_TIMEOUT: float = 10
+CONNECT_TIMEOUT: float = 3
+READ_TIMEOUT: float = 5
+
+
+def create_session(
+        limit: int = CONNECTION_LIMIT,
+        limit_per_host: int = CONNECTION_LIMIT_PER_HOST,
+        dns_ttl: int = DNS_CACHE_TTL,
+        total_timeout: float = TOTAL_TIMEOUT
+) -> aiohttp.ClientSession:
+    """
+    Create the application-scoped HTTP session for upstream calls. Must be called from the running loop
+    (the startup hook) and closed at shutdown; every TikTok request shares its keep-alive connections and DNS cache.
+
+    """
+
+    connector: aiohttp.TCPConnector = aiohttp.TCPConnector(
+        limit=limit,
+        limit_per_host=limit_per_host,
+        ttl_dns_cache=dns_ttl,
+        keepalive_timeout=KEEPALIVE_TIMEOUT
+    )
+
+    timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(
+        total=total_timeout,
+        connect=CONNECT_TIMEOUT,
+        sock_read=READ_TIMEOUT
+    )
+
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
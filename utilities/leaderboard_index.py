@@ -0,0 +1,479 @@
+import argparse
+import asyncio
+import logging
+import time
+import traceback
+import uuid
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiomysql
+import aioredis
+
+from models.mysql import SESSION_INIT_COMMAND
+from utilities.singleflight import SingleFlight
+from utilities.statistics_sql import StatisticSQL
+
+
+class LeaderboardIndex:
+    """
+    Redis mirror of the statistics table, kept per streamer so leaderboards never sort in MariaDB:
+
+        leaderboard:{streamer_id}:xp          ZSET of viewer_id -> experience
+        leaderboard:{streamer_id}:stats       HASH of "{viewer_id}:comments" and "{viewer_id}:coins"
+        leaderboard:{streamer_id}:version     Counter bumped on every change, for consumers caching the leaderboard
+        leaderboard:{streamer_id}:seeded      Set once the index has been built from the table; until then reads use MariaDB
+        leaderboard:{streamer_id}:rebuilding  Token of the rebuild in progress
+        leaderboard:{streamer_id}:journal     SET of viewers whose rows changed during that rebuild
+        leaderboard:{streamer_id}:writers     ZSET of flush token -> deadline, for flushes between their upsert and index update
+
+    Deltas are only applied to a seeded index. While a rebuild runs they are journaled instead, and the rebuild
+    re-reads the journaled viewers from MariaDB before swapping its keys in, so nothing flushed meanwhile is lost.
+
+    """
+
+    REBUILD_BATCH: int = 1000
+    REBUILD_TTL: int = 300
+    REBUILD_POLL: float = 0.05
+    WRITER_TTL: int = 30
+
+    # KEYS: xp, stats, version, seeded, rebuilding, journal, writers
+    # ARGV: flush token, then (viewer_id, comments, experience, coins) per row
+    INCREMENT_SCRIPT: str = """
+        if ARGV[1] ~= '' then redis.call('zrem', KEYS[7], ARGV[1]) end
+        if redis.call('exists', KEYS[5]) == 1 then
+            for i = 2, #ARGV, 4 do redis.call('sadd', KEYS[6], ARGV[i]) end
+            return 2
+        end
+        if redis.call('exists', KEYS[4]) == 0 then return 0 end
+        for i = 2, #ARGV, 4 do
+            redis.call('zincrby', KEYS[1], ARGV[i + 2], ARGV[i])
+            if tonumber(ARGV[i + 1]) ~= 0 then redis.call('hincrby', KEYS[2], ARGV[i] .. ':comments', ARGV[i + 1]) end
+            if tonumber(ARGV[i + 3]) ~= 0 then redis.call('hincrby', KEYS[2], ARGV[i] .. ':coins', ARGV[i + 3]) end
+        end
+        redis.call('incr', KEYS[3])
+        return 1
+    """
+
+    # KEYS: rebuilding, journal, seeded; ARGV: token, ttl (ms)
+    BEGIN_REBUILD_SCRIPT: str = """
+        if not redis.call('set', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then return 0 end
+        redis.call('del', KEYS[2], KEYS[3])
+        return 1
+    """
+
+    # KEYS: rebuilding, journal, writers, xp_tmp, stats_tmp, xp, stats, seeded, version; ARGV: token, now
+    FINISH_REBUILD_SCRIPT: str = """
+        if redis.call('get', KEYS[1]) ~= ARGV[1] then return -1 end
+        redis.call('zremrangebyscore', KEYS[3], '-inf', ARGV[2])
+        if redis.call('scard', KEYS[2]) > 0 or redis.call('zcard', KEYS[3]) > 0 then return 0 end
+        redis.call('del', KEYS[6], KEYS[7])
+        if redis.call('exists', KEYS[4]) == 1 then redis.call('rename', KEYS[4], KEYS[6]); redis.call('persist', KEYS[6]) end
+        if redis.call('exists', KEYS[5]) == 1 then redis.call('rename', KEYS[5], KEYS[7]); redis.call('persist', KEYS[7]) end
+        redis.call('set', KEYS[8], 1)
+        redis.call('incr', KEYS[9])
+        redis.call('del', KEYS[1])
+        return 1
+    """
+
+    RELEASE_SCRIPT: str = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+    # Request-path seeding, one per streamer per process
+    SEEDING: SingleFlight = SingleFlight()
+
+    def __init__(self, redis: aioredis.Redis, pool: Optional[aiomysql.Pool] = None):
+        self.redis: aioredis.Redis = redis
+        self.pool: Optional[aiomysql.Pool] = pool
+
+    @staticmethod
+    def xp_key(streamer_id: str) -> str:
+        return f"leaderboard:{streamer_id}:xp"
+
+    @staticmethod
+    def stats_key(streamer_id: str) -> str:
+        return f"leaderboard:{streamer_id}:stats"
+
+    @staticmethod
+    def version_key(streamer_id: str) -> str:
+        return f"leaderboard:{streamer_id}:version"
+
+    @staticmethod
+    def seeded_key(streamer_id: str) -> str:
+        return f"leaderboard:{streamer_id}:seeded"
+
+    @staticmethod
+    def rebuilding_key(streamer_id: str) -> str:
+        return f"leaderboard:{streamer_id}:rebuilding"
+
+    @staticmethod
+    def journal_key(streamer_id: str) -> str:
+        return f"leaderboard:{streamer_id}:journal"
+
+    @staticmethod
+    def writers_key(streamer_id: str) -> str:
+        return f"leaderboard:{streamer_id}:writers"
+
+    async def get_version(self, streamer_id: str) -> Optional[bytes]:
+        return await self.redis.get(self.version_key(streamer_id))
+
+    async def register(self, streamers: Iterable[str]) -> str:
+        """
+        Announce a flush before its upsert, so a rebuild finishing meanwhile waits for its index update
+
+        :return: Token to pass to increment_many (or unregister, if the upsert fails)
+
+        """
+
+        token: str = uuid.uuid4().hex
+        deadline: float = time.time() + self.WRITER_TTL
+
+        pipeline = self.redis.pipeline(transaction=False)
+
+        for streamer_id in streamers:
+            pipeline.zadd(self.writers_key(streamer_id), {token: deadline})
+
+        await pipeline.execute()
+        return token
+
+    async def unregister(self, token: str, streamers: Iterable[str]) -> None:
+        pipeline = self.redis.pipeline(transaction=False)
+
+        for streamer_id in streamers:
+            pipeline.zrem(self.writers_key(streamer_id), token)
+
+        await pipeline.execute()
+
+    async def increment_many(self, rows: Iterable[Tuple[str, str, int, int, int]], token: Optional[str] = None) -> None:
+        """
+        Apply (viewer_id, streamer_id, comments, experience, coins) deltas in one pipeline. Streamers that were never
+        seeded are skipped (the table already holds the deltas), and streamers being rebuilt journal them instead.
+
+        """
+
+        arguments: Dict[str, List] = dict()
+
+        for viewer_id, streamer_id, comments, experience, coins in rows:
+            arguments.setdefault(streamer_id, [token or ""]).extend((viewer_id, comments, experience, coins))
+
+        pipeline = self.redis.pipeline(transaction=False)
+
+        for streamer_id, argv in arguments.items():
+            pipeline.eval(self.INCREMENT_SCRIPT, 7, *self.__increment_keys(streamer_id), *argv)
+
+        await pipeline.execute()
+
+    def __increment_keys(self, streamer_id: str) -> Tuple[str, ...]:
+        return (
+            self.xp_key(streamer_id), self.stats_key(streamer_id), self.version_key(streamer_id), self.seeded_key(streamer_id),
+            self.rebuilding_key(streamer_id), self.journal_key(streamer_id), self.writers_key(streamer_id)
+        )
+
+    async def get_statistics(self, streamer_id: str, count: int = 100) -> List[Tuple[str, int, int, int]]:
+        """
+        Top viewers for a streamer, in the same (viewer_id, comments, experience, coins) shape as the SQL query.
+        An index that was never seeded falls back to MariaDB and is seeded from it in the background, provided
+        the streamer has rows; any username can be asked for, and unknown ones must not leave keys behind.
+
+        """
+
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.exists(self.seeded_key(streamer_id))
+        pipeline.zrevrange(self.xp_key(streamer_id), 0, count - 1, withscores=True)
+        seeded, entries = await pipeline.execute()
+
+        if seeded or self.pool is None:
+            return await self.hydrate(streamer_id, entries)
+
+        rows: List[tuple] = [tuple(row) for row in await StatisticSQL(self.pool).get_statistics(streamer_id, count)]
+
+        if rows:
+            self.seed(streamer_id)
+
+        return rows
+
+    async def get_rank(self, streamer_id: str, viewer_id: str) -> Optional[Tuple[int, int]]:
+        """
+        A viewer's leaderboard position in O(log n) from the index; a streamer with no index falls back to MariaDB
+
+        :return: (rank from 1, experience), or None if the viewer is not on the leaderboard
+
+        """
+
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.zrevrank(self.xp_key(streamer_id), viewer_id)
+        pipeline.zscore(self.xp_key(streamer_id), viewer_id)
+        pipeline.exists(self.seeded_key(streamer_id))
+        rank, score, seeded = await pipeline.execute()
+
+        if seeded or self.pool is None:
+            return (rank + 1, int(score)) if rank is not None else None
+
+        ranked: Optional[Tuple[int, int]] = await StatisticSQL(self.pool).get_rank(viewer_id, streamer_id)
+
+        # A ranked viewer means the streamer has rows to seed from
+        if ranked is not None:
+            self.seed(streamer_id)
+
+        return ranked
+
+    async def get_page(self, streamer_id: str, after: Optional[Tuple[int, str]], count: int) -> List[Tuple[str, int, int, int]]:
+        """
+        One leaderboard page in (experience DESC, viewer_id DESC) order, the order the ZSET and get_rank use.
+        An index that was never seeded falls back to MariaDB like get_statistics.
+
+        :param after: (experience, viewer_id) of the last row of the previous page, None for the first page
+
+        """
+
+        if after is None:
+            return await self.get_statistics(streamer_id, count)
+
+        experience, viewer_id = after
+
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.exists(self.seeded_key(streamer_id))
+        pipeline.zrevrank(self.xp_key(streamer_id), viewer_id)
+        seeded, rank = await pipeline.execute()
+
+        if not seeded and self.pool is not None:
+            rows: List[tuple] = [tuple(row) for row in await StatisticSQL(self.pool).get_statistics_page(streamer_id, after, count)]
+
+            if rows:
+                self.seed(streamer_id)
+
+            return rows
+
+        # The page is the ranks after the cursor's viewer, however many viewers share its experience
+        if rank is not None:
+            return await self.hydrate(streamer_id, await self.redis.zrevrange(self.xp_key(streamer_id), rank + 1, rank + count, withscores=True))
+
+        # The viewer has left the index; find the cursor's place by score, skipping tied viewers at or before it
+        viewer: bytes = viewer_id.encode("utf-8")
+        batch_size: int = count * 2
+        batch: List[Tuple[bytes, float]] = await self.redis.zrevrangebyscore(self.xp_key(streamer_id), experience, "-inf", start=0, num=batch_size, withscores=True)
+        entries: List[Tuple[bytes, float]] = []
+        offset: int = 0
+
+        while True:
+            entries.extend(entry for entry in batch if entry[1] < experience or entry[0] < viewer)
+
+            if len(entries) >= count or len(batch) < batch_size:
+                break
+
+            offset += batch_size
+            batch = await self.redis.zrevrangebyscore(self.xp_key(streamer_id), experience, "-inf", start=offset, num=batch_size, withscores=True)
+
+        return await self.hydrate(streamer_id, entries[:count])
+
+    async def read(self, streamer_id: str, count: int) -> List[Tuple[str, int, int, int]]:
+        entries: List[Tuple[bytes, float]] = await self.redis.zrevrange(self.xp_key(streamer_id), 0, count - 1, withscores=True)
+        return await self.hydrate(streamer_id, entries)
+
+    async def hydrate(self, streamer_id: str, entries: List[Tuple[bytes, float]]) -> List[Tuple[str, int, int, int]]:
+        """
+        Join (viewer_id, experience) ZSET entries with their comments and coins
+
+        """
+
+        if not entries:
+            return []
+
+        viewers: List[str] = [viewer.decode("utf-8") for viewer, _ in entries]
+        fields: List[str] = [field for viewer in viewers for field in (f"{viewer}:comments", f"{viewer}:coins")]
+        values: List[Optional[bytes]] = await self.redis.hmget(self.stats_key(streamer_id), fields)
+
+        return [
+            (viewer, int(values[i * 2] or 0), int(score), int(values[i * 2 + 1] or 0))
+            for i, (viewer, (_, score)) in enumerate(zip(viewers, entries))
+        ]
+
+    def seed(self, streamer_id: str) -> None:
+        """
+        Build a streamer's index in the background, unless this process is already doing so
+
+        """
+
+        if not self.SEEDING.in_flight(streamer_id):
+            asyncio.get_running_loop().create_task(self.SEEDING.do(streamer_id, lambda: self.__seed(streamer_id)))
+
+    async def __seed(self, streamer_id: str) -> None:
+        try:
+            await self.rebuild_streamer(streamer_id)
+        except asyncio.CancelledError:
+            raise
+        except:
+            logging.error(traceback.format_exc())
+
+    async def rebuild_streamer(self, streamer_id: str) -> Optional[int]:
+        """
+        Reseed one streamer's index from MariaDB. Reads fall back to MariaDB until it finishes; the new keys are
+        written aside and renamed into place, after replaying every viewer journaled by flushes during the rebuild.
+
+        A streamer with no rows is left unseeded, without keys of its own.
+
+        :return: Number of viewers indexed, or None if another rebuild of this streamer is running
+
+        """
+
+        token: str = uuid.uuid4().hex
+        rebuilding_key: str = self.rebuilding_key(streamer_id)
+
+        if not await self.redis.eval(self.BEGIN_REBUILD_SCRIPT, 3, rebuilding_key, self.journal_key(streamer_id), self.seeded_key(streamer_id), token, self.REBUILD_TTL * 1000):
+            return None
+
+        xp_tmp, stats_tmp = f"{self.xp_key(streamer_id)}:rebuild:{token}", f"{self.stats_key(streamer_id)}:rebuild:{token}"
+        deadline: float = time.monotonic() + self.REBUILD_TTL
+
+        try:
+            statistics = await StatisticSQL(self.pool).get_all_statistics(streamer_id)
+
+            if not statistics:
+                await self.redis.delete(self.xp_key(streamer_id), self.stats_key(streamer_id), self.journal_key(streamer_id))
+                await self.redis.eval(self.RELEASE_SCRIPT, 1, rebuilding_key, token)
+                return 0
+
+            for i in range(0, len(statistics), self.REBUILD_BATCH):
+                await self.__write(xp_tmp, stats_tmp, statistics[i:i + self.REBUILD_BATCH])
+
+            while True:
+                # Rows changed since the snapshot are re-read whole, so replaying one twice is harmless
+                journaled: List[str] = await self.__take_journal(streamer_id)
+
+                for i in range(0, len(journaled), self.REBUILD_BATCH):
+                    await self.__write(xp_tmp, stats_tmp, await StatisticSQL(self.pool).get_viewer_statistics(streamer_id, journaled[i:i + self.REBUILD_BATCH]))
+
+                if journaled:
+                    continue
+
+                finished: int = await self.redis.eval(
+                    self.FINISH_REBUILD_SCRIPT, 9,
+                    rebuilding_key, self.journal_key(streamer_id), self.writers_key(streamer_id), xp_tmp, stats_tmp,
+                    self.xp_key(streamer_id), self.stats_key(streamer_id), self.seeded_key(streamer_id), self.version_key(streamer_id),
+                    token, time.time()
+                )
+
+                if finished == 1:
+                    return len(statistics)
+
+                if finished == -1 or time.monotonic() > deadline:
+                    raise TimeoutError(f"Rebuild of {streamer_id} outlived its lock")
+
+                # A flush is between its upsert and its index update
+                await asyncio.sleep(self.REBUILD_POLL)
+
+        except:
+            # Left unseeded, so reads stay on MariaDB and the next one retries
+            await self.redis.delete(xp_tmp, stats_tmp)
+            await self.redis.eval(self.RELEASE_SCRIPT, 1, rebuilding_key, token)
+            raise
+
+    async def __take_journal(self, streamer_id: str) -> List[str]:
+        pipeline = self.redis.pipeline(transaction=True)
+        pipeline.smembers(self.journal_key(streamer_id))
+        pipeline.delete(self.journal_key(streamer_id))
+        journaled, _ = await pipeline.execute()
+        return [viewer.decode("utf-8") for viewer in journaled]
+
+    async def __write(self, xp_key: str, stats_key: str, statistics: List[tuple]) -> None:
+        if not statistics:
+            return
+
+        pipeline = self.redis.pipeline(transaction=False)
+        pipeline.zadd(xp_key, {viewer_id: experience for viewer_id, _, experience, _ in statistics})
+        pipeline.hset(stats_key, mapping={
+            field: value
+            for viewer_id, comments, _, coins in statistics
+            for field, value in ((f"{viewer_id}:comments", comments), (f"{viewer_id}:coins", coins or 0))
+        })
+        pipeline.expire(xp_key, self.REBUILD_TTL)
+        pipeline.expire(stats_key, self.REBUILD_TTL)
+        await pipeline.execute()
+
+    async def rebuild(self, streamer_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Reseed the index for one streamer, or for every streamer in the table (e.g. after a Redis flush)
+
+        """
+
+        streamers: List[str] = [streamer_id] if streamer_id else await StatisticSQL(self.pool).get_streamers()
+        rebuilt: Dict[str, int] = dict()
+
+        for streamer in streamers:
+            try:
+                viewers: Optional[int] = await self.rebuild_streamer(streamer)
+            except:
+                logging.error(traceback.format_exc())
+                continue
+
+            if viewers is None:
+                logging.warning(f"Skipped rebuilding {streamer}, another rebuild is running")
+            else:
+                rebuilt[streamer] = viewers
+
+        return rebuilt
+
+    async def check(self, streamer_id: str) -> List[Tuple[str, Optional[tuple], Optional[tuple]]]:
+        """
+        Compare a streamer's index against the table
+
+        :return: (viewer_id, sql (comments, experience, coins), index (comments, experience, coins)) for every mismatch
+
+        """
+
+        sql_rows: Dict[str, tuple] = {
+            viewer_id: (comments, experience, coins or 0)
+            for viewer_id, comments, experience, coins in await StatisticSQL(self.pool).get_all_statistics(streamer_id)
+        }
+
+        count: int = max(await self.redis.zcard(self.xp_key(streamer_id)), 1)
+        index_rows: Dict[str, tuple] = {
+            viewer_id: (comments, experience, coins)
+            for viewer_id, comments, experience, coins in await self.read(streamer_id, count)
+        }
+
+        return [
+            (viewer_id, sql_rows.get(viewer_id), index_rows.get(viewer_id))
+            for viewer_id in sorted(set(sql_rows) | set(index_rows))
+            if sql_rows.get(viewer_id) != index_rows.get(viewer_id)
+        ]
+
+
+async def _run(command: str, streamer_id: Optional[str]) -> None:
+    import config
+
+    pool: aiomysql.Pool = await aiomysql.create_pool(
+        host=config.MariaDB.HOST, port=config.MariaDB.PORT,
+        user=config.MariaDB.USERNAME, password=config.MariaDB.PASSWORD,
+        db=config.MariaDB.DATABASE, init_command=SESSION_INIT_COMMAND
+    )
+
+    redis: aioredis.Redis = aioredis.Redis(host=config.Redis.HOST, port=config.Redis.PORT, password=config.Redis.PASSWORD)
+    index: LeaderboardIndex = LeaderboardIndex(redis, pool)
+
+    try:
+        if command == "rebuild":
+            rebuilt: Dict[str, int] = await index.rebuild(streamer_id)
+            print(f"Rebuilt {len(rebuilt)} streamer(s), {sum(rebuilt.values())} viewer(s)")
+
+        else:
+            streamers: List[str] = [streamer_id] if streamer_id else await StatisticSQL(pool).get_streamers()
+            mismatched: int = 0
+
+            for streamer in streamers:
+                for viewer_id, sql_row, index_row in await index.check(streamer):
+                    mismatched += 1
+                    print(f"{streamer}/{viewer_id}: sql={sql_row} index={index_row}")
+
+            print(f"Checked {len(streamers)} streamer(s), {mismatched} mismatch(es)")
+
+    finally:
+        pool.close()
+        await pool.wait_closed()
+        await redis.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the Redis leaderboard index")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    parser.add_argument("--streamer", default=None, help="Only this streamer (default: all)")
+    arguments = parser.parse_args()
+    asyncio.run(_run(arguments.command, arguments.streamer))
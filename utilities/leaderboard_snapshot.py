@@ -0,0 +1,89 @@
+import gzip
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import aiomysql
+import aioredis
+from starlette.responses import Response
+
+from api.creator import TikTokCreatorResponse
+from utilities.leaderboard_index import LeaderboardIndex
+from utilities.singleflight import SingleFlight
+
+
+class LeaderboardSnapshot:
+    """
+    A serialized /creator/statistics response for one streamer, stored both plain and gzip-compressed
+
+    """
+
+    __slots__ = ("body", "compressed", "version", "checked_at")
+
+    def __init__(self, body: bytes, version: Optional[bytes]):
+        self.body: bytes = body
+        self.compressed: bytes = gzip.compress(body, compresslevel=6)
+        self.version: Optional[bytes] = version
+        self.checked_at: float = time.monotonic()
+
+    def to_response(self, accept_encoding: str) -> Response:
+        if "gzip" in accept_encoding:
+            return Response(self.compressed, media_type="application/json", headers={"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+
+        return Response(self.body, media_type="application/json", headers={"Vary": "Accept-Encoding"})
+
+
+class LeaderboardSnapshots:
+    """
+    Materialized leaderboards. A snapshot is served as-is until it is ``max_age`` seconds old, then rebuilt
+    only if the streamer's leaderboard version moved. Concurrent rebuilds of one streamer share a single task.
+
+    """
+
+    CAPACITY: int = 5000
+
+    def __init__(self, sql_pool: aiomysql.Pool, redis: aioredis.Redis, max_age: float, capacity: int = CAPACITY):
+        self.sql_pool: aiomysql.Pool = sql_pool
+        self.redis: aioredis.Redis = redis
+        self.max_age: float = max_age
+        self.capacity: int = capacity
+        self.__snapshots: OrderedDict[str, LeaderboardSnapshot] = OrderedDict()
+        self.__building: SingleFlight = SingleFlight()
+
+    async def get(self, streamer_id: str) -> LeaderboardSnapshot:
+        snapshot: Optional[LeaderboardSnapshot] = self.__snapshots.get(streamer_id)
+
+        if snapshot is not None and time.monotonic() - snapshot.checked_at < self.max_age:
+            self.__snapshots.move_to_end(streamer_id)
+            return snapshot
+
+        return await self.__building.do(streamer_id, lambda: self.__refresh(streamer_id, snapshot))
+
+    def peek(self, streamer_id: str) -> Optional[LeaderboardSnapshot]:
+        """
+        The last built snapshot, however old
+
+        """
+
+        return self.__snapshots.get(streamer_id)
+
+    async def __refresh(self, streamer_id: str, snapshot: Optional[LeaderboardSnapshot]) -> LeaderboardSnapshot:
+        version: Optional[bytes] = await LeaderboardIndex(self.redis).get_version(streamer_id)
+
+        # Nothing changed since the last build
+        if snapshot is not None and snapshot.version == version:
+            snapshot.checked_at = time.monotonic()
+            return snapshot
+
+        response: TikTokCreatorResponse = await TikTokCreatorResponse(username=streamer_id, sql_pool=self.sql_pool, redis=self.redis).complete()
+
+        body: bytes = response.render()
+        snapshot = LeaderboardSnapshot(body, version)
+
+        self.__snapshots[streamer_id] = snapshot
+        self.__snapshots.move_to_end(streamer_id)
+
+        if len(self.__snapshots) > self.capacity:
+            self.__snapshots.popitem(last=False)
+
+        return snapshot
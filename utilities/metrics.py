@@ -0,0 +1,192 @@
+"""
+Minimal Prometheus text-exposition metrics. Every labelled metric caps its number of series; past the cap,
+the high-cardinality labels (all of them unless ``overflow`` names some) read ``other``, so thousands of streamers
+cannot grow memory while low-cardinality labels keep their values.
+
+"""
+
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+OVERFLOW_LABEL: str = "other"
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    TYPE: str = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), max_series: int = 1000, overflow: Optional[Sequence[str]] = None):
+        self.name: str = name
+        self.documentation: str = documentation
+        self.labels: Tuple[str, ...] = tuple(labels)
+        self.max_series: int = max_series
+        self.overflow: Tuple[str, ...] = tuple(overflow) if overflow is not None else self.labels
+        self._lock: threading.Lock = threading.Lock()
+
+    def _key(self, series: Dict[Tuple[str, ...], object], values: Sequence[str]) -> Tuple[str, ...]:
+        if len(values) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}")
+
+        key: Tuple[str, ...] = tuple(str(value) for value in values)
+
+        if key not in series and len(series) >= self.max_series:
+            return tuple(OVERFLOW_LABEL if label in self.overflow else value for label, value in zip(self.labels, key))
+
+        return key
+
+    def _labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs: List[str] = [f'{label}="{_escape(value)}"' for label, value in zip(self.labels, key)]
+
+        if extra:
+            pairs.append(extra)
+
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}", *self.samples()])
+
+
+class Counter(Metric):
+    TYPE: str = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), max_series: int = 1000, overflow: Optional[Sequence[str]] = None):
+        super().__init__(name, documentation, labels, max_series, overflow)
+        self.__series: Dict[Tuple[str, ...], float] = dict()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            key: Tuple[str, ...] = self._key(self.__series, labels)
+            self.__series[key] = self.__series.get(key, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{self._labels(key)} {_format(value)}" for key, value in self.__series.items()]
+
+
+class Gauge(Metric):
+    """
+    A gauge set directly, or read from a callback at scrape time. Callbacks of labelled gauges return
+    ``{label values: value}``.
+
+    """
+
+    TYPE: str = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), max_series: int = 1000, overflow: Optional[Sequence[str]] = None):
+        super().__init__(name, documentation, labels, max_series, overflow)
+        self.__series: Dict[Tuple[str, ...], float] = dict()
+        self.__function: Optional[Callable[[], Union[float, Dict[Tuple[str, ...], float]]]] = None
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self.__series[self._key(self.__series, labels)] = value
+
+    def set_function(self, function: Callable[[], Union[float, Dict[Tuple[str, ...], float]]]) -> None:
+        self.__function = function
+
+    def samples(self) -> List[str]:
+        if self.__function is not None:
+            try:
+                value = self.__function()
+            except Exception:
+                return []
+
+            if not self.labels:
+                return [f"{self.name} {_format(value)}"]
+
+            return [f"{self.name}{self._labels(key)} {_format(item)}" for key, item in value.items()]
+
+        with self._lock:
+            return [f"{self.name}{self._labels(key)} {_format(value)}" for key, value in self.__series.items()]
+
+
+class Histogram(Metric):
+    TYPE: str = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), max_series: int = 1000, overflow: Optional[Sequence[str]] = None, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels, max_series, overflow)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets)) + (math.inf,)
+
+        # key -> ([count per bucket], sum)
+        self.__series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = dict()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            key: Tuple[str, ...] = self._key(self.__series, labels)
+            counts, total = self.__series.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            total[0] += value
+
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+
+    def samples(self) -> List[str]:
+        lines: List[str] = []
+
+        with self._lock:
+            for key, (counts, total) in self.__series.items():
+                cumulative: int = 0
+
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    bucket: str = 'le="' + _format(bound) + '"'
+                    lines.append(f"{self.name}_bucket{self._labels(key, bucket)} {cumulative}")
+
+                lines.append(f"{self.name}_sum{self._labels(key)} {_format(total[0])}")
+                lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = dict()
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics.values()) + "\n"
+
+
+REGISTRY: Registry = Registry()
+
+# Ingestion
+LIVE_EVENTS: Counter = REGISTRY.register(Counter("livetok_live_events_total", "Comments and gifts received, per streamer", ("streamer", "type"), overflow=("streamer",)))
+LIVE_CLIENTS: Gauge = REGISTRY.register(Gauge("livetok_live_clients", "Streams tracked by this process"))
+ACTIVE_GIVEAWAYS: Gauge = REGISTRY.register(Gauge("livetok_active_giveaways", "Running giveaways"))
+INGEST_DEPTH: Gauge = REGISTRY.register(Gauge("livetok_ingest_queue_depth", "Events waiting in the ingest pipeline"))
+INGEST_LAG: Gauge = REGISTRY.register(Gauge("livetok_ingest_lag_seconds", "Age of the oldest event in the last ingest batch"))
+INGEST_DROPPED: Counter = REGISTRY.register(Counter("livetok_ingest_dropped_total", "Events dropped by the ingest overflow policy"))
+INGEST_COALESCED: Counter = REGISTRY.register(Counter("livetok_ingest_coalesced_total", "Events merged by the ingest overflow policy"))
+STATISTICS_DEPTH: Gauge = REGISTRY.register(Gauge("livetok_statistics_buffer_depth", "Viewer statistics waiting to be flushed"))
+STATISTICS_FLUSH: Histogram = REGISTRY.register(Histogram("livetok_statistics_flush_seconds", "Statistics flush latency"))
+
+RESTORE: Gauge = REGISTRY.register(Gauge("livetok_restore_streams", "Tracked streams being restored after a restart, by state", ("state",), max_series=10))
+
+# API
+ROUTE_LATENCY: Histogram = REGISTRY.register(Histogram("livetok_http_request_seconds", "Request latency per route", ("route", "method"), max_series=200))
+COMPLETE_LATENCY: Histogram = REGISTRY.register(Histogram("livetok_response_complete_seconds", "AsyncResponse.complete latency", ("response",), max_series=100))
+
+# Upstream
+SCRAPES: Histogram = REGISTRY.register(Histogram("livetok_scrape_seconds", "Profile scrape latency by outcome", ("outcome",), max_series=10))
+SCRAPE_DEPTH: Gauge = REGISTRY.register(Gauge("livetok_scrape_queue_depth", "Profile scrapes queued or running"))
+LIVE_CHECKS: Histogram = REGISTRY.register(Histogram("livetok_live_check_seconds", "Live status lookup latency by outcome", ("outcome",), max_series=10))
@@ -0,0 +1,34 @@
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LazyProvider(Generic[T]):
+    """
+    Build an expensive client on first use instead of at import. One instance per process; creation is
+    thread-safe and a failed creation is retried on the next call.
+
+    """
+
+    def __init__(self, factory: Callable[[], T]):
+        self.factory: Callable[[], T] = factory
+        self.__instance: Optional[T] = None
+        self.__lock: threading.Lock = threading.Lock()
+
+    def get(self) -> T:
+        if self.__instance is None:
+            with self.__lock:
+                if self.__instance is None:
+                    self.__instance = self.factory()
+
+        return self.__instance
+
+
+def _tiktok_api():
+    # Importing TikTokApi is itself heavy, so it happens here too
+    from TikTokApi import TikTokApi
+    return TikTokApi()
+
+
+TIKTOK_API: LazyProvider = LazyProvider(_tiktok_api)
@@ -0,0 +1,70 @@
+from typing import Optional, Tuple
+
+
+class RoomIdScanner:
+    """
+    Incremental room id extractor for the TikTok live page. Fed the body chunk by chunk, it finds the
+    ``__room_id=`` or ``"roomId":"`` marker across chunk boundaries while only holding a small tail of the page.
+
+    """
+
+    # (marker, terminator)
+    MARKERS: Tuple[Tuple[bytes, bytes], ...] = (
+        (b"__room_id=", b'"/>'),
+        (b'"roomId":"', b'"}'),
+    )
+
+    MAX_ID_LENGTH: int = 64
+
+    def __init__(self):
+        self.__buffer: bytearray = bytearray()
+        self.__keep: int = max(len(marker) for marker, _ in self.MARKERS) - 1
+        self.bytes_scanned: int = 0
+        self.room_id: Optional[str] = None
+
+    @property
+    def found(self) -> bool:
+        return self.room_id is not None
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Scan the next chunk of the page
+
+        :return: Whether the room id has been found (no more input is needed)
+
+        """
+
+        if self.found:
+            return True
+
+        self.__buffer += chunk
+        self.bytes_scanned += len(chunk)
+        keep_from: int = max(0, len(self.__buffer) - self.__keep)
+
+        for marker, terminator in self.MARKERS:
+            start: int = self.__buffer.find(marker)
+
+            while start != -1:
+                value_start: int = start + len(marker)
+                end: int = self.__buffer.find(terminator, value_start, value_start + self.MAX_ID_LENGTH + len(terminator))
+
+                if end != -1:
+                    self.room_id = self.__buffer[value_start:end].decode("utf-8", errors="replace")
+                    self.__buffer.clear()
+                    return True
+
+                # Terminator may still arrive in the next chunk
+                if len(self.__buffer) - value_start < self.MAX_ID_LENGTH + len(terminator):
+                    keep_from = min(keep_from, start)
+                    break
+
+                start = self.__buffer.find(marker, value_start)
+
+        del self.__buffer[:keep_from]
+        return False
+
+    @classmethod
+    def scan(cls, html: bytes) -> Optional[str]:
+        scanner: RoomIdScanner = cls()
+        scanner.feed(html)
+        return scanner.room_id
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Set, Tuple
+
+from utilities.metrics import SCRAPES
+from utilities.providers import TIKTOK_API
+
+
+def _ping(hold: float) -> int:
+    # Holding a worker sends the other pings to the other workers
+    time.sleep(hold)
+    return os.getpid()
+
+
+def _scrape(username: str) -> Tuple[int, Optional[dict]]:
+    """
+    Scrape a user inside a worker. Only plain data crosses the process boundary.
+
+    """
+
+    try:
+        # Created on the worker's first scrape, then reused
+        user = TIKTOK_API.get().user(username)
+        payload: dict = user.as_dict
+
+        return 200, {"user_id": user.user_id, "sec_uid": user.sec_uid, "username": user.username, "payload": payload}
+    except:
+        logging.error(traceback.format_exc())
+        return 500, None
+
+
+class ScrapePoolSaturated(Exception):
+    """
+    Raised when the scrape queue is full
+
+    """
+
+
+class ScrapePool:
+    """
+    Long-lived process pool for profile scraping. Workers are spawned once at startup and each builds its TikTokApi on first use;
+    submissions beyond ``max_pending`` (queued plus running) are rejected instead of piling up.
+
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers: int = workers
+        self.max_pending: int = max_pending
+        self.executor: Optional[ProcessPoolExecutor] = None
+
+        # Reporting
+        self.pending: int = 0
+        self.rejected: int = 0
+        self.scrapes: int = 0
+        self.last_latency: float = 0.0
+        self.total_latency: float = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self.pending
+
+    @property
+    def average_latency(self) -> float:
+        return self.total_latency / self.scrapes if self.scrapes else 0.0
+
+    async def start(self) -> None:
+        self.executor = ProcessPoolExecutor(max_workers=self.workers)
+        loop = asyncio.get_running_loop()
+
+        pids: Set[int] = set()
+        hold: float = 0.0
+
+        # Spawn the workers now rather than on the first request. A worker that is up first can answer every ping,
+        # so keep pinging, holding each worker longer, until all of them have answered
+        while len(pids) < self.workers:
+            pids.update(await asyncio.gather(*(loop.run_in_executor(self.executor, _ping, hold) for _ in range(self.workers))))
+            hold = min(max(hold * 2, 0.05), 1.0)
+
+    async def scrape(self, username: str) -> Tuple[int, Optional[dict]]:
+        """
+        Scrape a user in the pool
+
+        :return: (status, {"user_id", "sec_uid", "username", "payload"} or None)
+        :raises ScrapePoolSaturated: If the queue is full
+
+        """
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            SCRAPES.observe(0.0, "rejected")
+            raise ScrapePoolSaturated()
+
+        self.pending += 1
+        started: float = time.perf_counter()
+        outcome: str = "error"
+
+        try:
+            status, data = await asyncio.get_running_loop().run_in_executor(self.executor, _scrape, username)
+            outcome = str(status)
+            return status, data
+        finally:
+            self.pending -= 1
+            self.scrapes += 1
+            self.last_latency = time.perf_counter() - started
+            self.total_latency += self.last_latency
+            SCRAPES.observe(self.last_latency, outcome)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
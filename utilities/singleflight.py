@@ -0,0 +1,29 @@
+import asyncio
+from asyncio import Task
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into one in-flight task. Every caller awaiting a key
+    while its task runs receives that task's result (or exception); a caller being cancelled does not cancel the task.
+
+    """
+
+    def __init__(self):
+        self.__flights: Dict[Hashable, Task] = dict()
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self.__flights
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        task: Task = self.__flights.get(key)
+
+        if task is None:
+            task = asyncio.get_running_loop().create_task(function())
+            task.add_done_callback(lambda done: self.__flights.pop(key) if self.__flights.get(key) is done else None)
+            self.__flights[key] = task
+
+        return await asyncio.shield(task)
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import time
+import traceback
+from asyncio import AbstractEventLoop, Task
+from typing import Dict, List, Optional, Set, Tuple
+
+from aiomysql import Pool
+
+from utilities.leaderboard_index import LeaderboardIndex
+from utilities.metrics import STATISTICS_FLUSH
+from utilities.statistics_sql import StatisticSQL
+
+
+class StatisticBuffer:
+    """
+    Write-behind buffer for viewer statistics. Deltas are merged per (viewer_id, streamer_id) in memory
+    and written as one multi-row upsert when the interval elapses, the size threshold is hit or on shutdown.
+
+    """
+
+    def __init__(self, pool: Pool, loop: AbstractEventLoop, flush_interval: float, flush_size: int, index: Optional[LeaderboardIndex] = None):
+        self.pool: Pool = pool
+        self.index: Optional[LeaderboardIndex] = index
+        self.loop: AbstractEventLoop = loop
+        self.flush_interval: float = flush_interval
+        self.flush_size: int = flush_size
+
+        self.__deltas: Dict[Tuple[str, str], List[int]] = dict()
+        self.__lock: asyncio.Lock = asyncio.Lock()
+        self.__pending: Optional[Task] = None
+        self.__task: Task = self.loop.create_task(self.flush_loop())
+
+        # Reporting
+        self.flushes: int = 0
+        self.last_flush_rows: int = 0
+        self.last_flush_latency: float = 0.0
+
+    @property
+    def depth(self) -> int:
+        """
+        Number of (viewer_id, streamer_id) pairs waiting to be written
+
+        """
+
+        return len(self.__deltas)
+
+    def add(self, viewer_id: str, streamer_id: str, add_comments: int, add_experience: int, add_coins: int) -> None:
+        delta: Optional[List[int]] = self.__deltas.get((viewer_id, streamer_id))
+
+        if delta is None:
+            self.__deltas[(viewer_id, streamer_id)] = [add_comments, add_experience, add_coins]
+        else:
+            delta[0] += add_comments
+            delta[1] += add_experience
+            delta[2] += add_coins
+
+        # Size threshold reached, flush early (one at a time)
+        if len(self.__deltas) >= self.flush_size and (self.__pending is None or self.__pending.done()):
+            self.__pending = self.loop.create_task(self.flush())
+
+    def __merge(self, deltas: Dict[Tuple[str, str], List[int]]) -> None:
+        for (viewer_id, streamer_id), (comments, experience, coins) in deltas.items():
+            self.add(viewer_id, streamer_id, comments, experience, coins)
+
+    async def flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+
+            # Shielded, so close() lets a flush that is writing finish instead of abandoning its rows
+            await asyncio.shield(self.flush())
+
+    async def flush(self) -> int:
+        """
+        Write all buffered deltas in a single upsert
+
+        :return: Number of rows written
+
+        """
+
+        async with self.__lock:
+            if not self.__deltas:
+                return 0
+
+            deltas, self.__deltas = self.__deltas, dict()
+            rows: List[Tuple[str, str, int, int, int]] = [
+                (viewer_id, streamer_id, comments, experience, coins)
+                for (viewer_id, streamer_id), (comments, experience, coins) in deltas.items()
+            ]
+
+            started: float = time.perf_counter()
+            streamers: Set[str] = {streamer_id for _, streamer_id in deltas}
+            token: Optional[str] = await self.__register(streamers)
+
+            try:
+                await StatisticSQL(self.pool).upsert_statistics(rows)
+            except asyncio.CancelledError:
+                raise
+            except:
+                # Keep the deltas for the next attempt rather than losing them
+                logging.error(traceback.format_exc())
+                self.__merge(deltas)
+
+                if token is not None:
+                    try:
+                        await self.index.unregister(token, streamers)
+                    except:
+                        logging.error(traceback.format_exc())
+
+                return 0
+
+            # The table is the source of truth; a failed index update is repaired by a rebuild
+            if self.index is not None:
+                try:
+                    await self.index.increment_many(rows, token)
+                except:
+                    logging.error(traceback.format_exc())
+
+            self.flushes += 1
+            self.last_flush_rows = len(rows)
+            self.last_flush_latency = time.perf_counter() - started
+            STATISTICS_FLUSH.observe(self.last_flush_latency)
+            return len(rows)
+
+    async def __register(self, streamers: Set[str]) -> Optional[str]:
+        # Lets a leaderboard rebuild wait for this flush's index update instead of missing it
+        if self.index is None:
+            return None
+
+        try:
+            return await self.index.register(streamers)
+        except:
+            logging.error(traceback.format_exc())
+            return None
+
+    async def close(self) -> None:
+        self.__task.cancel()
+        await self.flush()
@@ -1,39 +1,39 @@
-import datetime
 import logging
-import traceback
-from typing import Optional, List
+from typing import Optional, List, Tuple
 
-from aiomysql import Connection, Cursor, Pool
+from aiomysql import Pool
 
-from models.mysql import SQLEntryPoint, StatementEnum
+from models.mysql import SQLEntryPoint, SQLSession, StatementEnum
 
 
 # noinspection SqlNoDataSourceInspection
 class StatisticStatements(StatementEnum):
 
-    UPDATE_STATISTICS: str = (
+    UPSERT_STATISTICS: str = (
         """
-        UPDATE statistics 
-        SET 
-            comments = comments + %s, 
-            experience = experience + %s, 
-            coins = coins + %s
-        WHERE viewer_id='%s' AND streamer_id='%s'
+        INSERT INTO statistics (viewer_id, streamer_id, comments, experience, coins) 
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE 
+            comments = comments + VALUES(comments), 
+            experience = experience + VALUES(experience), 
+            coins = coins + VALUES(coins)
         """
     )
 
-    INSERT_STATISTIC: str = (
+    GET_USER_STATISTICS: str = (
         """
-        INSERT INTO statistics (viewer_id, streamer_id) 
-        VALUES ('%s', '%s')
+        SELECT comments, experience, coins 
+        FROM statistics 
+        WHERE viewer_id = %s AND streamer_id = %s
         """
     )
 
-    GET_USER_STATISTICS: str = (
+    # Followed by one %s per viewer
+    GET_VIEWER_STATISTICS: str = (
         """
-        SELECT comments, experience, coins 
+        SELECT viewer_id, comments, experience, coins 
         FROM statistics 
-        WHERE viewer_id='%s' AND streamer_id='%s'
+        WHERE streamer_id = %s AND viewer_id IN ({viewers})
         """
     )
 
@@ -41,47 +41,219 @@ class StatisticStatements(StatementEnum):
         """
         SELECT viewer_id, comments, experience, coins 
         FROM statistics 
-        WHERE streamer_id='%s'
+        WHERE streamer_id = %s
         ORDER BY experience DESC
         """
     )
 
+    # Leaderboard order is (experience DESC, viewer_id DESC), read off the statistics_leaderboard covering index
+    GET_TOP_STATISTICS: str = (
+        """
+        SELECT viewer_id, comments, experience, coins 
+        FROM statistics 
+        WHERE streamer_id = %s
+        ORDER BY experience DESC, viewer_id DESC
+        LIMIT %s
+        """
+    )
+
+    # Keyset page: the rows ranked after (experience, viewer_id). The rest of the cursor's tie and the rows below it
+    # are each one range of statistics_leaderboard, so neither half reads past the page, however many viewers tie
+    GET_STATISTICS_PAGE: str = (
+        """
+        (
+            SELECT viewer_id, comments, experience, coins 
+            FROM statistics 
+            WHERE streamer_id = %s AND experience = %s AND viewer_id < %s
+            ORDER BY viewer_id DESC
+            LIMIT %s
+        )
+        UNION ALL
+        (
+            SELECT viewer_id, comments, experience, coins 
+            FROM statistics 
+            WHERE streamer_id = %s AND experience < %s
+            ORDER BY experience DESC, viewer_id DESC
+            LIMIT %s
+        )
+        ORDER BY experience DESC, viewer_id DESC
+        LIMIT %s
+        """
+    )
+
+    # Viewers ranked above (experience, viewer_id)
+    COUNT_RANKED_ABOVE: str = (
+        """
+        SELECT COUNT(*) 
+        FROM statistics 
+        WHERE streamer_id = %s AND (experience > %s OR (experience = %s AND viewer_id > %s))
+        """
+    )
+
+    # Tables created before the upsert have neither a primary key nor keyable (TEXT) ids
+    HAS_PRIMARY_KEY: str = (
+        """
+        SELECT 
+            (SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'statistics'),
+            (SELECT COUNT(*) FROM information_schema.TABLE_CONSTRAINTS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'statistics' AND CONSTRAINT_TYPE = 'PRIMARY KEY')
+        """
+    )
+
+    ACQUIRE_MIGRATION_LOCK: str = "SELECT GET_LOCK('statistics_primary_key', 60)"
+    RELEASE_MIGRATION_LOCK: str = "SELECT RELEASE_LOCK('statistics_primary_key')"
+
+    # Left behind by an interrupted migration
+    DROP_KEYED_STATISTICS: str = "DROP TABLE IF EXISTS statistics_keyed"
+
+    CREATE_KEYED_STATISTICS: str = (
+        """
+        CREATE TABLE statistics_keyed LIKE statistics
+        """
+    )
+
+    ADD_PRIMARY_KEY: str = (
+        """
+        ALTER TABLE statistics_keyed 
+            MODIFY streamer_id VARCHAR(64) NOT NULL, 
+            MODIFY viewer_id VARCHAR(64) NOT NULL, 
+            ADD PRIMARY KEY (streamer_id, viewer_id)
+        """
+    )
+
+    # Duplicate (streamer_id, viewer_id) rows are summed into one
+    COPY_DEDUPLICATED: str = (
+        """
+        INSERT INTO statistics_keyed (streamer_id, viewer_id, comments, experience, coins) 
+        SELECT streamer_id, viewer_id, SUM(comments), SUM(experience), SUM(coins) 
+        FROM statistics 
+        GROUP BY streamer_id, viewer_id
+        """
+    )
+
+    SWAP_KEYED_STATISTICS: str = (
+        """
+        RENAME TABLE statistics TO statistics_unkeyed, statistics_keyed TO statistics
+        """
+    )
+
+    GET_STREAMERS: str = (
+        """
+        SELECT DISTINCT streamer_id 
+        FROM statistics
+        """
+    )
+
 
 class StatisticSQL:
 
-    def __init__(self, pool: Pool):
-        self.pool: Pool = pool
-        self.connection: Optional[Connection] = None
-        self.cursor: Optional[Cursor] = None
+    def __init__(self, pool: Optional[Pool] = None, session: Optional[SQLSession] = None):
+        self.pool: Optional[Pool] = pool
+        self.session: Optional[SQLSession] = session
 
-    async def __create_if_not_exists(self, viewer_id: str, streamer_id: str):
-        try:
-            await self.cursor.execute(StatisticStatements.INSERT_STATISTIC % (viewer_id, streamer_id))
-            await self.connection.commit()
-        except:
-            logging.error(traceback.format_exc())
-            pass
+    @SQLEntryPoint
+    async def update_statistics(self, session: SQLSession, viewer_id: str, streamer_id: str, add_comments: int, add_experience: int, add_coins: int):
+        await session.cursor.execute(str(StatisticStatements.UPSERT_STATISTICS), (viewer_id, streamer_id, add_comments, add_experience, add_coins))
 
-    async def __stats_exist(self, viewer_id: str, streamer_id: str) -> bool:
-        try:
-            await self.cursor.execute(StatisticStatements.GET_USER_STATISTICS % (viewer_id, streamer_id))
-            result = await self.cursor.fetchone()
-            return bool(result)
-        except:
-            pass
+    @SQLEntryPoint
+    async def upsert_statistics(self, session: SQLSession, rows: List[Tuple[str, str, int, int, int]]):
+        # aiomysql rewrites executemany on INSERT ... VALUES into one multi-row statement
+        await session.cursor.executemany(str(StatisticStatements.UPSERT_STATISTICS), rows)
 
-        return False
+    @SQLEntryPoint
+    async def get_statistics(self, session: SQLSession, streamer_id: str, count: int = 100):
+        await session.cursor.execute(str(StatisticStatements.GET_TOP_STATISTICS), (streamer_id, count))
+        return await session.cursor.fetchall()
 
     @SQLEntryPoint
-    async def update_statistics(self, viewer_id: str, streamer_id: str, add_comments: int, add_experience: int, add_coins: int):
+    async def get_statistics_page(self, session: SQLSession, streamer_id: str, after: Optional[Tuple[int, str]], count: int):
+        """
+        One leaderboard page
+
+        :param after: (experience, viewer_id) of the last row of the previous page, None for the first page
 
-        if not await self.__stats_exist(viewer_id, streamer_id):
-            await self.__create_if_not_exists(viewer_id, streamer_id)
+        """
 
-        await self.cursor.execute(StatisticStatements.UPDATE_STATISTICS % (add_comments, add_experience, add_coins, viewer_id, streamer_id))
+        if after is None:
+            await session.cursor.execute(str(StatisticStatements.GET_TOP_STATISTICS), (streamer_id, count))
+        else:
+            experience, viewer_id = after
+            await session.cursor.execute(
+                str(StatisticStatements.GET_STATISTICS_PAGE),
+                (streamer_id, experience, viewer_id, count, streamer_id, experience, count, count)
+            )
+
+        return await session.cursor.fetchall()
 
     @SQLEntryPoint
-    async def get_statistics(self, streamer_id: str):
-        await self.cursor.execute(StatisticStatements.GET_ALL_STATISTICS % streamer_id)
-        return await self.cursor.fetchmany(size=100)
+    async def get_rank(self, session: SQLSession, viewer_id: str, streamer_id: str) -> Optional[Tuple[int, int]]:
+        """
+        :return: (rank from 1, experience), or None if the viewer has no statistics for the streamer
+
+        """
+
+        await session.cursor.execute(str(StatisticStatements.GET_USER_STATISTICS), (viewer_id, streamer_id))
+        row: Optional[tuple] = await session.cursor.fetchone()
+
+        if row is None:
+            return None
+
+        experience: int = row[1]
+        await session.cursor.execute(str(StatisticStatements.COUNT_RANKED_ABOVE), (streamer_id, experience, experience, viewer_id))
+        return (await session.cursor.fetchone())[0] + 1, experience
+
+    @SQLEntryPoint
+    async def get_viewer_statistics(self, session: SQLSession, streamer_id: str, viewer_ids: List[str]):
+        statement: str = str(StatisticStatements.GET_VIEWER_STATISTICS).format(viewers=", ".join(["%s"] * len(viewer_ids)))
+        await session.cursor.execute(statement, (streamer_id, *viewer_ids))
+        return await session.cursor.fetchall()
+
+    @SQLEntryPoint
+    async def get_all_statistics(self, session: SQLSession, streamer_id: str):
+        await session.cursor.execute(str(StatisticStatements.GET_ALL_STATISTICS), (streamer_id,))
+        return await session.cursor.fetchall()
+
+    @SQLEntryPoint
+    async def get_streamers(self, session: SQLSession) -> List[str]:
+        await session.cursor.execute(str(StatisticStatements.GET_STREAMERS))
+        return [row[0] for row in await session.cursor.fetchall()]
+
+    @SQLEntryPoint
+    async def migrate_primary_key(self, session: SQLSession) -> bool:
+        """
+        Give a statistics table from before the upsert its (streamer_id, viewer_id) primary key, merging duplicate rows.
+        The original table is kept as ``statistics_unkeyed``. Run before the template, whose index needs the new columns.
+
+        :return: Whether the table was migrated
+
+        """
+
+        # Copying a big table can outlast one GET_LOCK wait, so keep waiting until the worker migrating it is done
+        while True:
+            await session.cursor.execute(str(StatisticStatements.ACQUIRE_MIGRATION_LOCK))
+            acquired: Optional[int] = (await session.cursor.fetchone())[0]
+
+            if acquired:
+                break
+
+            # NULL rather than 0 (timed out) means the lock itself failed
+            if acquired is None:
+                raise RuntimeError("Could not take the statistics migration lock")
+
+            logging.warning("Waiting for another worker to migrate the statistics table")
+
+        try:
+            await session.cursor.execute(str(StatisticStatements.HAS_PRIMARY_KEY))
+            exists, keyed = await session.cursor.fetchone()
+
+            if not exists or keyed:
+                return False
+
+            await session.cursor.execute(str(StatisticStatements.DROP_KEYED_STATISTICS))
+            await session.cursor.execute(str(StatisticStatements.CREATE_KEYED_STATISTICS))
+            await session.cursor.execute(str(StatisticStatements.ADD_PRIMARY_KEY))
+            await session.cursor.execute(str(StatisticStatements.COPY_DEDUPLICATED))
+            await session.cursor.execute(str(StatisticStatements.SWAP_KEYED_STATISTICS))
+            return True
 
+        finally:
+            await session.cursor.execute(str(StatisticStatements.RELEASE_MIGRATION_LOCK))